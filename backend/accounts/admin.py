@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser
+from .models import CustomUser, Follow
 
 
 @admin.register(CustomUser)
@@ -28,3 +28,10 @@ class CustomUserAdmin(UserAdmin):
     )
     
     readonly_fields = ['created_at', 'updated_at', 'last_login']
+
+
+@admin.register(Follow)
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ('id', 'follower', 'following', 'created_at')
+    search_fields = ('follower__email', 'following__email')
+    readonly_fields = ('created_at',)
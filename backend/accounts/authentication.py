@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .tokens import EventStreamToken, aget_token_state, get_token_state
+
+
+class ClaimsUser(TokenUser):
+    """
+    Request user built from the signed token claims (id, email, full_name, is_active).
+
+    Anything that is not a claim is read from the full CustomUser row, which is
+    loaded on first use, so views that only need the user's id never touch the
+    users table. Query filters should use `user.pk` (`filter(user_id=user.pk)`).
+    """
+
+    @cached_property
+    def id(self):
+        # simplejwt stores the user id claim as a string
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def instance(self):
+        return get_user_model().objects.get(pk=self.pk)
+
+    @property
+    def is_active(self):
+        return self.token.get('is_active', True)
+
+    def __getattr__(self, attr):
+        if attr.startswith('_') or attr == 'token':
+            raise AttributeError(attr)
+        if attr in self.token:
+            return self.token[attr]
+        return getattr(self.instance, attr)
+
+
+def get_user_instance(user):
+    """Return the CustomUser model instance behind `user` (a ClaimsUser or a model)."""
+    return user.instance if isinstance(user, ClaimsUser) else user
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication without the per-request users SELECT.
+
+    The user comes from the token claims; revocation and deactivation are caught by
+    comparing the `ver` claim with the cached (token_version, is_active) state.
+    """
+
+    def get_user(self, validated_token):
+        user_id = self._get_user_id(validated_token)
+        return self._check_state(validated_token, get_token_state(user_id))
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self._get_user_id(validated_token)
+        return self._check_state(validated_token, await aget_token_state(user_id))
+
+    def _get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def _check_state(self, validated_token, state):
+        if state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        token_version, is_active = state
+        if not is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if validated_token.get('ver', 0) != token_version:
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+        return ClaimsUser(validated_token)
+
+
+class EventStreamAuthentication(StatelessJWTAuthentication):
+    """
+    The Authorization header, or else an EventStreamToken in the `token` query
+    parameter, since EventSource cannot send headers.
+    """
+
+    async def aauthenticate(self, request):
+        raw_token = request.GET.get('token')
+        if raw_token is None or self.get_header(request) is not None:
+            return await super().aauthenticate(request)
+        try:
+            validated_token = EventStreamToken(raw_token)
+        except TokenError as exc:
+            raise InvalidToken({'detail': _('Given token not valid for any token type'), 'messages': [str(exc)]})
+        return await self.aget_user(validated_token), validated_token
@@ -0,0 +1,147 @@
+"""
+Password checks run in a small process pool instead of on the request worker.
+
+Hashing is CPU-bound and holds the GIL. During a login storm, every request
+thread in the worker would stall behind it. `OffloadedModelBackend` sends
+`verify_password` / `make_password` to LOGIN_HASH_WORKERS processes, and the
+request thread only waits on the result. At most LOGIN_HASH_MAX_PENDING hashes
+can be queued per worker process. Past that, the queue never grows: the
+password check fails with `HashPoolBusy`.
+
+Only callers that can answer "busy" see that exception: LoginView wraps its
+authenticate() call in `busy_raises()` and answers 503. Everywhere else (the
+admin login, other authenticate() callers) the backend logs it and returns
+None, so the attempt fails like a wrong password rather than with a 500.
+"""
+import logging
+import multiprocessing
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password, verify_password
+
+from .hash_worker import init_worker
+
+logger = logging.getLogger(__name__)
+
+UserModel = get_user_model()
+
+HASH_WORKERS = getattr(settings, 'LOGIN_HASH_WORKERS', 2)
+HASH_MAX_PENDING = getattr(settings, 'LOGIN_HASH_MAX_PENDING', 32)
+HASH_TIMEOUT = getattr(settings, 'LOGIN_HASH_TIMEOUT', 10)
+
+
+class HashPoolBusy(Exception):
+    """Too many password hashes queued (or the pool is unavailable); retry later."""
+
+
+class HashPool:
+    """Lazily started, bounded ProcessPoolExecutor for password hashing."""
+
+    def __init__(self, workers, max_pending, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: the parent has DB connections and other thread pools
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=init_worker,
+                    initargs=(settings.SETTINGS_MODULE,),
+                )
+            return self._executor
+
+    def _reset(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashPoolBusy()
+        try:
+            return self._get_executor().submit(fn, *args).result(timeout=self.timeout)
+        except TimeoutError:
+            raise HashPoolBusy()
+        except BrokenProcessPool:
+            self._reset()
+            raise HashPoolBusy()
+        finally:
+            self._slots.release()
+
+
+hash_pool = HashPool(HASH_WORKERS, HASH_MAX_PENDING, HASH_TIMEOUT)
+
+_busy_raises = ContextVar('busy_raises', default=False)
+
+
+@contextmanager
+def busy_raises():
+    """Let HashPoolBusy propagate out of authenticate() calls made inside the block."""
+    token = _busy_raises.set(True)
+    try:
+        yield
+    finally:
+        _busy_raises.reset(token)
+
+
+class OffloadedModelBackend(ModelBackend):
+    """
+    ModelBackend with the password hashing done in `hash_pool`.
+
+    Behaves like ModelBackend.authenticate(). One difference: a hash that is
+    outdated (another algorithm or older Argon2 parameters) is re-hashed with a
+    conditional UPDATE. It does not use `user.save()`, so a login does not send
+    post_save and does not invalidate the cached profile.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        try:
+            return self._authenticate(username, password, **kwargs)
+        except HashPoolBusy:
+            if _busy_raises.get():
+                raise
+            logger.warning('Password hash pool busy; rejecting login for %r', username)
+            return None
+
+    def _authenticate(self, username, password, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash once anyway so unknown emails take as long as wrong passwords
+            hash_pool.run(make_password, password)
+            return
+
+        is_correct, must_update = hash_pool.run(verify_password, password, user.password)
+        if not is_correct:
+            return
+        if must_update:
+            self.rehash(user, password)
+        if self.user_can_authenticate(user):
+            return user
+
+    def rehash(self, user, password):
+        try:
+            encoded = hash_pool.run(make_password, password)
+        except HashPoolBusy:
+            return  # the password was verified; upgrade the hash on a later login
+        # Only replace the hash we verified; a concurrent password change wins
+        UserModel._default_manager.filter(pk=user.pk, password=user.password).update(password=encoded)
+        user.password = encoded
@@ -0,0 +1,145 @@
+"""
+Refresh-token blacklist lookups that stay flat as the blacklist tables grow.
+
+`is_blacklisted(jti)` answers in three tiers:
+  1. an in-process Bloom filter of blacklisted jtis, refreshed incrementally from
+     the database every BLACKLIST_BLOOM_REFRESH seconds (each refresh re-reads the
+     last BLACKLIST_BLOOM_OVERLAP seconds of entries, see BlacklistIndex);
+  2. the shared cache, which holds a marker for every jti blacklisted recently
+     (also how other workers learn about a logout before their next refresh);
+  3. the database (BlacklistedToken), the source of truth, only consulted when
+     the Bloom filter says "maybe".
+A clean refresh token, which is the common case, costs one cache GET.
+
+BLACKLIST_CACHE_ALIAS must name a cache shared by every worker (Redis,
+Memcached). With a per-process cache such as LocMemCache, a token blacklisted
+on one worker is still accepted by the others until their next filter refresh,
+up to BLACKLIST_BLOOM_REFRESH seconds.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+BLOOM_CAPACITY = getattr(settings, 'BLACKLIST_BLOOM_CAPACITY', 100000)
+BLOOM_ERROR_RATE = getattr(settings, 'BLACKLIST_BLOOM_ERROR_RATE', 0.001)
+BLOOM_REFRESH = getattr(settings, 'BLACKLIST_BLOOM_REFRESH', 30)
+BLOOM_OVERLAP = getattr(settings, 'BLACKLIST_BLOOM_OVERLAP', 60)
+BLACKLIST_CACHE_ALIAS = getattr(settings, 'BLACKLIST_CACHE_ALIAS', 'default')
+
+
+def _marker_key(jti):
+    return f'accounts:blacklisted:{jti}'
+
+
+def _marker_timeout():
+    # Long enough to outlive any refresh token that could be presented
+    return int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (no false negatives, tunable false positives)."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+class BlacklistIndex:
+    """
+    Process-local Bloom filter kept in sync with BlacklistedToken.
+
+    Refreshes read rows by `blacklisted_at`, not by an id watermark: ids are taken
+    at INSERT but rows become visible at COMMIT, so a row can show up after one
+    with a higher id was already read. Each refresh re-reads everything
+    blacklisted since BLOOM_OVERLAP seconds before the previous one started, which
+    covers those late commits (and clock skew between workers).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._scanned_at = None
+        self._refreshed_at = 0.0
+
+    def _rebuild(self):
+        total = BlacklistedToken.objects.count()
+        self._bloom = BloomFilter(max(BLOOM_CAPACITY, total * 2), BLOOM_ERROR_RATE)
+        self._load(BlacklistedToken.objects.all())
+
+    def _load_new(self):
+        since = self._scanned_at - timedelta(seconds=BLOOM_OVERLAP)
+        self._load(BlacklistedToken.objects.filter(blacklisted_at__gte=since))
+
+    def _load(self, queryset):
+        scanned_at = timezone.now()
+        for jti in queryset.values_list('token__jti', flat=True).iterator(chunk_size=5000):
+            # The overlap re-reads rows already in the filter; don't count them twice
+            if jti not in self._bloom:
+                self._bloom.add(jti)
+        self._scanned_at = scanned_at
+        self._refreshed_at = time.monotonic()
+
+    def refresh(self, force=False):
+        with self._lock:
+            if self._bloom is None or self._bloom.count > self._bloom.capacity:
+                self._rebuild()
+            elif force or time.monotonic() - self._refreshed_at > BLOOM_REFRESH:
+                self._load_new()
+
+    def might_contain(self, jti):
+        self.refresh()
+        return jti in self._bloom
+
+    def add(self, jti):
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+
+
+_index = BlacklistIndex()
+
+
+def is_blacklisted(jti):
+    """Return True if the refresh token with this `jti` has been blacklisted."""
+    cache = caches[BLACKLIST_CACHE_ALIAS]
+    marker = cache.get(_marker_key(jti))
+    if marker is not None:
+        return marker
+    if not _index.might_contain(jti):
+        return False
+    # Bloom filter hit: confirm against the source of truth and remember the answer
+    blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+    # Negative answers expire quickly so a logout on another worker is seen soon
+    cache.set(_marker_key(jti), blacklisted, _marker_timeout() if blacklisted else BLOOM_REFRESH)
+    return blacklisted
+
+
+def mark_blacklisted(jti):
+    """Record a fresh blacklist entry in the shared cache and this process's filter."""
+    caches[BLACKLIST_CACHE_ALIAS].set(_marker_key(jti), True, _marker_timeout())
+    _index.add(jti)
@@ -0,0 +1,13 @@
+"""
+Process-pool initializer for accounts.backends.
+
+Kept in its own module, without Django imports at import time: a spawned worker
+must unpickle this function before Django is set up.
+"""
+import os
+
+
+def init_worker(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher
+
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id with its cost taken from settings (ARGON2_TIME_COST, ARGON2_MEMORY_COST
+    in KiB, ARGON2_PARALLELISM).
+
+    The algorithm name is unchanged, so hashes stay readable by Django's stock
+    Argon2 hasher. Changing a parameter makes `must_update()` true for every older
+    hash, and the login backend re-hashes those passwords on the next successful
+    login.
+    """
+
+    time_cost = getattr(settings, 'ARGON2_TIME_COST', Argon2PasswordHasher.time_cost)
+    memory_cost = getattr(settings, 'ARGON2_MEMORY_COST', Argon2PasswordHasher.memory_cost)
+    parallelism = getattr(settings, 'ARGON2_PARALLELISM', Argon2PasswordHasher.parallelism)
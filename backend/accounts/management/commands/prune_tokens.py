@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding tokens (and their blacklist rows) in small batches. "
+        "Meant to run on a schedule, e.g. hourly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of tokens deleted per transaction (default: 5000).',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=0.0,
+            help='Seconds to pause between batches to limit load (default: 0).',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        now = timezone.now()
+
+        deleted = 0
+        while True:
+            # Uses the expires_at index; each batch is a short transaction
+            ids = list(
+                OutstandingToken.objects.filter(expires_at__lte=now)
+                .order_by('expires_at')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                # BlacklistedToken rows go with them (on_delete=CASCADE)
+                OutstandingToken.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} expired tokens."))
@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import Post
+
+User = get_user_model()
+
+
+def posts_count():
+    """Correlated subquery counting the outer user's posts."""
+    return Coalesce(
+        Subquery(
+            Post.objects.filter(user=OuterRef('pk'))
+            .order_by()
+            .values('user')
+            .annotate(c=Count('id'))
+            .values('c')
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = "Recompute CustomUser.posts_count from the posts table to repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of users updated per transaction (default: 5000).',
+        )
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Only recount the given user id (may be repeated).',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        base_qs = User.objects.order_by('pk')
+        if options['user_ids']:
+            base_qs = base_qs.filter(pk__in=options['user_ids'])
+
+        updated = 0
+        last_pk = 0
+        while True:
+            # Walk the table in pk ranges so each UPDATE holds locks briefly
+            pks = list(base_qs.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            with transaction.atomic():
+                updated += User.objects.filter(pk__in=pks).update(posts_count=posts_count())
+            last_pk = pks[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Recounted posts for {updated} users."))
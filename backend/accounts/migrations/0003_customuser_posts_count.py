@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:30
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_posts_count(apps, schema_editor):
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    Post = apps.get_model('posts', 'Post')
+    CustomUser.objects.update(
+        posts_count=Coalesce(
+            Subquery(
+                Post.objects.filter(user=OuterRef('pk'))
+                .order_by()
+                .values('user')
+                .annotate(c=Count('id'))
+                .values('c')
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_customuser_followers_count_follow'),
+        ('posts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_posts_count, migrations.RunPython.noop),
+    ]
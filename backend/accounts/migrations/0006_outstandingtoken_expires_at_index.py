@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:30
+
+from django.db import migrations
+
+from backend_main.operations import PostgreSQLOnly
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction; it builds the
+    # index without blocking logins and refreshes that write outstanding tokens
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0005_customuser_token_version'),
+        ('token_blacklist', '0013_alter_blacklistedtoken_options_and_more'),
+    ]
+
+    # token_blacklist only indexes jti; `prune_tokens` walks the table by expiry
+    operations = [
+        PostgreSQLOnly(migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS token_outstanding_expires_idx '
+                'ON token_blacklist_outstandingtoken (expires_at)',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS token_outstanding_expires_idx',
+        )),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:30
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations
+
+from backend_main.operations import PostgreSQLOnly
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_outstandingtoken_expires_at_index'),
+        # Creates the pg_trgm extension
+        ('posts', '0008_post_search_vector'),
+    ]
+
+    operations = [
+        PostgreSQLOnly(migrations.AddIndex(
+            model_name='customuser',
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper('full_name'), name='gin_trgm_ops'
+                ),
+                name='users_full_name_trgm_idx',
+            ),
+        )),
+        PostgreSQLOnly(migrations.AddIndex(
+            model_name='customuser',
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Lower('email'), name='gin_trgm_ops'
+                ),
+                name='users_email_lower_trgm_idx',
+            ),
+        )),
+    ]
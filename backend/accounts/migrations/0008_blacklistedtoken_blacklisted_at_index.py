@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 21:55
+
+from django.db import migrations
+
+from backend_main.operations import PostgreSQLOnly
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction; it builds the
+    # index without blocking logouts and rotations that blacklist tokens
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0007_customuser_search_indexes'),
+        ('token_blacklist', '0013_alter_blacklistedtoken_options_and_more'),
+    ]
+
+    # accounts.blacklist refreshes its Bloom filter by a blacklisted_at range
+    operations = [
+        PostgreSQLOnly(migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS token_blacklisted_at_idx '
+                'ON token_blacklist_blacklistedtoken (blacklisted_at)',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS token_blacklisted_at_idx',
+        )),
+    ]
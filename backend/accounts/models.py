@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Lower, Upper
 from django.core.validators import FileExtensionValidator
 
 
@@ -36,6 +38,14 @@ class CustomUser(AbstractUser):
             FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png'])
         ]
     )
+    # Denormalized, maintained by FollowView; decides fan-out-on-write vs fan-out-on-read
+    followers_count = models.PositiveIntegerField(default=0)
+    # Denormalized, maintained by the posts views on create/delete (see `recount_posts`)
+    posts_count = models.PositiveIntegerField(default=0)
+    # Embedded in JWTs as the `ver` claim; bumping it revokes every outstanding token
+    token_version = models.PositiveIntegerField(default=0)
+    # {format: {width: storage name}} written by backend_main.imaging after upload
+    profile_picture_variants = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -46,8 +56,39 @@ class CustomUser(AbstractUser):
     
     class Meta:
         db_table = 'users'
+        # pg_trgm indexes for accounts.search: UPPER(full_name) is what `icontains` /
+        # `istartswith` compile to, LOWER(email) serves the email-prefix match
+        indexes = [
+            GinIndex(OpClass(Upper('full_name'), name='gin_trgm_ops'), name='users_full_name_trgm_idx'),
+            GinIndex(OpClass(Lower('email'), name='gin_trgm_ops'), name='users_email_lower_trgm_idx'),
+        ]
         verbose_name = 'User'
         verbose_name_plural = 'Users'
     
     def __str__(self):
-        return self.email
\ No newline at end of file
+        return self.email
+
+
+class Follow(models.Model):
+    """Directed follow relationship: `follower` sees `following`'s posts in their feed"""
+
+    follower = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='following_links'
+    )
+    following = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='follower_links'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'follows'
+        unique_together = ('follower', 'following')  # one row per pair
+        verbose_name = 'Follow'
+        verbose_name_plural = 'Follows'
+
+    def __str__(self):
+        return f"{self.follower_id} follows {self.following_id}"
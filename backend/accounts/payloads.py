@@ -0,0 +1,37 @@
+"""
+Read-only profile payload built directly from a `.values()` row.
+
+Produces the same output as UserProfileSerializer without loading a model
+instance or running DRF's field machinery. The profile GET is read far more
+often than it is written.
+"""
+from django.core.files.storage import default_storage
+from rest_framework import serializers
+
+from backend_main.imaging import build_srcset
+
+PROFILE_COLUMNS = (
+    'id', 'email', 'full_name', 'date_of_birth', 'profile_picture',
+    'profile_picture_variants', 'posts_count', 'created_at',
+)
+
+_date = serializers.DateField()
+_datetime = serializers.DateTimeField()
+
+
+def profile_payload(row, request=None):
+    """UserProfileSerializer(user, context={'request': request}).data for a PROFILE_COLUMNS row."""
+    picture = default_storage.url(row['profile_picture']) if row['profile_picture'] else None
+    if picture and request is not None:
+        picture = request.build_absolute_uri(picture)
+    return {
+        'id': row['id'],
+        'email': row['email'],
+        'full_name': row['full_name'],
+        'date_of_birth': _date.to_representation(row['date_of_birth']),
+        'profile_picture': picture,
+        'profile_picture_url': picture if request is not None else None,
+        'profile_picture_srcset': build_srcset(row['profile_picture_variants'], request),
+        'posts_count': row['posts_count'],
+        'created_at': _datetime.to_representation(row['created_at']),
+    }
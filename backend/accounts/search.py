@@ -0,0 +1,40 @@
+"""
+User autocomplete (mentions, follow suggestions).
+
+Two capped queries, both on pg_trgm GIN indexes:
+  1. prefix: full_name starts with the term, or the lowercased email does;
+  2. only if (1) did not fill the page: full_name contains the term.
+Neither query has an ORDER BY, so PostgreSQL stops after `limit` rows instead of
+ranking every match for a common term. The few rows returned are sorted in Python.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+User = get_user_model()
+
+MIN_QUERY_LENGTH = 3
+PROJECTION = ('id', 'full_name', 'profile_picture', 'profile_picture_variants')
+
+
+def search_users(terms, limit):
+    """Return up to `limit` active users matching `terms` as dicts of PROJECTION, prefix matches first."""
+    if len(terms) < MIN_QUERY_LENGTH:
+        return []
+    base = (
+        User.objects.filter(is_active=True)
+        .alias(email_lower=Lower('email'))
+        .order_by()
+        .values(*PROJECTION)
+    )
+
+    prefix = Q(full_name__istartswith=terms) | Q(email_lower__startswith=terms.lower())
+    matches = list(base.filter(prefix)[:limit])
+    matches.sort(key=lambda row: (row['full_name'].lower(), row['id']))
+
+    if len(matches) < limit:
+        seen = [row['id'] for row in matches]
+        more = list(base.filter(full_name__icontains=terms).exclude(pk__in=seen)[:limit - len(matches)])
+        more.sort(key=lambda row: (row['full_name'].lower(), row['id']))
+        matches.extend(more)
+    return matches
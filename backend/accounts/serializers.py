@@ -1,7 +1,11 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from datetime import date
+from backend_main.imaging import build_srcset
+from backend_main.metrics import TimedSerializerMixin
+from .tokens import ClaimsRefreshToken
 
 User = get_user_model()
 
@@ -92,17 +96,20 @@ class LoginSerializer(serializers.Serializer):
     )
     
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for user profile view and update"""
     
     profile_picture_url = serializers.SerializerMethodField()
-    posts_count = serializers.SerializerMethodField()
+    # {format: {width: url}} of the resized variants; empty until the image pipeline is done
+    profile_picture_srcset = serializers.SerializerMethodField()
+    # Denormalized column on CustomUser, no COUNT(*) per render
+    posts_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = User
         fields = [
             'id', 'email', 'full_name', 'date_of_birth',
-            'profile_picture', 'profile_picture_url',
+            'profile_picture', 'profile_picture_url', 'profile_picture_srcset',
             'posts_count', 'created_at'
         ]
         read_only_fields = ['id', 'email', 'created_at']
@@ -115,9 +122,8 @@ class UserProfileSerializer(serializers.ModelSerializer):
                 return request.build_absolute_uri(obj.profile_picture.url)
         return None
     
-    def get_posts_count(self, obj):
-        """Get total posts count"""
-        return obj.posts.count()
+    def get_profile_picture_srcset(self, obj):
+        return build_srcset(obj.profile_picture_variants, self.context.get('request'))
     
     def validate_date_of_birth(self, value):
         """Validate date of birth"""
@@ -130,4 +136,10 @@ class UserProfileSerializer(serializers.ModelSerializer):
         if value:
             if value.size > 5 * 1024 * 1024:  # 5MB limit
                 raise serializers.ValidationError("Image file size cannot exceed 5MB.")
-        return value
\ No newline at end of file
+        return value
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Token refresh using ClaimsRefreshToken, so the blacklist check is cached"""
+
+    token_class = ClaimsRefreshToken
@@ -0,0 +1,11 @@
+from django.conf import settings
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .tokens import forget_token_state
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def refresh_token_state(sender, instance, **kwargs):
+    """Re-read (token_version, is_active) after a user change, e.g. deactivation in the admin."""
+    forget_token_state(instance.pk)
@@ -1,3 +1,151 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import authenticate, get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from backend_main.imaging import process_variants
+from .authentication import ClaimsUser
+from .backends import HashPoolBusy, busy_raises
+from .blacklist import BlacklistIndex
+from .tokens import ClaimsRefreshToken
+
+User = get_user_model()
+
+
+def image_file(name, fmt, size=(300, 200)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'teal').save(buffer, format=fmt)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{fmt.lower()}')
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class ProfilePictureTests(APITestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(
+            email='pictured@example.com', password=None, full_name='Pictured', date_of_birth='1990-01-01',
+        )
+        self.user.profile_picture.save('old.jpg', ContentFile(image_file('old.jpg', 'JPEG').read()))
+        self.old_variant = self.user.profile_picture.storage.save('profile_pics/variants/old_150.webp', ContentFile(b'x'))
+        self.user.profile_picture_variants = {'webp': {'150': self.old_variant}}
+        self.user.save()
+        token = ClaimsRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def patch_profile(self, data, format):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.patch('/api/profile/', data, format=format)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response, callbacks
+
+    def test_new_picture_resets_variants_in_the_same_save(self):
+        response, callbacks = self.patch_profile({'profile_picture': image_file('new.jpg', 'JPEG')}, 'multipart')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.profile_picture_variants, {})
+        self.assertEqual(response.json()['user']['profile_picture_srcset'], {})
+
+        for callback in callbacks:
+            callback()
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.profile_picture.storage.exists(self.old_variant))
+        self.assertIn('new', self.user.profile_picture_variants['webp']['150'])
+
+    def test_clearing_picture_resets_variants(self):
+        _, callbacks = self.patch_profile({'profile_picture': None}, 'json')
+        for callback in callbacks:
+            callback()
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.profile_picture)
+        self.assertEqual(self.user.profile_picture_variants, {})
+        self.assertFalse(self.user.profile_picture.storage.exists(self.old_variant))
+
+    @mock.patch('backend_main.imaging.MAX_DIMENSION', 100)
+    def test_oversized_webp_original_stays_webp(self):
+        # Not accepted by the upload validators, but the pipeline must not turn one into JPEG bytes
+        self.user.profile_picture.save('big.webp', ContentFile(image_file('big.webp', 'WEBP').read()))
+        process_variants(User._meta.label, self.user.pk, 'profile_picture')
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.profile_picture.name.endswith('.webp'))
+        with self.user.profile_picture.open('rb') as fh:
+            image = Image.open(fh)
+            self.assertEqual((image.format, max(image.size)), ('WEBP', 100))
+
+
+class ClaimsUserTests(TestCase):
+
+    def test_id_is_an_int(self):
+        user = User.objects.create_user(
+            email='claims@example.com', password=None, full_name='Claims', date_of_birth='1990-01-01',
+        )
+        claims_user = ClaimsUser(ClaimsRefreshToken.for_user(user).access_token)
+        self.assertEqual((claims_user.id, claims_user.pk), (user.pk, user.pk))
+        self.assertIsInstance(claims_user.pk, int)
+
+
+class BlacklistIndexTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(
+            email='blacklisted@example.com', password=None, full_name='Blacklisted', date_of_birth='1990-01-01',
+        )
+        self.early, self.late = (ClaimsRefreshToken.for_user(user) for _ in range(2))
+        self.index = BlacklistIndex()
+
+    def blacklist(self, token, row_id, age):
+        outstanding = OutstandingToken.objects.get(jti=token['jti'])
+        BlacklistedToken.objects.create(id=row_id, token=outstanding)
+        BlacklistedToken.objects.filter(id=row_id).update(blacklisted_at=timezone.now() - timedelta(seconds=age))
+
+    def test_refresh_picks_up_rows_committed_out_of_id_order(self):
+        self.blacklist(self.late, row_id=20, age=0)
+        self.index.refresh()
+        self.assertFalse(self.index.might_contain(self.early['jti']))
+
+        # Inserted before the refresh (lower id, older timestamp) but committed after it
+        self.blacklist(self.early, row_id=10, age=5)
+        self.index.refresh(force=True)
+        self.assertTrue(self.index.might_contain(self.early['jti']))
+        self.assertEqual(self.index._bloom.count, 2)
+
+
+@mock.patch('accounts.backends.hash_pool.run', side_effect=HashPoolBusy)
+class HashPoolBusyTests(APITestCase):
+
+    def setUp(self):
+        User.objects.create_user(
+            email='busy@example.com', password=None, full_name='Busy', date_of_birth='1990-01-01',
+        )
+
+    def test_authenticate_fails_closed(self, run):
+        with self.assertLogs('accounts.backends', 'WARNING'):
+            self.assertIsNone(authenticate(None, username='busy@example.com', password='secret'))
+
+    def test_busy_raises_propagates(self, run):
+        with busy_raises(), self.assertRaises(HashPoolBusy):
+            authenticate(None, username='busy@example.com', password='secret')
+
+    def test_login_answers_503(self, run):
+        response = self.client.post('/api/login/', {'email': 'busy@example.com', 'password': 'secret'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_admin_login_is_not_a_server_error(self, run):
+        with self.assertLogs('accounts.backends', 'WARNING'):
+            response = self.client.post('/admin/login/', {'username': 'busy@example.com', 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
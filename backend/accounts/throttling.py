@@ -0,0 +1,57 @@
+import hashlib
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.exceptions import Throttled
+
+MAX_CONCURRENT_PER_IP = getattr(settings, 'LOGIN_MAX_CONCURRENT_PER_IP', 4)
+MAX_CONCURRENT_PER_EMAIL = getattr(settings, 'LOGIN_MAX_CONCURRENT_PER_EMAIL', 1)
+# Must be shared by all workers: with a per-process cache each worker keeps its
+# own counts, and the real limits are multiplied by the number of workers
+THROTTLE_CACHE_ALIAS = getattr(settings, 'LOGIN_THROTTLE_CACHE_ALIAS', 'default')
+# Safety net: a worker killed mid-login cannot hold a slot longer than this
+SLOT_TIMEOUT = 30
+
+
+def _acquire(key, limit):
+    cache = caches[THROTTLE_CACHE_ALIAS]
+    cache.add(key, 0, SLOT_TIMEOUT)
+    try:
+        count = cache.incr(key)
+    except ValueError:  # expired between add() and incr()
+        cache.set(key, 1, SLOT_TIMEOUT)
+        count = 1
+    return count <= limit
+
+
+def _release(key):
+    try:
+        caches[THROTTLE_CACHE_ALIAS].decr(key)
+    except ValueError:
+        pass
+
+
+@contextmanager
+def login_slot(ident, email):
+    """
+    Cap the number of in-flight login attempts per client address and per email.
+    Raises Throttled (429) when either limit is reached. This is about concurrency,
+    not rate: a slot is freed as soon as its password check finishes.
+    """
+    email_digest = hashlib.sha256(email.encode('utf-8')).hexdigest()
+    limits = (
+        (f'accounts:login_inflight:ip:{ident}', MAX_CONCURRENT_PER_IP),
+        (f'accounts:login_inflight:email:{email_digest}', MAX_CONCURRENT_PER_EMAIL),
+    )
+    held = []
+    try:
+        for key, limit in limits:
+            allowed = _acquire(key, limit)
+            held.append(key)
+            if not allowed:
+                raise Throttled(wait=1, detail='Too many login attempts in progress. Try again shortly.')
+        yield
+    finally:
+        for key in held:
+            _release(key)
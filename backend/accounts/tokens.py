@@ -0,0 +1,112 @@
+"""
+JWTs carrying enough signed claims to authenticate without a users SELECT.
+
+`ClaimsRefreshToken.for_user` embeds id, email, full_name, is_active and the
+user's `token_version` (as `ver`); access tokens derived from it copy the claims.
+Revocation is a version bump: `revoke_tokens(user)` increments `token_version`,
+and the authentication class compares the `ver` claim against the current
+version, which is read through a short-lived cache entry.
+
+`EventStreamToken` is a short-lived token with the same claims, for the event
+stream only (see posts.async_views.PostEventStreamView).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .blacklist import is_blacklisted, mark_blacklisted
+
+User = get_user_model()
+
+TOKEN_STATE_TIMEOUT = getattr(settings, 'TOKEN_STATE_CACHE_TIMEOUT', 60)
+EVENT_STREAM_TOKEN_LIFETIME = getattr(settings, 'REALTIME_TOKEN_LIFETIME', timedelta(seconds=30))
+
+IDENTITY_CLAIMS = (api_settings.USER_ID_CLAIM, 'email', 'full_name', 'is_active', 'ver')
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """
+    Refresh token (and derived access tokens) with the user's identity claims.
+    Blacklist checks go through accounts.blacklist instead of a query per refresh.
+    """
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        result = super().blacklist()
+        mark_blacklisted(self.payload[api_settings.JTI_CLAIM])
+        return result
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token['email'] = user.email
+        token['full_name'] = user.full_name
+        token['is_active'] = user.is_active
+        token['ver'] = user.token_version
+        return token
+
+
+class EventStreamToken(AccessToken):
+    """
+    Token for GET /api/events/?token=..., for clients that cannot set an Authorization
+    header (the browser EventSource). Its token_type is not "access", so no other
+    endpoint accepts it, and it is only checked when the stream opens.
+    """
+    token_type = 'events'
+    lifetime = EVENT_STREAM_TOKEN_LIFETIME
+
+    @classmethod
+    def for_access_token(cls, access_token):
+        token = cls()
+        for claim in IDENTITY_CLAIMS:
+            if claim in access_token:
+                token[claim] = access_token[claim]
+        return token
+
+
+def token_state_key(user_id):
+    return f'accounts:token_state:{user_id}'
+
+
+def get_token_state(user_id):
+    """Return (token_version, is_active) for `user_id`, or None if the user is gone."""
+    key = token_state_key(user_id)
+    state = cache.get(key)
+    if state is None:
+        state = User.objects.filter(pk=user_id).values_list('token_version', 'is_active').first()
+        if state is None:
+            return None
+        cache.set(key, tuple(state), TOKEN_STATE_TIMEOUT)
+    return tuple(state)
+
+
+async def aget_token_state(user_id):
+    """Async twin of `get_token_state`."""
+    key = token_state_key(user_id)
+    state = await cache.aget(key)
+    if state is None:
+        state = await User.objects.filter(pk=user_id).values_list('token_version', 'is_active').afirst()
+        if state is None:
+            return None
+        await cache.aset(key, tuple(state), TOKEN_STATE_TIMEOUT)
+    return tuple(state)
+
+
+def forget_token_state(user_id):
+    cache.delete(token_state_key(user_id))
+
+
+def revoke_tokens(user):
+    """Invalidate every access token issued to `user` so far."""
+    User.objects.filter(pk=user.pk).update(token_version=F('token_version') + 1)
+    forget_token_state(user.pk)
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import SignupView, LoginView, ProfileView, LogoutView
+from .views import SignupView, LoginView, ProfileView, LogoutView, FollowView, UserSearchView
 from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
@@ -10,5 +10,7 @@ urlpatterns = [
     path('profile/', ProfileView.as_view(), name='profile'),
     path('login/', LoginView.as_view(), name='login'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'), 
+    path('users/search/', UserSearchView.as_view(), name='user-search'),
+    path('users/<int:user_id>/follow/', FollowView.as_view(), name='user-follow'),
 
 ]
\ No newline at end of file
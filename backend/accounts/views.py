@@ -1,8 +1,26 @@
 from rest_framework import status, generics, permissions
 from rest_framework.response import Response
+from rest_framework.throttling import BaseThrottle
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import get_user_instance
+from .backends import HashPoolBusy, busy_raises
+from .throttling import login_slot
+from .tokens import ClaimsRefreshToken, revoke_tokens
 from django.contrib.auth import authenticate, get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.core.files.storage import default_storage
+from backend_main.conditional import make_etag, not_modified, set_validators
+from backend_main.imaging import discard_variants, schedule_variants, thumbnail_name
+from backend_main.replicas import ReplicaRoutingMixin
+from posts.realtime import announce_follow
+from posts.timeline import backfill_timeline, follower_removed, remove_from_timeline
+from .models import Follow
+from .payloads import PROFILE_COLUMNS, profile_payload
+from .search import search_users
 from .serializers import SignupSerializer, LoginSerializer, UserProfileSerializer
 
 User = get_user_model()
@@ -21,7 +39,7 @@ class SignupView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception = True )
         user = serializer.save()
-
+        schedule_variants(user, 'profile_picture')
         
         return Response({
             'message': 'User registered successfully',
@@ -43,12 +61,20 @@ class LoginView(APIView):
         email = serializer.validated_data['email'].lower()
         password = serializer.validated_data['password']
         
-        # Authenticate user using Django's built-in authentication
-        user = authenticate(request, username=email, password=password)
+        # Authenticate user using Django's built-in authentication; the password hash
+        # is checked in accounts.backends' process pool, not on this worker
+        try:
+            with login_slot(BaseThrottle().get_ident(request), email), busy_raises():
+                user = authenticate(request, username=email, password=password)
+        except HashPoolBusy:
+            return Response({
+                'error': 'Login is temporarily unavailable, please try again'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'})
         
         if user is not None:
             # Generate JWT tokens
-            refresh = RefreshToken.for_user(user)
+            # Identity claims let StatelessJWTAuthentication skip the users SELECT
+            refresh = ClaimsRefreshToken.for_user(user)
             return Response({
                 'message': 'Login successful',
                 'user': UserProfileSerializer(user, context={'request': request}).data,
@@ -63,24 +89,36 @@ class LoginView(APIView):
             }, status=status.HTTP_401_UNAUTHORIZED)
 
 
-class ProfileView(generics.RetrieveUpdateAPIView):
+class ProfileView(ReplicaRoutingMixin, generics.RetrieveUpdateAPIView):
     """
     API endpoint for viewing and updating user profile
-    GET /api/profile/
+    GET /api/profile/   (If-None-Match supported: 304 when the client's copy is current)
     PATCH /api/profile/
     """
     serializer_class = UserProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
-        return self.request.user
+        # The request user is built from token claims; profile reads/updates need the full row
+        return get_user_instance(self.request.user)
     
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        return Response({
-            'user': serializer.data
+        # Read-only: one .values() row and a plain dict instead of instance + serializer
+        row = User.objects.filter(pk=request.user.pk).values(*PROFILE_COLUMNS, 'updated_at').first()
+        if row is None:
+            raise Http404
+        # posts_count is changed with update(), which leaves updated_at alone
+        etag = make_etag(request, row['updated_at'], row['posts_count'])
+        response = not_modified(request, etag) or Response({
+            'user': profile_payload(row, request)
         }, status=status.HTTP_200_OK)
+        return set_validators(response, etag, row['updated_at'])
+    
+    def perform_update(self, serializer):
+        if 'profile_picture' in serializer.validated_data:
+            # The old picture's variants go in the same save as the new picture
+            discard_variants(serializer.instance, 'profile_picture')
+        serializer.save()
     
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -95,6 +133,8 @@ class ProfileView(generics.RetrieveUpdateAPIView):
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
         updated_user = serializer.instance
+        if 'profile_picture' in serializer.validated_data:
+            schedule_variants(updated_user, 'profile_picture')
         
         return Response({
             'message': 'Profile updated successfully',
@@ -106,6 +146,7 @@ class LogoutView(APIView):
     """
     API endpoint for user logout
     POST /api/logout/
+    POST /api/logout/ {"all_devices": true} also revokes every access token issued so far
     """
     permission_classes = [permissions.IsAuthenticated]
     
@@ -113,8 +154,10 @@ class LogoutView(APIView):
         try:
             refresh_token = request.data.get("refresh")
             if refresh_token:
-                token = RefreshToken(refresh_token)
+                token = ClaimsRefreshToken(refresh_token)
                 token.blacklist()
+            if request.data.get("all_devices"):
+                revoke_tokens(request.user)
             
             return Response({
                 'message': 'Logout successful'
@@ -122,4 +165,82 @@ class LogoutView(APIView):
         except Exception as e:
             return Response({
                 'error': 'Invalid token'
-            }, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+
+class FollowView(APIView):
+    """
+    API endpoint for following / unfollowing a user
+    POST /api/users/<user_id>/follow/
+    DELETE /api/users/<user_id>/follow/
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, user_id):
+        target = get_object_or_404(User, pk=user_id)
+        if target.pk == request.user.pk:
+            return Response({
+                'error': 'You cannot follow yourself'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            _, created = Follow.objects.get_or_create(follower_id=request.user.pk, following=target)
+            if created:
+                User.objects.filter(pk=target.pk).update(followers_count=F('followers_count') + 1)
+                announce_follow(request.user.pk, target.pk, True)
+        if created:
+            backfill_timeline(request.user, target)
+
+        target.refresh_from_db(fields=['followers_count'])
+        return Response({
+            'following': True,
+            'followers_count': target.followers_count,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    def delete(self, request, user_id):
+        target = get_object_or_404(User, pk=user_id)
+
+        with transaction.atomic():
+            deleted, _ = Follow.objects.filter(follower_id=request.user.pk, following=target).delete()
+            if deleted:
+                User.objects.filter(pk=target.pk).update(followers_count=Greatest(F('followers_count') - 1, 0))
+                # Read under the row lock the UPDATE holds, so exactly one unfollow sees a crossing
+                target.refresh_from_db(fields=['followers_count'])
+                follower_removed(target)
+                announce_follow(request.user.pk, target.pk, False)
+        if deleted:
+            remove_from_timeline(request.user, target)
+
+        target.refresh_from_db(fields=['followers_count'])
+        return Response({
+            'following': False,
+            'followers_count': target.followers_count,
+        }, status=status.HTTP_200_OK)
+
+
+class UserSearchView(APIView):
+    """
+    API endpoint for user autocomplete (mentions, follows)
+    GET /api/users/search/?q=<name or email prefix>&limit=<n>
+    Returns a compact projection: id, full_name and a thumbnail URL.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    default_limit = 8
+    max_limit = 20
+
+    def get(self, request):
+        terms = request.query_params.get('q', '').strip()[:100]
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+
+        results = []
+        for row in search_users(terms, max(limit, 1)):
+            name = thumbnail_name(row['profile_picture_variants'], row['profile_picture'])
+            results.append({
+                'id': row['id'],
+                'full_name': row['full_name'],
+                'thumbnail_url': request.build_absolute_uri(default_storage.url(name)) if name else None,
+            })
+        return Response({'results': results}, status=status.HTTP_200_OK)
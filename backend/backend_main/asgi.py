@@ -2,6 +2,8 @@
 ASGI config for backend_main project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The async views under /api/async/ and the server-sent events stream
+(/api/events/, see posts.realtime) need to be served through it.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -10,7 +12,16 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from django.core.signals import request_started
+
+from backend_main.postgresql_pool import warm_up_on_first_request
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_main.settings')
+# Persistent connections pile up under ASGI (see settings.py); the pool reuses them
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
+
+# Open the pooled database connections in each worker, not here: with a preloading
+# server this module is imported before the workers are forked
+request_started.connect(warm_up_on_first_request, dispatch_uid='warm_up_connections')
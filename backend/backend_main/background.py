@@ -0,0 +1,49 @@
+"""
+Work that runs after the response, in a small per-process thread pool.
+
+`run_after_commit(fn, *args)` queues `fn(*args)` for when the current transaction
+commits (right away outside one), so the worker never looks for rows the request
+has not committed yet. The request does not wait for it. Used for image variants
+(backend_main.imaging) and timeline fan-out (posts.timeline).
+
+Tasks live in process memory, so a task queued when a process dies is lost. Every
+task here must therefore be safe to lose or to run twice. Variants can be
+regenerated, and timeline rows are inserted with ignore_conflicts.
+
+With BACKGROUND_TASKS_EAGER (for tests) the task runs inline when the transaction
+commits.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'BACKGROUND_WORKERS', 2),
+    thread_name_prefix='background',
+)
+
+
+def run_after_commit(fn, *args):
+    """Run `fn(*args)` in the background pool once the current transaction commits."""
+    transaction.on_commit(lambda: _submit(fn, args))
+
+
+def _submit(fn, args):
+    if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+        fn(*args)
+    else:
+        _executor.submit(_run, fn, args)
+
+
+def _run(fn, args):
+    try:
+        fn(*args)
+    except Exception:
+        logger.exception('Background task %s%r failed', fn.__qualname__, args)
+    finally:
+        # Worker threads get their own connections; don't leak them
+        close_old_connections()
@@ -0,0 +1,191 @@
+"""
+Publish/subscribe broker for server-push endpoints.
+
+Publishers call `broker.publish(channel, message)` from any thread (request
+threads, on_commit callbacks, timers). Subscribers are coroutines on the ASGI
+event loop: `broker.subscribe(channels)` returns a `Subscription` whose bounded
+asyncio queue is filled on the subscriber's own loop. A subscriber that falls
+behind loses messages instead of holding memory.
+
+The backend is chosen by REALTIME_BROKER_BACKEND:
+  - LocalBroker:    fan-out inside this process only (one ASGI worker),
+  - PostgresBroker: every publish goes through PostgreSQL NOTIFY, and every
+                    process LISTENs and fans out to its own subscribers, so
+                    several workers or nodes can share one stream.
+Messages must be JSON-serializable.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = getattr(settings, 'REALTIME_QUEUE_SIZE', 256)
+
+
+class Subscription:
+    """Messages for a set of channels, queued on the event loop that subscribed."""
+
+    def __init__(self, broker, channels, maxsize=QUEUE_SIZE):
+        self.broker = broker
+        self.channels = frozenset(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def put(self, channel, message):
+        # Runs on self.loop
+        try:
+            self.queue.put_nowait((channel, message))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def get(self):
+        """Wait for the next (channel, message)."""
+        return await self.queue.get()
+
+    def set_channels(self, channels):
+        """Listen on `channels` from now on; messages already queued are kept."""
+        self.broker.resubscribe(self, channels)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+def _deliver(subscriptions, channel, message):
+    for subscription in subscriptions:
+        subscription.put(channel, message)
+
+
+class LocalBroker:
+    """In-process fan-out: publishers and subscribers must share this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = defaultdict(set)
+
+    def subscribe(self, channels, maxsize=QUEUE_SIZE):
+        """Subscribe the running event loop to `channels`; close() the result when done."""
+        subscription = Subscription(self, channels, maxsize)
+        with self._lock:
+            for channel in subscription.channels:
+                self._channels[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._remove(subscription, subscription.channels)
+
+    def resubscribe(self, subscription, channels):
+        channels = frozenset(channels)
+        with self._lock:
+            self._remove(subscription, subscription.channels - channels)
+            for channel in channels - subscription.channels:
+                self._channels[channel].add(subscription)
+            subscription.channels = channels
+
+    def _remove(self, subscription, channels):
+        for channel in channels:
+            subscribers = self._channels.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[channel]
+
+    def publish(self, channel, message):
+        self.dispatch(channel, message)
+
+    def dispatch(self, channel, message):
+        """Hand `message` to this process's subscribers of `channel`."""
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        # One thread-safe callback per event loop, not per subscriber
+        by_loop = defaultdict(list)
+        for subscription in subscribers:
+            by_loop[subscription.loop].append(subscription)
+        for loop, group in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver, group, channel, message)
+            except RuntimeError:
+                # The loop is closed; its subscriptions are gone with it
+                for subscription in group:
+                    self.unsubscribe(subscription)
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Relays every message through PostgreSQL NOTIFY on one channel. Each process
+    LISTENs on a dedicated connection (started on its first subscription) and
+    dispatches to its local subscribers. Payloads are limited to 8000 bytes by
+    PostgreSQL. Uses psycopg2's notification API.
+    """
+    notify_channel = 'realtime_events'
+    poll_interval = 5
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        super().__init__()
+        self.using = using
+        self._publish_lock = threading.Lock()
+        self._publish_connection = None
+        self._listener = None
+
+    def _connect(self):
+        # A dedicated driver connection: never one from the pool (backend_main.postgresql_pool)
+        wrapper = connections[self.using]
+        connection = wrapper.Database.connect(**wrapper.get_connection_params())
+        connection.autocommit = True
+        return connection
+
+    def subscribe(self, channels, maxsize=QUEUE_SIZE):
+        if self._listener is None:
+            with self._lock:
+                if self._listener is None:
+                    self._listener = threading.Thread(
+                        target=self._listen, name='realtime-listener', daemon=True,
+                    )
+                    self._listener.start()
+        return super().subscribe(channels, maxsize)
+
+    def publish(self, channel, message):
+        payload = json.dumps([channel, message], separators=(',', ':'))
+        with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publish_connection is None or self._publish_connection.closed:
+                        self._publish_connection = self._connect()
+                    with self._publish_connection.cursor() as cursor:
+                        cursor.execute('SELECT pg_notify(%s, %s)', [self.notify_channel, payload])
+                    return
+                except Exception:
+                    # Stale connection (database restart): reconnect once, then give up
+                    self._publish_connection = None
+                    if attempt:
+                        logger.exception('Could not publish a realtime message on %s', channel)
+
+    def _listen(self):
+        while True:
+            try:
+                connection = self._connect()
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.notify_channel}')
+                while True:
+                    if select.select([connection], [], [], self.poll_interval) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        channel, message = json.loads(connection.notifies.pop(0).payload)
+                        self.dispatch(channel, message)
+            except Exception:
+                logger.exception('Realtime listener lost its connection; reconnecting')
+                time.sleep(1)
+
+
+broker = import_string(getattr(settings, 'REALTIME_BROKER_BACKEND', 'backend_main.broker.LocalBroker'))()
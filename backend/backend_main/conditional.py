@@ -0,0 +1,52 @@
+"""
+Conditional GET for read endpoints (ETag / If-None-Match).
+
+A view reads the few columns its payload's version depends on (updated_at and
+the denormalized counters), builds an ETag from them and asks `not_modified()`
+whether the client's copy is still current. Only when it is not is the payload
+built:
+
+    etag = make_etag(request, row['updated_at'], row['likes_count'])
+    response = not_modified(request, etag) or Response(build_payload(row))
+    return set_validators(response, etag, row['updated_at'])
+
+Last-Modified is sent for information only. Counters change through
+`QuerySet.update()`, which does not touch updated_at, so If-Modified-Since
+cannot tell whether a payload is current. Only the ETag is used to decide on
+a 304.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(request, *parts):
+    """
+    Strong ETag over `parts` and the representation: host and query string (absolute
+    URLs, ?fields=) and the negotiated renderer (JSON vs the browsable API).
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    key = repr((
+        request.get_host(), request.get_full_path(), getattr(renderer, 'format', None), *parts,
+    ))
+    return quote_etag(hashlib.md5(key.encode(), usedforsecurity=False).hexdigest())
+
+
+def not_modified(request, etag):
+    """A 304 (or 412 for a failed If-Match) for the client's validators, else None."""
+    return get_conditional_response(request, etag=etag)
+
+
+def set_validators(response, etag, last_modified=None):
+    """
+    Add ETag (and Last-Modified) to a 200 or 304. Clients must revalidate, and shared
+    caches must not store the payload, which depends on the caller's credentials.
+    """
+    if etag is not None:
+        response.headers['ETag'] = etag
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Authorization', 'Accept'))
+    return response
@@ -0,0 +1,148 @@
+"""
+Background image pipeline for uploaded post images and profile pictures.
+
+After an upload is committed, the original is handed to the background pool
+(backend_main.background), which
+  - re-encodes the original in place if it is larger than IMAGE_MAX_DIMENSION,
+  - writes resized WebP and JPEG variants for each width in IMAGE_VARIANT_WIDTHS,
+  - stores the variant names on the model (`<field>_variants` JSON map).
+The upload request never waits for any of it. Serializers expose the map as a
+srcset-style `{format: {width: url}}` dict; it stays empty until the worker is done.
+Replacing or clearing an image empties the map in the same save
+(`discard_variants`), so clients never get the old image's variants for the new one.
+"""
+import os
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .background import run_after_commit
+
+VARIANT_WIDTHS = tuple(getattr(settings, 'IMAGE_VARIANT_WIDTHS', (150, 600, 1200)))
+VARIANT_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+MAX_DIMENSION = getattr(settings, 'IMAGE_MAX_DIMENSION', 2048)
+QUALITY = getattr(settings, 'IMAGE_VARIANT_QUALITY', 80)
+# Oversized originals are re-encoded in the format their name says; anything else becomes JPEG
+ORIGINAL_FORMATS = {'.png': 'PNG', '.webp': 'WEBP'}
+
+
+def schedule_variants(instance, field_name):
+    """Queue variant generation for `instance.<field_name>` once the current transaction commits."""
+    if not getattr(instance, field_name):
+        return
+    run_after_commit(process_variants, instance._meta.label, instance.pk, field_name)
+
+
+def discard_variants(instance, field_name):
+    """
+    Empty `instance.<field_name>_variants` before the source image is replaced or
+    cleared; the caller's save() writes it together with the new value. The old
+    variant files are deleted once that transaction commits.
+    """
+    variants_field = f'{field_name}_variants'
+    names = [name for names in (getattr(instance, variants_field) or {}).values() for name in names.values()]
+    setattr(instance, variants_field, {})
+    if names:
+        run_after_commit(_delete_files, getattr(instance, field_name).storage, names)
+
+
+def build_srcset(variants, request=None):
+    """Turn a stored `{format: {width: name}}` map into `{format: {width: url}}`."""
+    if not variants:
+        return {}
+    from django.core.files.storage import default_storage
+
+    srcset = {}
+    for fmt, names in variants.items():
+        urls = {}
+        for width, name in names.items():
+            url = default_storage.url(name)
+            urls[width] = request.build_absolute_uri(url) if request else url
+        srcset[fmt] = urls
+    return srcset
+
+
+def thumbnail_name(variants, original=None, fmt='webp'):
+    """Storage name of the smallest `fmt` variant, or `original` until variants exist."""
+    names = (variants or {}).get(fmt)
+    if names:
+        return names[min(names, key=int)]
+    return original or None
+
+
+def process_variants(label, pk, field_name):
+    model = apps.get_model(label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        return
+    storage = field_file.storage
+    variants_field = f'{field_name}_variants'
+
+    with storage.open(field_file.name, 'rb') as fh:
+        image = Image.open(fh)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    update_fields = [variants_field]
+
+    # Size-capped re-encoding of the original
+    if max(image.size) > MAX_DIMENSION:
+        image.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.Resampling.LANCZOS)
+        fmt = ORIGINAL_FORMATS.get(os.path.splitext(field_file.name)[1].lower(), 'JPEG')
+        old_name = field_file.name
+        new_name = storage.save(old_name, ContentFile(_encode(image, fmt)))
+        storage.delete(old_name)
+        setattr(instance, field_name, new_name)
+        field_file = getattr(instance, field_name)
+        update_fields.append(field_name)
+
+    stem = os.path.splitext(field_file.name)[0]
+    dirname, basename = os.path.split(stem)
+    variants = {ext: {} for ext in VARIANT_FORMATS}
+    for width in VARIANT_WIDTHS:
+        if width >= image.width and width != VARIANT_WIDTHS[0]:
+            continue  # never upscale; the smallest width is always produced
+        resized = image.copy()
+        resized.thumbnail((width, width * 4), Image.Resampling.LANCZOS)
+        for ext, fmt in VARIANT_FORMATS.items():
+            name = os.path.join(dirname, 'variants', f'{basename}_{width}.{ext}')
+            variants[ext][str(width)] = storage.save(name, ContentFile(_encode(resized, fmt)))
+
+    # Drop the variants of a previous upload, if any
+    for names in (getattr(instance, variants_field) or {}).values():
+        for name in names.values():
+            storage.delete(name)
+
+    setattr(instance, variants_field, variants)
+    # auto_now fields are only written when listed; the payload changed, so its
+    # updated_at (and the conditional-GET validators built on it) must move too
+    if any(field.name == 'updated_at' for field in instance._meta.concrete_fields):
+        update_fields.append('updated_at')
+    # save() so post_save fires and the cached payloads are invalidated
+    instance.save(update_fields=update_fields)
+
+
+def _delete_files(storage, names):
+    for name in names:
+        storage.delete(name)
+
+
+def _encode(image, fmt):
+    if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    elif fmt == 'WEBP' and image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if image.has_transparency_data else 'RGB')
+    buffer = BytesIO()
+    options = {'optimize': True}
+    if fmt in ('JPEG', 'WEBP'):
+        options['quality'] = QUALITY
+    if fmt == 'JPEG':
+        options['progressive'] = True
+    image.save(buffer, format=fmt, **options)
+    return buffer.getvalue()
@@ -0,0 +1,307 @@
+"""
+Per-request instrumentation: SQL query count, DB time, connection pool wait,
+serializer time, render time and response size.
+
+`RequestMetricsMiddleware` opens a `RequestStats` for every request in a context
+variable. That variable is visible from sync_to_async threads too. On the way out
+the middleware
+  - adds a `Server-Timing` header (when SERVER_TIMING_HEADER is on),
+  - records the request in the process-local `registry`, which `metrics_view`
+    serves in the Prometheus text format,
+  - logs a warning when a view declares `query_budget` and a read (GET/HEAD)
+    used more queries than that. Writes are not budgeted: they also maintain
+    counters, timelines and caches.
+
+Queries are counted by a DB execute wrapper. It is installed on every connection
+when the connection is created, so queries run from worker threads are counted
+as well. Time spent waiting for a pooled connection (backend_main.postgresql_pool)
+is the `pool` span, and /metrics adds each pool's gauges and counters.
+
+/metrics is served only to scrapers that send `Authorization: Bearer
+<METRICS_TOKEN>`. Without a token configured it is served only in DEBUG, and
+only to loopback clients. Behind a proxy REMOTE_ADDR is the proxy's address, so
+it cannot be trusted by itself.
+"""
+import hmac
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+BUDGETED_METHODS = ('GET', 'HEAD')
+
+SERVER_TIMING_HEADER = getattr(settings, 'SERVER_TIMING_HEADER', settings.DEBUG)
+METRICS_TOKEN = getattr(settings, 'METRICS_TOKEN', '')
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1')
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_current = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """Counters for one request; spans are in seconds."""
+
+    __slots__ = ('queries', 'spans', '_open')
+
+    def __init__(self):
+        self.queries = 0
+        self.spans = defaultdict(float)
+        self._open = set()
+
+    def add(self, name, seconds):
+        self.spans[name] += seconds
+
+
+def current_stats():
+    """The RequestStats of the request being handled, or None outside a request."""
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    """
+    Add the time spent in the block to the current request's `name` span.
+    Nested spans of the same name only count once (the outermost).
+    """
+    stats = _current.get()
+    if stats is None or name in stats._open:
+        yield
+        return
+    stats._open.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats._open.discard(name)
+        stats.add(name, time.perf_counter() - start)
+
+
+class TimedSerializerMixin:
+    """Serializer mixin: time spent in `to_representation` goes to the `serialize` span."""
+
+    def to_representation(self, instance):
+        with span('serialize'):
+            return super().to_representation(instance)
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.add('db', time.perf_counter() - start)
+
+
+def _install_query_recorder(sender, connection, **kwargs):
+    # connection_created fires again after a reconnect; install the wrapper once
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(_install_query_recorder)
+
+
+class MetricsRegistry:
+    """Process-local aggregates per (endpoint, method), rendered as Prometheus text."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = defaultdict(int)      # (endpoint, method, status) -> count
+        self._series = {}                      # (endpoint, method) -> dict of sums
+        self._buckets = {}                     # (endpoint, method) -> bucket counts
+
+    def observe(self, endpoint, method, status, duration, stats, size, over_budget):
+        key = (endpoint, method)
+        with self._lock:
+            self._requests[(endpoint, method, status)] += 1
+            series = self._series.setdefault(key, defaultdict(float))
+            series['duration'] += duration
+            series['count'] += 1
+            series['queries'] += stats.queries
+            series['db'] += stats.spans.get('db', 0.0)
+            series['pool'] += stats.spans.get('pool', 0.0)
+            series['serialize'] += stats.spans.get('serialize', 0.0)
+            series['render'] += stats.spans.get('render', 0.0)
+            series['bytes'] += size
+            series['over_budget'] += over_budget
+            buckets = self._buckets.setdefault(key, [0] * len(DURATION_BUCKETS))
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    buckets[i] += 1
+
+    def render(self):
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            family('http_requests_total', 'counter', 'Requests handled, by endpoint, method and status.')
+            for (endpoint, method, status), count in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{{{_labels(endpoint, method)},status="{status}"}} {count}')
+
+            family('http_request_duration_seconds', 'histogram', 'Time spent handling the request.')
+            for key, series in sorted(self._series.items()):
+                labels = _labels(*key)
+                for bound, count in zip(DURATION_BUCKETS, self._buckets[key]):
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {int(series["count"])}')
+                lines.append(f'http_request_duration_seconds_sum{{{labels}}} {series["duration"]:.6f}')
+                lines.append(f'http_request_duration_seconds_count{{{labels}}} {int(series["count"])}')
+
+            for name, field, help_text in (
+                ('http_request_db_queries_total', 'queries', 'SQL queries executed.'),
+                ('http_request_db_seconds_total', 'db', 'Time spent executing SQL.'),
+                ('http_request_db_pool_wait_seconds_total', 'pool', 'Time spent waiting for a pooled connection.'),
+                ('http_request_serialize_seconds_total', 'serialize', 'Time spent in serializers.'),
+                ('http_request_render_seconds_total', 'render', 'Time spent rendering responses.'),
+                ('http_response_bytes_total', 'bytes', 'Response body bytes (non-streaming responses).'),
+                ('http_request_query_budget_exceeded_total', 'over_budget',
+                 "Requests that ran more queries than the view's query_budget."),
+            ):
+                family(name, 'counter', help_text)
+                for key, series in sorted(self._series.items()):
+                    value = series[field]
+                    value = f'{value:.6f}' if field in ('db', 'pool', 'serialize', 'render') else int(value)
+                    lines.append(f'{name}{{{_labels(*key)}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def render_pool_metrics():
+    """Prometheus text for the connection pools of this process (empty without pools)."""
+    pools = []
+    for alias in connections:
+        pool = getattr(connections[alias], 'connection_pool', None)
+        if pool is not None:
+            pools.append((alias, pool.stats()))
+    if not pools:
+        return ''
+    lines = []
+    for name, kind, help_text, field in (
+        ('db_pool_connections_idle', 'gauge', 'Idle pooled connections.', 'idle'),
+        ('db_pool_connections_busy', 'gauge', 'Pooled connections checked out.', 'busy'),
+        ('db_pool_max_size', 'gauge', 'Most connections the pool opens.', 'max_size'),
+        ('db_pool_checkouts_total', 'counter', 'Connections handed out.', 'checkouts'),
+        ('db_pool_waits_total', 'counter', 'Checkouts that found every connection busy.', 'waits'),
+        ('db_pool_wait_seconds_total', 'counter', 'Time spent waiting for a connection.', 'wait_seconds'),
+        ('db_pool_timeouts_total', 'counter', 'Checkouts that gave up waiting.', 'timeouts'),
+        ('db_pool_connections_opened_total', 'counter', 'New database connections opened.', 'connections_opened'),
+    ):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for alias, stats in pools:
+            value = f'{stats[field]:.6f}' if field == 'wait_seconds' else stats[field]
+            lines.append(f'{name}{{database="{alias}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def _labels(endpoint, method):
+    endpoint = endpoint.replace('\\', '\\\\').replace('"', '\\"')
+    return f'endpoint="{endpoint}",method="{method}"'
+
+
+registry = MetricsRegistry()
+
+
+def _metrics_allowed(request):
+    if METRICS_TOKEN:
+        scheme, _, token = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        return scheme.lower() == 'bearer' and hmac.compare_digest(token.encode(), METRICS_TOKEN.encode())
+    return settings.DEBUG and request.META.get('REMOTE_ADDR') in LOOPBACK_ADDRESSES
+
+
+def metrics_view(request):
+    """GET /metrics: this process's request metrics in the Prometheus text format."""
+    if not _metrics_allowed(request):
+        raise Http404
+    return HttpResponse(
+        registry.render() + render_pool_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+class RequestMetricsMiddleware:
+    """Collects RequestStats for each request; see the module docstring."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats, token, start = self._begin()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats, start)
+
+    async def __acall__(self, request):
+        stats, token, start = self._begin()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats, start)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time that separately
+        stats = _current.get()
+        if stats is not None:
+            start = time.perf_counter()
+            response.add_post_render_callback(lambda r: stats.add('render', time.perf_counter() - start))
+        return response
+
+    def _begin(self):
+        stats = RequestStats()
+        return stats, _current.set(stats), time.perf_counter()
+
+    def _finish(self, request, response, stats, start):
+        duration = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        endpoint = match.route if match else 'unmatched'
+        size = 0 if response.streaming else len(response.content)
+
+        budget = None
+        if match and request.method in BUDGETED_METHODS:
+            budget = getattr(getattr(match.func, 'view_class', None), 'query_budget', None)
+        over_budget = budget is not None and stats.queries > budget
+        if over_budget:
+            logger.warning(
+                "%s %s ran %d SQL queries (budget %d)", request.method, request.path, stats.queries, budget
+            )
+
+        registry.observe(endpoint, request.method, response.status_code, duration, stats, size, over_budget)
+        if SERVER_TIMING_HEADER:
+            response['Server-Timing'] = server_timing(stats, duration)
+        return response
+
+
+def server_timing(stats, duration):
+    """Format `stats` as a Server-Timing header value (durations in milliseconds)."""
+    parts = [f'db;dur={stats.spans.get("db", 0.0) * 1000:.1f};desc="{stats.queries} queries"']
+    for name in ('pool', 'serialize', 'render'):
+        if name in stats.spans:
+            parts.append(f'{name};dur={stats.spans[name] * 1000:.1f}')
+    parts.append(f'total;dur={duration * 1000:.1f}')
+    return ', '.join(parts)
@@ -0,0 +1,57 @@
+"""
+Migration operations shared by the apps.
+
+`PostgreSQLOnly` wraps an operation whose SQL only PostgreSQL understands: a
+trigger, a GIN/trigram index, CREATE INDEX CONCURRENTLY. The migration state
+always changes, so the models and the migration history stay in sync. The
+database is only changed on PostgreSQL, so `migrate` (and the test database
+setup) also works on SQLite. There, those indexes and the search trigger
+simply don't exist, and the features that need them (posts.search,
+accounts.search) are PostgreSQL-only.
+"""
+from django.db.migrations.operations.base import Operation
+
+
+class PostgreSQLOnly(Operation):
+
+    def __init__(self, operation):
+        self.operation = operation
+
+    @property
+    def reversible(self):
+        return self.operation.reversible
+
+    @property
+    def reduces_to_sql(self):
+        return self.operation.reduces_to_sql
+
+    @property
+    def atomic(self):
+        return self.operation.atomic
+
+    def deconstruct(self):
+        return self.__class__.__qualname__, [self.operation], {}
+
+    def state_forwards(self, app_label, state):
+        self.operation.state_forwards(app_label, state)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            self.operation.database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            self.operation.database_backwards(app_label, schema_editor, from_state, to_state)
+
+    def describe(self):
+        return f'{self.operation.describe()} (PostgreSQL only)'
+
+    @property
+    def migration_name_fragment(self):
+        return self.operation.migration_name_fragment
+
+    def references_model(self, name, app_label):
+        return self.operation.references_model(name, app_label)
+
+    def references_field(self, model_name, name, app_label):
+        return self.operation.references_field(model_name, name, app_label)
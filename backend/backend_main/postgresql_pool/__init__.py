@@ -0,0 +1,68 @@
+"""
+PostgreSQL backend with a per-process connection pool for psycopg2
+(ENGINE 'backend_main.postgresql_pool').
+
+Django's own pool (OPTIONS['pool']) needs psycopg 3. This backend keeps the
+psycopg2 driver and adds a small pool (`base.ConnectionPool`) through public
+hooks only: DatabaseWrapper.get_new_connection() checks a connection out, and
+PooledConnection.close(), which Django calls at the end of the request, checks
+it back in after rolling back anything left open. The pool is opt-in
+(settings.DB_POOL_MAX_SIZE); persistent connections are the default. With a
+'POOL' entry in the database settings:
+
+    'CONN_MAX_AGE': 0,        # required: connections go back to the pool after each request
+    'CONN_HEALTH_CHECKS': True,
+    'POOL': {'min_size': 2, 'max_size': 20, 'timeout': 10, 'max_idle': 300},
+
+a thread that needs a connection takes an idle one from the pool (or opens a
+new one while fewer than max_size exist), and Django's end-of-request close
+hands it back. Threads never own a connection, so this also works under ASGI,
+where persistent connections do not. A request that finds all max_size
+connections busy waits up to `timeout` seconds, then fails with
+OperationalError. The time spent waiting is recorded in the request's `pool`
+metrics span (backend_main.metrics). Pool gauges and counters are served on
+/metrics.
+
+Without 'POOL' the backend behaves exactly like django.db.backends.postgresql.
+"""
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+_warmed_pid = None  # the process whose pools warm_up_on_first_request() opened
+
+
+def warm_up_connections():
+    """
+    Open the `min_size` connections of every pooled alias in use (the primary
+    and REPLICA_DATABASES). Call it once per worker
+    process at startup (see backend_main.wsgi / asgi), not before a fork: the
+    connections must not be shared between processes. Failures are logged, and
+    the pool then connects on demand.
+    """
+    from django.conf import settings
+    from django.db import DEFAULT_DB_ALIAS, connections
+
+    for alias in (DEFAULT_DB_ALIAS, *getattr(settings, 'REPLICA_DATABASES', ())):
+        pool = getattr(connections[alias], 'connection_pool', None)
+        if pool is None:
+            continue
+        try:
+            pool.open()
+        except Exception:
+            logger.warning('Could not warm up the %s connection pool', alias, exc_info=True)
+
+
+def warm_up_on_first_request(**kwargs):
+    """
+    request_started receiver (connected in backend_main.wsgi / asgi): runs
+    warm_up_connections() on the first request of each process. At import time
+    the server may not have forked its workers yet (gunicorn --preload).
+    """
+    global _warmed_pid
+    pid = os.getpid()
+    if _warmed_pid == pid:
+        return
+    _warmed_pid = pid
+    warm_up_connections()
@@ -0,0 +1,260 @@
+import threading
+import time
+
+import psycopg2.extensions
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base as postgresql, creation
+
+from backend_main.metrics import current_stats
+
+# An idle connection older than this is tested with SELECT 1 before being reused
+# (when CONN_HEALTH_CHECKS is on). Newer ones were fine a moment ago.
+HEALTH_CHECK_AFTER = 5
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """No connection became available within the pool's timeout."""
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """
+    A psycopg2 connection that knows its pool. While checked out, close() hands
+    it back to the pool, so Django's end-of-request close returns it; otherwise
+    close() really closes it.
+    """
+    _pool = None
+    _checked_out = False
+    _released_at = 0.0
+
+    def close(self):
+        if self._checked_out:
+            self._checked_out = False
+            self._pool.putconn(self)
+        else:
+            super().close()
+
+
+class ConnectionPool:
+    """
+    Up to `max_size` connections shared by the threads of one process. Idle
+    connections are reused most recently used first and dropped when idle for
+    more than `max_idle` seconds, so the pool shrinks again after a burst.
+    """
+
+    def __init__(self, connect, min_size=2, max_size=20, timeout=10, max_idle=300, check=True):
+        if not 0 <= min_size <= max_size:
+            raise ImproperlyConfigured('POOL requires 0 <= min_size <= max_size.')
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.check = check
+        self._connect = connect
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)  # one per checked-out connection
+        self._idle = []
+        self._opened = False
+        self.closed = False
+        self.busy = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+        self.connections_opened = 0
+
+    def open(self):
+        """Open connections until `min_size` exist (once)."""
+        with self._lock:
+            if self._opened:
+                return
+            self._opened = True
+        while True:
+            with self._lock:
+                if len(self._idle) + self.busy >= self.min_size:
+                    return
+            connection = self._new_connection()
+            connection._released_at = time.monotonic()
+            with self._lock:
+                self._idle.append(connection)
+
+    def getconn(self):
+        start = time.perf_counter()
+        waited = not self._slots.acquire(blocking=False)
+        if waited and not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise PoolTimeout(
+                f'No database connection available within {self.timeout}s '
+                f'({self.max_size} in use); raise POOL max_size or timeout.'
+            )
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.checkouts += 1
+            self.waits += waited
+            self.wait_seconds += elapsed
+            self.busy += 1
+        stats = current_stats()
+        if stats is not None:
+            stats.add('pool', elapsed)
+        try:
+            connection = self._take_idle() or self._new_connection()
+        except BaseException:
+            self._release_slot()
+            raise
+        connection._checked_out = True
+        return connection
+
+    def putconn(self, connection):
+        try:
+            if self.closed or not self._reset(connection):
+                connection.close()
+                return
+            connection._released_at = time.monotonic()
+            with self._lock:
+                self._idle.append(connection)
+        finally:
+            self._release_slot()
+
+    def close(self):
+        """Close the idle connections; busy ones are closed when they come back."""
+        with self._lock:
+            self.closed = True
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'idle': len(self._idle),
+                'busy': self.busy,
+                'max_size': self.max_size,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'wait_seconds': self.wait_seconds,
+                'timeouts': self.timeouts,
+                'connections_opened': self.connections_opened,
+            }
+
+    def _release_slot(self):
+        with self._lock:
+            self.busy -= 1
+        self._slots.release()
+
+    def _new_connection(self):
+        connection = self._connect()
+        connection.autocommit = True
+        connection._pool = self
+        with self._lock:
+            self.connections_opened += 1
+        return connection
+
+    def _take_idle(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                connection = self._idle.pop()
+            idle_for = time.monotonic() - connection._released_at
+            if connection.closed or idle_for > self.max_idle or (
+                self.check and idle_for > HEALTH_CHECK_AFTER and not self._healthy(connection)
+            ):
+                connection.close()
+                continue
+            return connection
+
+    @staticmethod
+    def _healthy(connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except psycopg2.Error:
+            return False
+
+    @staticmethod
+    def _reset(connection):
+        """Make a returned connection reusable; False when it has to be discarded."""
+        if connection.closed:
+            return False
+        try:
+            if connection.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            connection.autocommit = True
+            if connection.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                # A BEGIN sent by hand in autocommit mode, which rollback() does not end
+                with connection.cursor() as cursor:
+                    cursor.execute('ROLLBACK')
+        except psycopg2.Error:
+            return False
+        return connection.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def destroy_test_db(self, *args, **kwargs):
+        # Idle pooled connections would keep the test database from being dropped,
+        # including those of test mirrors (other aliases on the same database)
+        self.connection.close()
+        self.connection.close_connection_pool()
+        for alias, settings_dict in connections.settings.items():
+            if settings_dict['TEST']['MIRROR'] == self.connection.alias:
+                connections[alias].close()
+                getattr(connections[alias], 'close_connection_pool', lambda: None)()
+        super().destroy_test_db(*args, **kwargs)
+
+
+class DatabaseWrapper(postgresql.DatabaseWrapper):
+    """
+    django.db.backends.postgresql with connections taken from `connection_pool`.
+
+    Only get_new_connection() is overridden. A pooled connection is then set up by
+    Django like any new one (autocommit, time zone, role), and Django's close
+    hands it back through PooledConnection.close().
+    """
+    creation_class = DatabaseCreation
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def _pool_key(self):
+        # The test runner renames the database under the same alias
+        return self.alias, self.settings_dict['NAME']
+
+    @property
+    def connection_pool(self):
+        """This alias's ConnectionPool, created on first use; None without 'POOL'."""
+        options = self.settings_dict.get('POOL')
+        if self.alias == NO_DB_ALIAS or not options:
+            return None
+        key = self._pool_key()
+        pool = self._pools.get(key)
+        if pool is not None:
+            return pool
+        if self.settings_dict.get('CONN_MAX_AGE', 0) != 0:
+            raise ImproperlyConfigured("Pooling doesn't support persistent connections (set CONN_MAX_AGE to 0).")
+        params = {**self.get_connection_params(), 'connection_factory': PooledConnection}
+        with self._pools_lock:
+            if key not in self._pools:
+                self._pools[key] = ConnectionPool(
+                    # isolation level and the jsonb loader, as for any new connection
+                    connect=lambda: super(DatabaseWrapper, self).get_new_connection(params),
+                    check=self.settings_dict['CONN_HEALTH_CHECKS'],
+                    **options,
+                )
+            return self._pools[key]
+
+    def get_new_connection(self, conn_params):
+        pool = self.connection_pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        pool.open()
+        return pool.getconn()
+
+    def close_connection_pool(self):
+        """Close this alias's pool; the next connection opens a new one."""
+        with self._pools_lock:
+            pool = self._pools.pop(self._pool_key(), None)
+        if pool is not None:
+            pool.close()
@@ -0,0 +1,244 @@
+"""
+Read-replica routing for the read endpoints (DATABASE_ROUTERS =
+['backend_main.replicas.ReplicaRouter']).
+
+Reads go to the primary (`default`) unless a view opts in. Opting in means
+ReplicaRoutingMixin on a DRF view, or `replica_reads` on an AsyncAPIView. For
+those views, a GET/HEAD/OPTIONS request picks one healthy replica from
+REPLICA_DATABASES after authentication, so token checks stay on the primary.
+Every ORM read of the request is then routed there. Writes, and reads inside a
+transaction, always use the primary.
+
+Read-your-writes: a successful write through those views pins the user to the
+primary for REPLICA_PIN_SECONDS (a `db:pinned:<user>` key in the cache). Keep
+that above REPLICA_MAX_LAG, and use a shared cache with several workers.
+
+Lag: a `ReplicaMonitor` thread measures each replica's replay lag every
+REPLICA_LAG_CHECK_INTERVAL seconds, against the WAL position the primary has
+reached, so a standby that stopped receiving WAL falls behind too. A replica
+more than REPLICA_MAX_LAG seconds behind, or one that does not answer (nor the
+primary), is taken out of rotation until a later check finds it caught up. With no healthy replica, reads fall back to the
+primary. Non-PostgreSQL aliases (e.g. SQLite copies for local testing) report
+no lag.
+
+A replica alias is an ordinary DATABASES entry (settings.py defines `replica`,
+used when DB_REPLICA_HOST is set). In tests, give it 'TEST': {'MIRROR': 'default'}
+so it reads the test database.
+"""
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+REPLICA_DATABASES = tuple(getattr(settings, 'REPLICA_DATABASES', ()))
+REPLICA_MAX_LAG = getattr(settings, 'REPLICA_MAX_LAG', 2)
+REPLICA_LAG_CHECK_INTERVAL = getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 1)
+REPLICA_PIN_SECONDS = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+REPLICA_PIN_CACHE_ALIAS = getattr(settings, 'REPLICA_PIN_CACHE_ALIAS', 'default')
+
+# The primary's current WAL position, read once per check
+PRIMARY_LSN_SQL = "SELECT pg_current_wal_lsn()::text"
+
+# Replay lag in seconds against the primary's position (%s). 0 on a primary and on
+# a standby that has replayed it all (an idle primary would otherwise make
+# pg_last_xact_replay_timestamp() look old). A standby whose WAL receiver stopped
+# still has replayed all it received, so it is measured against the primary, never
+# against its own receive position. Infinity when it has replayed nothing yet.
+LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_replay_lsn() >= %s::pg_lsn THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())::float8, 'Infinity')
+END
+"""
+
+_read_alias = ContextVar('replica_read_alias', default=None)
+
+
+class ReplicaMonitor:
+    """Keeps `healthy`, the replicas whose lag was within `max_lag` at the last check."""
+
+    def __init__(self, aliases, max_lag=REPLICA_MAX_LAG, interval=REPLICA_LAG_CHECK_INTERVAL):
+        self.aliases = tuple(aliases)
+        self.max_lag = max_lag
+        self.interval = interval
+        self.healthy = ()  # nothing until the first check: reads stay on the primary
+        self.lags = {}     # alias -> seconds, None when unreachable
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def choose(self):
+        """A healthy replica alias, or None."""
+        if not self.aliases:
+            return None
+        if self._thread is None:
+            self._start()
+        healthy = self.healthy
+        return random.choice(healthy) if healthy else None
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='replica-monitor', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self.check()
+            # Like the end of a request: pooled connections go back between checks
+            close_old_connections()
+            time.sleep(self.interval)
+
+    def check(self):
+        primary_lsn = self.primary_lsn()
+        healthy = []
+        for alias in self.aliases:
+            lag = self.lag(alias, primary_lsn)
+            self.lags[alias] = lag
+            if lag is not None and lag <= self.max_lag:
+                healthy.append(alias)
+            elif alias in self.healthy:
+                logger.warning('Replica %s taken out of rotation (lag: %s)', alias, lag)
+        for alias in set(healthy) - set(self.healthy):
+            logger.info('Replica %s in rotation (lag: %s)', alias, self.lags[alias])
+        self.healthy = tuple(healthy)
+
+    @staticmethod
+    def primary_lsn():
+        """The primary's current WAL position, or None when it cannot be read."""
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor != 'postgresql':
+            return None
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(PRIMARY_LSN_SQL)
+                return cursor.fetchone()[0]
+        except Exception:
+            logger.warning('Primary WAL position check failed', exc_info=True)
+            connection.close()
+            return None
+
+    @staticmethod
+    def lag(alias, primary_lsn):
+        """
+        Seconds `alias` is behind `primary_lsn`, or None when it cannot be reached
+        or there is no primary position to compare with.
+        """
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            return 0.0
+        if primary_lsn is None:
+            return None
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(LAG_SQL, [primary_lsn])
+                return float(cursor.fetchone()[0])
+        except Exception:
+            logger.warning('Replica %s lag check failed', alias, exc_info=True)
+            connection.close()
+            return None
+
+
+monitor = ReplicaMonitor(REPLICA_DATABASES)
+
+
+def pin_key(user_id):
+    return f'db:pinned:{user_id}'
+
+
+def _pinnable(user):
+    return bool(REPLICA_DATABASES) and user is not None and user.is_authenticated
+
+
+def pin_to_primary(user):
+    """Send `user`'s reads to the primary for REPLICA_PIN_SECONDS (after a write)."""
+    if _pinnable(user):
+        caches[REPLICA_PIN_CACHE_ALIAS].set(pin_key(user.pk), 1, REPLICA_PIN_SECONDS)
+
+
+async def apin_to_primary(user):
+    """Async twin of `pin_to_primary`."""
+    if _pinnable(user):
+        await caches[REPLICA_PIN_CACHE_ALIAS].aset(pin_key(user.pk), 1, REPLICA_PIN_SECONDS)
+
+
+def replica_for(user):
+    """The replica `user`'s read request should use, or None for the primary."""
+    alias = monitor.choose()
+    if alias is None or (_pinnable(user) and caches[REPLICA_PIN_CACHE_ALIAS].get(pin_key(user.pk))):
+        return None
+    return alias
+
+
+async def areplica_for(user):
+    """Async twin of `replica_for`."""
+    alias = monitor.choose()
+    if alias is None or (_pinnable(user) and await caches[REPLICA_PIN_CACHE_ALIAS].aget(pin_key(user.pk))):
+        return None
+    return alias
+
+
+@contextmanager
+def reading_from(alias):
+    """Route the ORM reads made in the block (and in sync_to_async calls from it) to `alias`."""
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # Explicit: without it Django writes an instance back to the alias it was read from
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = (DEFAULT_DB_ALIAS, *REPLICA_DATABASES)
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in REPLICA_DATABASES:
+            return False
+        return None
+
+
+class ReplicaRoutingMixin:
+    """
+    APIView mixin: safe requests read from a replica (see the module docstring), and
+    a successful write pins the user to the primary.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with reading_from(None):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            # Reset by dispatch's reading_from(None) on the way out
+            _read_alias.set(replica_for(request.user))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'rest_framework_simplejwt',
@@ -48,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so its timings cover every other middleware
+    'backend_main.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -82,6 +85,22 @@ WSGI_APPLICATION = 'backend_main.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Connection reuse, set per environment:
+#   by default each thread keeps its connection for DB_CONN_MAX_AGE seconds
+#   (persistent connections, health-checked before reuse; 0 = reconnect on every
+#   request). asgi.py defaults it to 0: under ASGI requests run in changing
+#   threads, and persistent connections would pile up instead of being reused.
+#   DB_POOL_MAX_SIZE > 0 switches to backend_main.postgresql_pool: up to that many
+#   connections per process, shared by its threads; use it for ASGI or many threads.
+#   DB_POOL_MIN_SIZE of them are opened on a worker's first request (wsgi.py /
+#   asgi.py) and requests wait up to DB_POOL_TIMEOUT seconds for a free one.
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 0))
+DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', 2))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+# Host of a streaming-replication standby for the read endpoints (empty: no replica)
+DB_REPLICA_HOST = os.environ.get('DB_REPLICA_HOST', '')
+
 DATABASES = {
    'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -90,10 +109,79 @@ DATABASES = {
         'PASSWORD': 'root',
         'HOST': 'localhost',
         'PORT': '5432',
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+if DB_POOL_MAX_SIZE:
+    DATABASES['default'].update({
+        'ENGINE': 'backend_main.postgresql_pool',
+        'CONN_MAX_AGE': 0,  # connections go back to the pool after each request
+        'POOL': {
+            'min_size': min(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE),
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+        },
+    })
+# Read replicas are further aliases listed in REPLICA_DATABASES. This one is always
+# defined so that tests can route to it: there it mirrors the test database.
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'HOST': DB_REPLICA_HOST or DATABASES['default']['HOST'],
+    'TEST': {'MIRROR': 'default'},
+}
+
+# Safe requests to the post and profile endpoints read from a replica
+# (backend_main.replicas). A user is pinned to the primary for REPLICA_PIN_SECONDS
+# after a write, and replicas more than REPLICA_MAX_LAG seconds behind leave rotation.
+DATABASE_ROUTERS = ['backend_main.replicas.ReplicaRouter']
+REPLICA_DATABASES = ('replica',) if DB_REPLICA_HOST else ()
+REPLICA_MAX_LAG = 2
+REPLICA_LAG_CHECK_INTERVAL = 1
+REPLICA_PIN_SECONDS = 5
+
+# Cache
+# Local memory is enough for development and tests; point 'default' at a shared
+# backend (e.g. django.core.cache.backends.redis.RedisCache) when running several workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'social-network',
     }
 }
 
+# Serialized post payloads (posts.cache), invalidated on edit/delete/reaction/profile change
+POST_CACHE_TIMEOUT = 300
+# Invalidation leaves a tombstone for this long so racing fills cannot restore a pre-write payload
+POST_CACHE_TOMBSTONE_TIMEOUT = 5
+
 AUTH_USER_MODEL = 'accounts.CustomUser'
+
+# Password checks run in a bounded process pool (accounts.backends)
+AUTHENTICATION_BACKENDS = ['accounts.backends.OffloadedModelBackend']
+
+# New passwords use Argon2id; PBKDF2 hashes still verify and are upgraded on next login
+PASSWORD_HASHERS = [
+    'accounts.hashers.TunableArgon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+# Argon2 cost (memory in KiB); changing any of these re-hashes passwords on login
+ARGON2_TIME_COST = 2
+ARGON2_MEMORY_COST = 19456
+ARGON2_PARALLELISM = 1
+
+LOGIN_HASH_WORKERS = 2
+LOGIN_HASH_MAX_PENDING = 32
+LOGIN_HASH_TIMEOUT = 10
+# In-flight login attempts allowed per client address / per email (accounts.throttling)
+LOGIN_MAX_CONCURRENT_PER_IP = 4
+LOGIN_MAX_CONCURRENT_PER_EMAIL = 1
+# The in-flight counters must live in a cache shared by all workers; with a
+# per-process one the limits above apply per worker, not per deployment
+LOGIN_THROTTLE_CACHE_ALIAS = 'default'
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -152,13 +240,15 @@ CORS_ALLOW_CREDENTIALS = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Builds request.user from token claims: no users SELECT per request
+        'accounts.authentication.StatelessJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        # Same output as rest_framework.renderers.JSONRenderer, encoded by orjson
+        'backend_main.renderers.ORJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
@@ -167,6 +257,9 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.FormParser',
     ],
     'EXCEPTION_HANDLER': 'rest_framework.views.exception_handler',
+    # Keyset pagination over (created_at, id): constant cost per page at any depth
+    'DEFAULT_PAGINATION_CLASS': 'posts.pagination.KeysetCursorPagination',
+    'PAGE_SIZE': 20,
 }
 
 SIMPLE_JWT = {
@@ -176,9 +269,83 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
     'AUTH_HEADER_TYPES': ('Bearer',),
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.ClaimsTokenRefreshSerializer',
 }
 
+# Refresh-token blacklist lookups (accounts.blacklist): in-process Bloom filter
+# in front of the shared cache and the token_blacklist tables. The cache must be
+# shared by all workers, or a logout takes up to BLACKLIST_BLOOM_REFRESH seconds
+# to reach the others.
+BLACKLIST_CACHE_ALIAS = 'default'
+BLACKLIST_BLOOM_CAPACITY = 100000
+BLACKLIST_BLOOM_ERROR_RATE = 0.001
+BLACKLIST_BLOOM_REFRESH = 30
+# Each refresh re-reads this many seconds of entries, for rows that committed late
+BLACKLIST_BLOOM_OVERLAP = 60
 
+# Seconds a (token_version, is_active) lookup is cached by StatelessJWTAuthentication;
+# bounds how long a revoked or deactivated user's tokens keep working on other workers
+TOKEN_STATE_CACHE_TIMEOUT = 60
 
-FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  
-DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  
\ No newline at end of file
+
+
+# Uploads are streamed to disk by backend_main.uploads (no in-memory buffering).
+# The temp dir must share a filesystem with MEDIA_ROOT so files are renamed into place.
+FILE_UPLOAD_HANDLERS = [
+    'backend_main.uploads.StreamingImageUploadHandler',
+]
+# Not in version control; created by PostsConfig.ready() (the files.E001 check needs it)
+FILE_UPLOAD_TEMP_DIR = os.path.join(BASE_DIR, 'media_tmp')
+IMAGE_UPLOAD_MAX_SIZE = 10485760
+# Non-file request data (JSON and form fields) only; files no longer count against it
+DATA_UPLOAD_MAX_MEMORY_SIZE = 2621440
+
+
+# Home feed: authors with more followers than this are merged in at read time
+# instead of being fanned out into every follower's timeline on write. Fan-out
+# to followers runs in the background pool, after the post is committed.
+FEED_FANOUT_MAX_FOLLOWERS = 10000
+FEED_FANOUT_BATCH_SIZE = 1000
+# Number of an author's recent posts copied into a new follower's timeline
+FEED_FOLLOW_BACKFILL = 100
+
+# Post-response work (backend_main.background): image variants and timeline
+# fan-out run in a per-process thread pool once the request's transaction commits
+BACKGROUND_WORKERS = 2
+
+# Upload image pipeline (backend_main.imaging): resized WebP/JPEG variants
+# generated off the request path
+IMAGE_VARIANT_WIDTHS = (150, 600, 1200)
+IMAGE_MAX_DIMENSION = 2048
+IMAGE_VARIANT_QUALITY = 80
+
+# Write-behind reaction toggles (posts.reaction_buffer): toggles are answered from
+# pending state in the post cache and written to post_likes in one batch every
+# REACTION_BUFFER_FLUSH_INTERVAL seconds. A crash loses at most that window. Toggle
+# responses then carry no counters. Requires POST_CACHE_ALIAS to be a shared cache
+# (Redis, Memcached); startup fails on a per-process one such as LocMemCache.
+REACTION_WRITE_BEHIND = False
+REACTION_BUFFER_FLUSH_INTERVAL = 0.2
+# Past this many pending pairs, toggles of new pairs are written by the request itself
+REACTION_BUFFER_MAX_PENDING = 10000
+REACTION_BUFFER_PENDING_TTL = 60
+
+# Server-sent events (GET /api/events/, posts.realtime). Reaction counter changes
+# are coalesced per post for REALTIME_COALESCE_WINDOW seconds before publishing.
+# LocalBroker fans out within one process; with several ASGI workers or nodes use
+# 'backend_main.broker.PostgresBroker', which relays through LISTEN/NOTIFY.
+REALTIME_BROKER_BACKEND = 'backend_main.broker.LocalBroker'
+REALTIME_COALESCE_WINDOW = 0.25
+REALTIME_HEARTBEAT = 15
+REALTIME_QUEUE_SIZE = 256
+REALTIME_MAX_WATCHED_POSTS = 200
+# A browser EventSource cannot send an Authorization header: the client POSTs to
+# /api/events/token/ and opens /api/events/?token=<token> within this lifetime
+REALTIME_TOKEN_LIFETIME = timedelta(seconds=30)
+
+
+# Request instrumentation (backend_main.metrics): Server-Timing header on responses
+# and a Prometheus-format /metrics endpoint. Scrapers send "Authorization: Bearer
+# <METRICS_TOKEN>"; with no token set, /metrics only answers loopback clients in DEBUG
+SERVER_TIMING_HEADER = DEBUG
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
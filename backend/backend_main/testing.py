@@ -0,0 +1,61 @@
+"""
+Test helpers for query budgets.
+
+Views declare the maximum number of SQL queries a read (GET/HEAD) request may
+run as a `query_budget` class attribute. The helpers below fail a test when a request
+goes over it. They catch N+1 regressions, for example a serializer falling
+back to one PostLike query per row.
+
+    class PostListTests(QueryBudgetMixin, APITestCase):
+        def test_list_query_budget(self):
+            self.client.force_authenticate(self.user)
+            self.assertWithinQueryBudget(self.client.get, '/api/posts/')
+"""
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+
+
+def view_query_budget(path):
+    """The `query_budget` declared by the view serving `path`, or None."""
+    match = resolve(urlsplit(path).path)
+    return getattr(getattr(match.func, 'view_class', None), 'query_budget', None)
+
+
+def _format_failure(label, budget, captured):
+    queries = '\n'.join(
+        f'{i}. {query["sql"]}' for i, query in enumerate(captured.captured_queries, start=1)
+    )
+    return f'{label} ran {len(captured)} queries, budget is {budget}:\n{queries}'
+
+
+@contextmanager
+def assert_max_queries(budget, label='Block', using=DEFAULT_DB_ALIAS):
+    """Raise AssertionError (listing the SQL) if the block runs more than `budget` queries."""
+    with CaptureQueriesContext(connections[using]) as captured:
+        yield captured
+    if len(captured) > budget:
+        raise AssertionError(_format_failure(label, budget, captured))
+
+
+class QueryBudgetMixin:
+    """TestCase mixin adding `assertWithinQueryBudget`."""
+
+    def assertWithinQueryBudget(self, method, path, *args, budget=None, **kwargs):
+        """
+        Call `method(path, *args, **kwargs)` (e.g. `self.client.get`) and fail if it
+        runs more queries than `budget`, defaulting to the view's `query_budget`.
+        Returns the response.
+        """
+        if budget is None:
+            budget = view_query_budget(path)
+        if budget is None:
+            self.fail(f'The view for {path} declares no query_budget')
+        with CaptureQueriesContext(connection) as captured:
+            response = method(path, *args, **kwargs)
+        if len(captured) > budget:
+            self.fail(_format_failure(f'{method.__name__.upper()} {path}', budget, captured))
+        return response
@@ -0,0 +1,205 @@
+from unittest import mock, skipUnless
+
+import psycopg2.extensions
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITransactionTestCase
+
+from accounts.tokens import ClaimsRefreshToken
+from .postgresql_pool import warm_up_on_first_request
+from .postgresql_pool.base import HEALTH_CHECK_AFTER, DatabaseWrapper
+from .replicas import ReplicaMonitor
+
+
+class MetricsViewTests(SimpleTestCase):
+
+    @mock.patch('backend_main.metrics.METRICS_TOKEN', 's3cret')
+    def test_token_required(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'http_requests_total', response.content)
+
+    @mock.patch('backend_main.metrics.METRICS_TOKEN', '')
+    def test_loopback_without_token_only_in_debug(self):
+        # The test client's REMOTE_ADDR is 127.0.0.1
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+@mock.patch('backend_main.postgresql_pool._warmed_pid', None)
+@mock.patch('backend_main.postgresql_pool.warm_up_connections')
+class WarmUpTests(SimpleTestCase):
+
+    def test_once_per_process(self, warm_up_connections):
+        warm_up_on_first_request()
+        warm_up_on_first_request()
+        self.assertEqual(warm_up_connections.call_count, 1)
+
+        # A worker forked from the process that handled a request warms its own pools
+        with mock.patch('os.getpid', return_value=-1):
+            warm_up_on_first_request()
+        self.assertEqual(warm_up_connections.call_count, 2)
+
+
+class IsolatedPoolWrapper(DatabaseWrapper):
+    # Its own pools, apart from the default connection's when that is pooled too
+    _pools = {}
+
+
+@skipUnless(connection.vendor == 'postgresql', 'the pool backend needs PostgreSQL')
+class ConnectionPoolTests(TestCase):
+    """backend_main.postgresql_pool against the test database, one pool of one connection per test."""
+
+    def setUp(self):
+        self.settings_dict = {
+            **connection.settings_dict,
+            'ENGINE': 'backend_main.postgresql_pool',
+            'CONN_MAX_AGE': 0,
+            'CONN_HEALTH_CHECKS': True,
+            'POOL': {'min_size': 0, 'max_size': 1, 'timeout': 0.2},
+        }
+        first = self.wrapper()
+        self.addCleanup(first.close_connection_pool)
+        self.pool = first.connection_pool
+
+    def wrapper(self):
+        """A DatabaseWrapper as a request thread would have, sharing this test's pool."""
+        # Under the default alias, which django.contrib.postgres' connection_created receiver looks up
+        wrapper = IsolatedPoolWrapper(self.settings_dict, DEFAULT_DB_ALIAS)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def backend_pid(self, wrapper):
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
+
+    def test_checkout_times_out_when_every_connection_is_busy(self):
+        first, second = self.wrapper(), self.wrapper()
+        first.ensure_connection()
+        with self.assertRaises(OperationalError):
+            second.ensure_connection()
+        self.assertEqual(self.pool.stats()['timeouts'], 1)
+
+        first.close()  # back to the pool; the next checkout reuses it
+        second.ensure_connection()
+        self.assertEqual(self.pool.stats()['connections_opened'], 1)
+
+    def test_returned_connection_is_rolled_back(self):
+        first = self.wrapper()
+        first.set_autocommit(False)
+        raw = first.connection
+        with first.cursor() as cursor:
+            cursor.execute('CREATE TEMP TABLE pool_leftover (id int)')
+        first.close()
+
+        second = self.wrapper()
+        with second.cursor() as cursor:
+            self.assertIs(second.connection, raw)
+            cursor.execute("SELECT to_regclass('pg_temp.pool_leftover')")
+            self.assertIsNone(cursor.fetchone()[0])
+        self.assertTrue(second.get_autocommit())
+
+    def test_manual_begin_in_autocommit_is_rolled_back(self):
+        first = self.wrapper()
+        with first.cursor() as cursor:
+            cursor.execute('BEGIN')
+            cursor.execute('CREATE TEMP TABLE pool_leftover (id int)')
+        raw = first.connection
+        first.close()
+        self.assertEqual(raw.info.transaction_status, psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+        self.assertEqual(self.pool.stats()['idle'], 1)
+
+    def test_dead_idle_connection_is_replaced(self):
+        first = self.wrapper()
+        pid = self.backend_pid(first)
+        raw = first.connection
+        first.close()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+        raw._released_at -= HEALTH_CHECK_AFTER + 1  # idle long enough to be checked
+
+        second = self.wrapper()
+        self.assertNotEqual(self.backend_pid(second), pid)
+        self.assertEqual(self.pool.stats()['connections_opened'], 2)
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)  # no task thread left connected to the test database
+class ReplicaRoutingTests(APITransactionTestCase):
+    """
+    backend_main.replicas with the `replica` alias, a test mirror of the default
+    database. Transactional: reads inside TestCase's transaction stay on the primary.
+    """
+
+    databases = {DEFAULT_DB_ALIAS, 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(connections['replica'].close)  # the test database is dropped at the end
+        self.monitor = ReplicaMonitor(['replica'], max_lag=2)
+        for patcher in (
+            mock.patch('backend_main.replicas.REPLICA_DATABASES', ('replica',)),
+            mock.patch('backend_main.replicas.monitor', self.monitor),
+            mock.patch.object(self.monitor, '_start'),  # checks run in the tests, not in a thread
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        user = get_user_model().objects.create_user(
+            email='routed@example.com', password=None, full_name='Routed', date_of_birth='1990-01-01',
+        )
+        token = ClaimsRefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def reads_from_replica(self):
+        """Whether a post list request reads from the replica; it must not touch both."""
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            response = self.client.get('/api/posts/')
+        self.assertEqual(response.status_code, 200)
+        return bool(replica_queries)
+
+    def test_safe_requests_read_from_a_healthy_replica(self):
+        self.monitor.check()
+        self.assertEqual(self.monitor.healthy, ('replica',))
+        self.assertTrue(self.reads_from_replica())
+
+    def test_write_pins_the_user_to_the_primary(self):
+        self.monitor.check()
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            response = self.client.post('/api/posts/', {'description': 'fresh'})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertFalse(replica_queries)
+        self.assertFalse(self.reads_from_replica())
+
+        cache.clear()  # the pin expires
+        self.assertTrue(self.reads_from_replica())
+
+    def test_lagging_replica_leaves_rotation_until_it_catches_up(self):
+        self.monitor.check()
+        with mock.patch.object(ReplicaMonitor, 'lag', return_value=30.0), \
+                self.assertLogs('backend_main.replicas', 'WARNING'):
+            self.monitor.check()
+        self.assertEqual(self.monitor.healthy, ())
+        self.assertFalse(self.reads_from_replica())
+
+        self.monitor.check()
+        self.assertTrue(self.reads_from_replica())
+
+    def test_unreachable_replica_falls_back_to_the_primary(self):
+        with mock.patch.object(ReplicaMonitor, 'lag', return_value=None):
+            self.monitor.check()
+        self.assertEqual(self.monitor.lags, {'replica': None})
+        self.assertFalse(self.reads_from_replica())
+
+    @skipUnless(connection.vendor == 'postgresql', 'replay lag is measured on PostgreSQL')
+    def test_lag_is_measured_against_the_primary_position(self):
+        primary_lsn = ReplicaMonitor.primary_lsn()
+        self.assertIsNotNone(primary_lsn)
+        self.assertEqual(ReplicaMonitor.lag('replica', primary_lsn), 0.0)
+        # Without the primary's position a replica cannot be vouched for
+        self.assertIsNone(ReplicaMonitor.lag('replica', None))
@@ -0,0 +1,85 @@
+"""
+Streaming upload handling for image uploads.
+
+`StreamingImageUploadHandler` writes every multipart file chunk straight to a
+temporary file (never to worker memory) and validates the upload as it arrives:
+the first bytes must be a JPEG/PNG/WebP signature and the running size must stay
+under IMAGE_UPLOAD_MAX_SIZE. A bad upload aborts the parse immediately, before the
+rest of the body is read, and DRF answers 400.
+
+FILE_UPLOAD_TEMP_DIR sits on the same filesystem as MEDIA_ROOT so that
+FileSystemStorage can `rename()` the temp file into place instead of copying it.
+"""
+import os
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http.multipartparser import MultiPartParserError
+
+IMAGE_SIGNATURES = (
+    b'\xff\xd8\xff',          # JPEG
+    b'\x89PNG\r\n\x1a\n',     # PNG
+)
+# Enough bytes to recognise every signature, including RIFF....WEBP
+SIGNATURE_LENGTH = 12
+
+
+class UploadRejected(MultiPartParserError):
+    """Raised mid-stream; DRF's MultiPartParser turns it into a 400 ParseError."""
+
+
+def ensure_temp_dir():
+    """Create FILE_UPLOAD_TEMP_DIR if it is set and missing (it is not in version control)."""
+    temp_dir = getattr(settings, 'FILE_UPLOAD_TEMP_DIR', None)
+    if temp_dir:
+        os.makedirs(temp_dir, exist_ok=True)
+
+
+def is_image_signature(head):
+    if head.startswith(IMAGE_SIGNATURES):
+        return True
+    return head[:4] == b'RIFF' and head[8:12] == b'WEBP'
+
+
+class StreamingImageUploadHandler(TemporaryFileUploadHandler):
+    """Disk-backed upload handler that rejects oversize or non-image data early."""
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_size = getattr(settings, 'IMAGE_UPLOAD_MAX_SIZE', 10 * 1024 * 1024)
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # The whole body is bigger than any allowed file plus form overhead: refuse up front
+        limit = self.max_size + settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        if content_length and content_length > limit:
+            raise UploadRejected(
+                f"Request body too large. Maximum upload size is {self.max_size // (1024 * 1024)}MB."
+            )
+        return None
+
+    def new_file(self, *args, **kwargs):
+        ensure_temp_dir()
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.head = b''
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self._abort(f"Image size cannot exceed {self.max_size // (1024 * 1024)}MB.")
+
+        if len(self.head) < SIGNATURE_LENGTH:
+            self.head += raw_data[:SIGNATURE_LENGTH - len(self.head)]
+            if len(self.head) >= SIGNATURE_LENGTH and not is_image_signature(self.head):
+                self._abort("Uploaded file is not a valid JPEG, PNG or WebP image.")
+
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if not is_image_signature(self.head):
+            self._abort("Uploaded file is not a valid JPEG, PNG or WebP image.")
+        return super().file_complete(file_size)
+
+    def _abort(self, message):
+        self.file.close()  # NamedTemporaryFile: closing removes it
+        raise UploadRejected(message)
@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
 
 import os
 
+from django.core.signals import request_started
 from django.core.wsgi import get_wsgi_application
 
+from backend_main.postgresql_pool import warm_up_on_first_request
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_main.settings')
 
 application = get_wsgi_application()
+
+# Open the pooled database connections in each worker, not here: with a preloading
+# server this module is imported before the workers are forked
+request_started.connect(warm_up_on_first_request, dispatch_uid='warm_up_connections')
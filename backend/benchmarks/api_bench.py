@@ -0,0 +1,157 @@
+"""
+In-process API benchmark at several data scales.
+
+Creates a throw-away test database, then for each scale
+  1. fills it with `manage.py generate_data` (users x posts per user),
+  2. drives the post list, post detail, reaction toggle, login and profile
+     endpoints through DRF's test client,
+  3. records p50/p95/p99 latency, SQL queries per request and throughput.
+The results are printed as JSON and can be written to a file with --output,
+so runs on different commits can be diffed.
+
+    python benchmarks/api_bench.py --scales 100x10,1000x20 --requests 200 --output bench.json
+
+Requests go through the full middleware and view stack, but not through an HTTP
+server. Use async_vs_sync.py for concurrency and server-level numbers.
+"""
+import argparse
+import io
+import json
+import random
+import subprocess
+import time
+
+from django_env import scratch_database  # configures Django; must come first
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from accounts.tokens import ClaimsRefreshToken
+from posts.models import Post
+from stats import summarize
+
+User = get_user_model()
+
+PASSWORD = 'bench-password'
+
+
+def parse_scales(value):
+    scales = []
+    for item in value.split(','):
+        users, _, posts = item.partition('x')
+        scales.append((int(users), int(posts or 10)))
+    return scales
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(call, count, cold_cache):
+    """Run `call(i)` `count` times; returns the latency summary plus queries per request."""
+    latencies, queries, errors = [], 0, 0
+    start = time.perf_counter()
+    for i in range(count):
+        if cold_cache:
+            caches['default'].clear()
+        with CaptureQueriesContext(connection) as captured:
+            began = time.perf_counter()
+            response = call(i)
+            latencies.append((time.perf_counter() - began) * 1000)
+        queries += len(captured)
+        if response.status_code >= 400:
+            errors += 1
+    elapsed = time.perf_counter() - start
+    return {
+        **summarize(latencies, elapsed),
+        'queries_per_request': round(queries / count, 2) if count else None,
+        'errors': errors,
+    }
+
+
+def run_scale(users, posts_per_user, options):
+    call_command('flush', interactive=False, verbosity=0)
+    caches['default'].clear()
+    call_command(
+        'generate_data', users=users, posts_per_user=posts_per_user,
+        reactions_per_post=options.reactions_per_post, password=PASSWORD, seed=options.seed,
+        stdout=io.StringIO(),
+    )
+
+    rng = random.Random(options.seed)
+    user = User.objects.order_by('pk').first()
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    sample = [rng.choice(post_ids) for _ in range(options.requests)]
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {ClaimsRefreshToken.for_user(user).access_token}')
+    anonymous = APIClient()
+    n, cold = options.requests, options.cold_cache
+
+    endpoints = {
+        'post_list': lambda i: client.get('/api/posts/'),
+        'post_detail': lambda i: client.get(f'/api/posts/{sample[i]}/'),
+        'post_toggle_like': lambda i: client.post(
+            f'/api/posts/{sample[i]}/toggle-like/', {'action': 'like'}, format='json',
+        ),
+        'login': lambda i: anonymous.post(
+            '/api/login/', {'email': user.email, 'password': PASSWORD}, format='json',
+        ),
+        'profile': lambda i: client.get('/api/profile/'),
+    }
+    selected = options.endpoints or list(endpoints)
+    # Password hashing is deliberately slow; keep the login sample small
+    counts = {name: (min(n, options.login_requests) if name == 'login' else n) for name in selected}
+
+    return {
+        'users': users,
+        'posts': len(post_ids),
+        'endpoints': {name: measure(endpoints[name], counts[name], cold) for name in selected},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=parse_scales, default=parse_scales('100x10,1000x10'),
+                        help='Comma-separated USERSxPOSTS_PER_USER data sets (default: 100x10,1000x10)')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint and scale')
+    parser.add_argument('--login-requests', type=int, default=20, help='cap on login requests per scale')
+    parser.add_argument('--reactions-per-post', type=float, default=5.0)
+    parser.add_argument('--endpoint', action='append', dest='endpoints',
+                        choices=['post_list', 'post_detail', 'post_toggle_like', 'login', 'profile'],
+                        help='only run this endpoint (may be repeated)')
+    parser.add_argument('--cold-cache', action='store_true', help='clear the cache before every request')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='also write the JSON results to this file')
+    options = parser.parse_args()
+
+    with scratch_database():
+        results = {
+            'revision': git_revision(),
+            'config': {
+                'requests': options.requests,
+                'reactions_per_post': options.reactions_per_post,
+                'cold_cache': options.cold_cache,
+                'seed': options.seed,
+            },
+            'scales': [run_scale(users, posts, options) for users, posts in options.scales],
+        }
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if options.output:
+        with open(options.output, 'w') as fh:
+            fh.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
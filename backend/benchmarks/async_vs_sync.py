@@ -0,0 +1,125 @@
+"""
+Load benchmark: sync DRF post endpoints vs. their ASGI-native variants.
+
+Start the app under one ASGI worker, e.g.
+
+    uvicorn backend_main.asgi:application --workers 1 --port 8000
+
+then run
+
+    python benchmarks/async_vs_sync.py --token <access token> --concurrency 1000
+
+Each of `--concurrency` clients keeps one HTTP/1.1 keep-alive connection open and
+issues `--requests` GETs against the sync URL, then the async URL. `--client-delay`
+makes every client sleep between requests to mimic slow clients holding
+connections open. Results (latency percentiles, throughput, errors) are printed as JSON.
+"""
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+from stats import summarize
+
+ENDPOINTS = {
+    'list': ('/api/posts/', '/api/async/posts/'),
+    'detail': ('/api/posts/{post_id}/', '/api/async/posts/{post_id}/'),
+}
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split()[1])
+    length = 0
+    chunked = False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value.strip())
+        elif name == 'transfer-encoding' and 'chunked' in value.lower():
+            chunked = True
+    if chunked:
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(length)
+    return status
+
+
+async def client(host, port, path, token, requests, delay, latencies, errors):
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        errors.append('connect')
+        return
+    request = (
+        f'GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n'
+        f'Authorization: Bearer {token}\r\nConnection: keep-alive\r\n\r\n'
+    ).encode()
+    try:
+        for _ in range(requests):
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status = await read_response(reader)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if status >= 400:
+                errors.append(status)
+            if delay:
+                await asyncio.sleep(delay)
+    except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError) as exc:
+        errors.append(type(exc).__name__)
+    finally:
+        writer.close()
+
+
+async def run(base_url, path, token, concurrency, requests, delay):
+    parts = urlsplit(base_url)
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(parts.hostname, parts.port or 80, path, token, requests, delay, latencies, errors)
+        for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+    return {'path': path, 'errors': len(errors), **summarize(latencies, elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--token', required=True, help='JWT access token')
+    parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='list')
+    parser.add_argument('--post-id', type=int, default=1, help='post id for the detail endpoint')
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=20, help='requests per client')
+    parser.add_argument('--client-delay', type=float, default=0.0, help='seconds each client idles between requests')
+    args = parser.parse_args()
+
+    results = {}
+    for label, path in zip(('sync', 'async'), ENDPOINTS[args.endpoint]):
+        path = path.format(post_id=args.post_id)
+        results[label] = asyncio.run(
+            run(args.base_url, path, args.token, args.concurrency, args.requests, args.client_delay)
+        )
+    results['config'] = {
+        'endpoint': args.endpoint,
+        'concurrency': args.concurrency,
+        'requests_per_client': args.requests,
+        'client_delay': args.client_delay,
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
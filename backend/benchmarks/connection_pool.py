@@ -0,0 +1,146 @@
+"""
+Per-request latency with and without connection reuse.
+
+Creates a throw-away test database with one user and `--posts` posts. Then
+`--concurrency` threads fetch the post list (warm post cache) and a post detail.
+Every request is wrapped like a real server request: Django closes old
+connections when a request starts and finishes. Three configurations of the
+default database are compared:
+  connect     CONN_MAX_AGE 0, no pool: a new PostgreSQL connection per request
+  persistent  CONN_MAX_AGE 600 with health checks: one connection per thread
+  pool        backend_main.postgresql_pool with max_size = --pool-size
+For each mode, the latency summary, the connections opened and (for the pool)
+the time requests waited for a connection are printed as JSON.
+
+    python benchmarks/connection_pool.py --concurrency 8 --requests 300
+
+The saving is the connection handshake. It is largest with TLS and SCRAM
+authentication against a remote server, and smallest against a local server
+with trust authentication.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+# Load the pool backend as ENGINE; without 'POOL' it is plain django.db.backends.postgresql
+os.environ.setdefault('DB_POOL_MAX_SIZE', '8')
+
+from django_env import scratch_database  # noqa: E402  (configures Django; must come first)
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.signals import request_finished, request_started
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from rest_framework.test import APIClient
+
+from accounts.tokens import ClaimsRefreshToken
+from posts.models import Post
+from stats import summarize
+
+User = get_user_model()
+
+MODES = {
+    'connect': {'CONN_MAX_AGE': 0, 'POOL': None},
+    'persistent': {'CONN_MAX_AGE': 600, 'POOL': None},
+    'pool': {'CONN_MAX_AGE': 0, 'POOL': {}},  # sizes filled in from the options
+}
+
+
+def seed(posts):
+    user = User.objects.create(
+        email='pool@example.com', full_name='Pool Bench', date_of_birth='1990-01-01',
+        password=make_password('bench-password'),
+    )
+    Post.objects.bulk_create(Post(user=user, description=f'post {i}') for i in range(posts))
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    return str(ClaimsRefreshToken.for_user(user).access_token), post_ids
+
+
+def configure(mode, options):
+    connections.close_all()
+    connection.close_connection_pool()
+    settings_dict = connection.settings_dict
+    settings_dict.update(MODES[mode])
+    if mode == 'pool':
+        settings_dict['POOL'] = {'min_size': options.pool_size, 'max_size': options.pool_size, 'timeout': 30}
+        connection.connection_pool.open()
+
+
+def run(token, post_ids, options):
+    latencies = [[] for _ in range(options.concurrency)]
+    barrier = threading.Barrier(options.concurrency + 1)
+
+    def worker(index):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        paths = ['/api/posts/', f'/api/posts/{post_ids[index % len(post_ids)]}/']
+        barrier.wait()
+        try:
+            for i in range(options.requests):
+                began = time.perf_counter()
+                # The test client skips Django's connection housekeeping; do what a server does
+                request_started.send(sender=None)
+                response = client.get(paths[i % 2])
+                request_finished.send(sender=None)
+                latencies[index].append((time.perf_counter() - began) * 1000)
+                assert response.status_code == 200, response.status_code
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(options.concurrency)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return summarize([ms for chunk in latencies for ms in chunk], time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads')
+    parser.add_argument('--requests', type=int, default=300, help='requests per thread')
+    parser.add_argument('--pool-size', type=int, default=8)
+    parser.add_argument('--modes', default=','.join(MODES))
+    options = parser.parse_args()
+
+    opened = [0]
+
+    def count(sender, connection, **kwargs):
+        opened[0] += 1
+
+    with scratch_database():
+        token, post_ids = seed(options.posts)
+        results = {'config': vars(options)}
+        for mode in options.modes.split(','):
+            configure(mode, options)
+            pool = connection.connection_pool
+            before = pool.stats() if pool else None
+            opened[0] = 0
+            connection_created.connect(count)
+            try:
+                timing = run(token, post_ids, options)
+            finally:
+                connection_created.disconnect(count)
+            result = {**timing}
+            if pool:
+                after = pool.stats()
+                # connection_created fires on every checkout; count real connects instead
+                result['connections_opened'] = after['connections_opened'] - before['connections_opened']
+                result['pool_waits'] = after['waits'] - before['waits']
+                result['pool_wait_ms'] = round((after['wait_seconds'] - before['wait_seconds']) * 1000, 2)
+            else:
+                result['connections_opened'] = opened[0]
+            results[mode] = result
+        configure('connect', options)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+EXPLAIN check: the hot post / post_likes reads are index-only scans.
+
+Creates a throw-away test database with `--users` users, `--posts` posts each,
+and about `--reactions` post_likes rows per user, of which roughly 15% are
+'none'. Then VACUUM ANALYZE runs, so the visibility map is set as on a settled
+production table. The script captures the SQL that these make:
+  - the post list, first and second keyset page,
+  - the post detail (version lookup with the viewer's reaction),
+  - manage.py recount_reactions.
+It EXPLAINs each query and checks for an `Index Only Scan` on the index meant
+for it (posts migration 0009). Prints the plans as JSON. Exits with status 1
+if any check fails.
+
+    python benchmarks/explain_indexes.py --users 300 --posts 40
+
+PostgreSQL only. The test suite covers the same plans on a small data set
+(posts.tests.IndexOnlyScanTests). This script is the optional larger run,
+closer to production table sizes, and it also checks recount_reactions.
+"""
+import argparse
+import io
+import json
+import random
+import sys
+
+from django_env import scratch_database  # configures Django; must come first
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from accounts.tokens import ClaimsRefreshToken
+from posts.models import Post, PostLike
+
+User = get_user_model()
+
+# (label, what to run, which captured query to explain, index expected in its plan)
+CHECKS = (
+    ('post list page 1', 'list', 'FROM "posts" WHERE "posts"."user_id"', 'posts_user_created_idx'),
+    ('post list page 2', 'list_next', 'FROM "posts" WHERE', 'posts_user_created_idx'),
+    ('viewer reactions on a page', 'list', 'FROM "post_likes"', 'likes_user_post_reacted_idx'),
+    ('post detail version', 'detail', 'FROM "post_likes"', 'likes_user_post_reacted_idx'),
+    ('recount_reactions', 'recount', 'UPDATE "posts"', 'post_likes_post_reaction_idx'),
+)
+
+
+def seed(options):
+    rng = random.Random(options.seed)
+    password = make_password('bench-password')
+    User.objects.bulk_create(
+        User(email=f'idx-{i}@example.com', full_name=f'Index {i}', date_of_birth='1990-01-01', password=password)
+        for i in range(options.users)
+    )
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    Post.objects.bulk_create(
+        (Post(user_id=uid, description=f'post {n} by {uid}') for uid in user_ids for n in range(options.posts)),
+        batch_size=5000,
+    )
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    reactions = [PostLike.REACTION_LIKE] * 70 + [PostLike.REACTION_DISLIKE] * 15 + [PostLike.REACTION_NONE] * 15
+    PostLike.objects.bulk_create(
+        (
+            PostLike(user_id=uid, post_id=pid, reaction=rng.choice(reactions))
+            for uid in user_ids
+            for pid in rng.sample(post_ids, min(options.reactions, len(post_ids)))
+        ),
+        batch_size=5000,
+        ignore_conflicts=True,
+    )
+    call_command('recount_reactions', stdout=io.StringIO())
+    with connection.cursor() as cursor:
+        cursor.execute('VACUUM ANALYZE posts')
+        cursor.execute('VACUUM ANALYZE post_likes')
+    return user_ids
+
+
+def capture(user_ids):
+    """{action: [sql, ...]} for every action used by CHECKS."""
+    viewer = User.objects.get(pk=user_ids[len(user_ids) // 2])
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {ClaimsRefreshToken.for_user(viewer).access_token}')
+    # A post the viewer reacted to, so the detail lookup finds a row
+    liked = (
+        PostLike.objects.filter(user=viewer).exclude(reaction=PostLike.REACTION_NONE)
+        .values_list('post_id', flat=True)[0]
+    )
+
+    captured = {}
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get('/api/posts/?page_size=20')
+    captured['list'] = [q['sql'] for q in queries.captured_queries]
+    with CaptureQueriesContext(connection) as queries:
+        client.get(response.json()['next'])
+    captured['list_next'] = [q['sql'] for q in queries.captured_queries]
+    with CaptureQueriesContext(connection) as queries:
+        client.get(f'/api/posts/{liked}/')
+    captured['detail'] = [q['sql'] for q in queries.captured_queries]
+    first = Post.objects.order_by('pk').values_list('pk', flat=True)[0]
+    with CaptureQueriesContext(connection) as queries:
+        call_command('recount_reactions', post_ids=[first], stdout=io.StringIO())
+    captured['recount'] = [q['sql'] for q in queries.captured_queries]
+    return captured
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN ' + sql)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--posts', type=int, default=40, help='posts per user')
+    parser.add_argument('--reactions', type=int, default=100, help='post_likes rows per user')
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args()
+
+    with scratch_database():
+        if connection.vendor != 'postgresql':
+            parser.error('needs PostgreSQL')
+        captured = capture(seed(options))
+        results = []
+        for label, action, marker, index in CHECKS:
+            sql = next((sql for sql in captured[action] if marker in sql), None)
+            plan = explain(sql) if sql else []
+            results.append({
+                'check': label,
+                'index': index,
+                'ok': any(f'Index Only Scan using {index}' in line for line in plan),
+                'sql': sql,
+                'plan': plan,
+            })
+
+    print(json.dumps({'config': vars(options), 'checks': results}, indent=2))
+    sys.exit(0 if all(result['ok'] for result in results) else 1)
+
+
+if __name__ == '__main__':
+    main()
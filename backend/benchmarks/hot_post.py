@@ -0,0 +1,123 @@
+"""
+Reaction toggles on a single hot post: direct writes vs. the write-behind buffer.
+
+Creates a throw-away test database with `--users` users and one post. Then
+`--concurrency` threads toggle likes on that post for distinct random users.
+This is the load a viral post puts on one `posts` row. Two modes are run:
+  direct    posts.reactions.toggle_reaction (upsert + counter UPDATE per toggle)
+  buffered  posts.reaction_buffer (pending state in memory, batched flushes)
+After each mode, counters are checked against post_likes. The buffered mode is
+checked after its final flush. Results are printed as JSON.
+
+    python benchmarks/hot_post.py --users 5000 --concurrency 32 --toggles 200
+
+Row-lock contention only shows on PostgreSQL. SQLite serializes every writer.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+
+from django_env import scratch_database  # configures Django; must come first
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.db.models import Count, Q
+
+from posts.models import Post, PostLike
+from posts.reaction_buffer import ReactionBuffer
+from posts.reactions import toggle_reaction
+from stats import summarize
+
+User = get_user_model()
+
+
+def seed(users):
+    password = make_password('bench-password')
+    User.objects.bulk_create(
+        User(email=f'hot-{i}@example.com', full_name=f'Hot {i}', date_of_birth='1990-01-01', password=password)
+        for i in range(users)
+    )
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    post = Post.objects.create(user_id=user_ids[0], description='the hot post')
+    return user_ids, post.pk
+
+
+def reset(post_id):
+    PostLike.objects.filter(post_id=post_id).delete()
+    Post.objects.filter(pk=post_id).update(likes_count=0, dislikes_count=0)
+
+
+def consistent(post_id):
+    stored = PostLike.objects.filter(post_id=post_id).aggregate(
+        likes=Count('pk', filter=Q(reaction=PostLike.REACTION_LIKE)),
+        dislikes=Count('pk', filter=Q(reaction=PostLike.REACTION_DISLIKE)),
+    )
+    post = Post.objects.values('likes_count', 'dislikes_count').get(pk=post_id)
+    return {
+        'likes_count': post['likes_count'],
+        'dislikes_count': post['dislikes_count'],
+        'consistent': (post['likes_count'], post['dislikes_count']) == (stored['likes'], stored['dislikes']),
+    }
+
+
+def run(toggle, user_ids, post_id, options):
+    # Each thread owns a disjoint slice of users, like distinct clients
+    slices = [user_ids[i::options.concurrency] for i in range(options.concurrency)]
+    latencies = [[] for _ in slices]
+    barrier = threading.Barrier(options.concurrency + 1)
+
+    def worker(index):
+        rng = random.Random(options.seed + index)
+        mine = slices[index]
+        barrier.wait()
+        try:
+            for _ in range(options.toggles):
+                action = 'like' if rng.random() < 0.85 else 'dislike'
+                began = time.perf_counter()
+                toggle(rng.choice(mine), post_id, action)
+                latencies[index].append((time.perf_counter() - began) * 1000)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(options.concurrency)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return summarize([ms for chunk in latencies for ms in chunk], time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16, help='toggling threads')
+    parser.add_argument('--toggles', type=int, default=200, help='toggles per thread')
+    parser.add_argument('--flush-interval', type=float, default=0.2, help='buffered mode flush interval (s)')
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args()
+    if options.users < options.concurrency:
+        parser.error('--users must be at least --concurrency')
+
+    with scratch_database():
+        user_ids, post_id = seed(options.users)
+        results = {'config': vars(options)}
+
+        reset(post_id)
+        results['direct'] = {**run(toggle_reaction, user_ids, post_id, options), **consistent(post_id)}
+
+        reset(post_id)
+        buffer = ReactionBuffer(interval=options.flush_interval)
+        timing = run(buffer.toggle, user_ids, post_id, options)
+        buffer.stop()  # flushes what is still pending when the load stops
+        results['buffered'] = {**timing, **consistent(post_id)}
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
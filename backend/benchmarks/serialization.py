@@ -0,0 +1,99 @@
+"""
+Post list serialization: DRF PostSerializer + JSONRenderer vs. the `.values()`
+payload path (posts.payloads via posts.cache) + ORJSONRenderer.
+
+Seeds a throw-away test database with `generate_data`, then repeatedly builds one
+page of `--page-size` posts both ways. Each iteration of the fast path starts
+with a cold post cache, so rows are really fetched and converted. Both outputs
+are checked to be equal before anything is timed. Results are printed as JSON.
+
+    python benchmarks/serialization.py --page-size 100 --iterations 200
+"""
+import argparse
+import io
+import json
+import time
+
+from django_env import scratch_database  # configures Django; must come first
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from backend_main.renderers import ORJSONRenderer
+from posts.cache import get_post_payloads
+from posts.models import Post, PostLike
+from posts.serializers import PostSerializer
+from stats import summarize
+
+User = get_user_model()
+
+
+def drf_page(post_ids, request):
+    queryset = (
+        Post.objects.filter(pk__in=post_ids)
+        .select_related('user')
+        .prefetch_related(Prefetch(
+            'likes', queryset=PostLike.objects.filter(user_id=request.user.pk), to_attr='user_like_rows',
+        ))
+        .order_by('-id')
+    )
+    data = PostSerializer(queryset, many=True, context={'request': request}).data
+    return JSONRenderer().render(data)
+
+
+def fast_page(post_ids, request):
+    caches['default'].clear()
+    return ORJSONRenderer().render(get_post_payloads(post_ids, request))
+
+
+def timed(build, post_ids, request, iterations):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        began = time.perf_counter()
+        build(post_ids, request)
+        latencies.append((time.perf_counter() - began) * 1000)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--posts-per-user', type=int, default=10)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--iterations', type=int, default=200)
+    options = parser.parse_args()
+
+    with scratch_database():
+        call_command(
+            'generate_data', users=options.users, posts_per_user=options.posts_per_user, stdout=io.StringIO(),
+        )
+        viewer = User.objects.order_by('pk').first()
+        post_ids = list(Post.objects.order_by('-id').values_list('pk', flat=True)[:options.page_size])
+
+        request = Request(APIRequestFactory().get('/api/posts/'))
+        request.user = viewer
+
+        drf_output, fast_output = drf_page(post_ids, request), fast_page(post_ids, request)
+        if json.loads(drf_output) != json.loads(fast_output):
+            raise SystemExit('Fast path output differs from PostSerializer output')
+
+        drf = timed(drf_page, post_ids, request, options.iterations)
+        fast = timed(fast_page, post_ids, request, options.iterations)
+
+    print(json.dumps({
+        'config': vars(options),
+        'response_bytes': {'drf': len(drf_output), 'fast': len(fast_output)},
+        'drf_serializer_json': drf,
+        'values_orjson': fast,
+        'speedup_p50': round(drf['p50_ms'] / fast['p50_ms'], 2) if fast['p50_ms'] else None,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
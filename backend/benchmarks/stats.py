@@ -0,0 +1,22 @@
+"""Latency summary helpers shared by the benchmark scripts."""
+import statistics
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 2)
+
+
+def summarize(latencies, elapsed):
+    """p50/p95/p99/mean (ms) and throughput for `latencies` (ms) measured over `elapsed` seconds."""
+    return {
+        'requests': len(latencies),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'mean_ms': round(statistics.fmean(latencies), 2) if latencies else None,
+    }
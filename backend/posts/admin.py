@@ -11,6 +11,6 @@ class PostLikeAdmin(admin.ModelAdmin):
 # if you also have Post admin
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'description', 'created_at')
+    list_display = ('id', 'user', 'description', 'likes_count', 'dislikes_count', 'created_at')
     search_fields = ('user__email', 'description')
-    readonly_fields = ('created_at',)
+    readonly_fields = ('likes_count', 'dislikes_count', 'created_at')
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class PostsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'posts'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (registers cache invalidation receivers)
+        from backend_main.uploads import ensure_temp_dir
+
+        ensure_temp_dir()
+        if getattr(settings, 'REACTION_WRITE_BEHIND', False):
+            from .reaction_buffer import check_shared_cache
+
+            check_shared_cache()
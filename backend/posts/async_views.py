@@ -0,0 +1,187 @@
+"""
+ASGI-native variants of the read-heavy post endpoints.
+
+DRF views are synchronous, so under ASGI every request is pushed through
+`sync_to_async` onto a thread. These views are plain async Django views: JWT
+auth, pagination, the post cache and the ORM reads all use async APIs, so one
+uvicorn worker can hold thousands of slow clients without tying up threads.
+
+Writes that need a transaction (post create/delete) are delegated to the sync
+DRF views; the reaction toggle is a single statement and runs in one
+`sync_to_async` hop because Django has no async transactions or raw cursors.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.request import Request
+
+from accounts.authentication import EventStreamAuthentication, StatelessJWTAuthentication
+from backend_main.conditional import not_modified, set_validators
+from backend_main.renderers import dumps
+from backend_main.replicas import apin_to_primary, areplica_for, reading_from
+from .cache import aget_post_detail, aget_post_page, awith_pending_reactions
+from .fields import parse_field_selection
+from .models import Post, PostLike
+from .pagination import KeysetCursorPagination
+from .payloads import post_version, version_reactions
+from .reactions import toggle_reaction
+from .realtime import event_stream, post_channel
+from .serializers import PostSerializer
+from .views import PostListCreateView, PostDetailView, post_validators
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+MAX_WATCHED_POSTS = getattr(settings, 'REALTIME_MAX_WATCHED_POSTS', 200)
+
+
+def api_response(data, status_code=status.HTTP_200_OK):
+    # Same bytes as the DRF views' renderer
+    return HttpResponse(dumps(data), status=status_code, content_type='application/json')
+
+
+class AsyncAPIView(View):
+    """
+    Minimal async counterpart of APIView: JWT authentication, an
+    authenticated/read-only permission switch, DRF-style error bodies, and
+    replica reads for safe requests when `replica_reads` is set (writes are
+    pinned by the sync views they are handed to, see backend_main.replicas).
+    """
+    authentication = StatelessJWTAuthentication()
+    allow_anonymous_reads = False
+    replica_reads = False
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            auth = await self.authentication.aauthenticate(request)
+            request.user, request.auth = auth if auth else (AnonymousUser(), None)
+
+            if not request.user.is_authenticated and not (
+                self.allow_anonymous_reads and request.method in SAFE_METHODS
+            ):
+                return api_response(
+                    {'detail': 'Authentication credentials were not provided.'},
+                    status.HTTP_401_UNAUTHORIZED,
+                )
+            alias = None
+            if self.replica_reads and request.method in SAFE_METHODS:
+                alias = await areplica_for(request.user)
+            with reading_from(alias):
+                return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+            return api_response(detail, exc.status_code)
+
+
+class AsyncPostListCreateView(AsyncAPIView):
+    """
+    Async GET /api/async/posts/ (same payload as PostListCreateView).
+    POST is handed to the sync view.
+    """
+    replica_reads = True
+    sync_view = staticmethod(PostListCreateView.as_view())
+
+    async def get(self, request):
+        paginator = KeysetCursorPagination()
+        queryset = Post.objects.filter(user_id=request.user.pk).only('id', 'created_at')
+        page = await paginator.apaginate_queryset(queryset, Request(request))
+        selection = parse_field_selection(request, PostSerializer.Meta.fields)
+        payloads, authors = await aget_post_page([post.pk for post in page], request, selection)
+        data = paginator.get_paginated_data(payloads)
+        if authors is not None:
+            data['authors'] = authors
+        return api_response(data)
+
+    async def post(self, request):
+        response = await sync_to_async(self.sync_view)(request)
+        return response.render()
+
+
+class AsyncPostDetailView(AsyncAPIView):
+    """
+    Async GET /api/async/posts/<pk>/ (same payload and validators as PostDetailView).
+    DELETE is handed to the sync view.
+    """
+    allow_anonymous_reads = True
+    replica_reads = True
+    sync_view = staticmethod(PostDetailView.as_view())
+
+    async def get(self, request, pk):
+        selection = parse_field_selection(request, PostSerializer.Meta.fields)._replace(sideload_authors=False)
+        version = await post_version(Post.objects.filter(pk=pk), request.user).afirst()
+        if version is None:
+            raise NotFound()
+        reactions = await awith_pending_reactions(request.user, version_reactions(version), [version['id']])
+        etag, last_modified = post_validators(request, version, reactions)
+        response = not_modified(request, etag)
+        if response is None:
+            payload, current = await aget_post_detail(version, request, selection, reactions)
+            if payload is None:
+                raise NotFound()
+            response = api_response(payload)
+            if not current:
+                etag = last_modified = None
+        return set_validators(response, etag, last_modified)
+
+    async def delete(self, request, pk):
+        response = await sync_to_async(self.sync_view)(request, pk=pk)
+        return response.render()
+
+
+class AsyncPostReactToggleAPIView(AsyncAPIView):
+    """
+    Async POST /api/async/posts/<post_id>/toggle-like/ with {"action": "like"|"dislike"}.
+    Returns {"reaction": "like"|"dislike"|"none"}.
+    """
+    actions = (PostLike.REACTION_LIKE, PostLike.REACTION_DISLIKE)
+
+    async def post(self, request, post_id):
+        try:
+            action = json.loads(request.body or b'{}').get('action')
+        except (ValueError, AttributeError):
+            return api_response({'detail': 'JSON parse error.'}, status.HTTP_400_BAD_REQUEST)
+        if action not in self.actions:
+            return api_response(
+                {'action': [f'"{action}" is not a valid choice.']},
+                status.HTTP_400_BAD_REQUEST,
+            )
+
+        result = await sync_to_async(toggle_reaction)(request.user.pk, post_id, action)
+        await apin_to_primary(request.user)
+        return api_response({'reaction': result.reaction})
+
+
+class PostEventStreamView(AsyncAPIView):
+    """
+    Server-sent events: GET /api/events/?posts=<id>,<id>,...
+      event: counts   coalesced reaction counter changes of the listed posts
+      event: post     new posts by the viewer and the accounts they follow
+    (see posts.realtime). Only useful under the ASGI server (backend_main.asgi);
+    a WSGI worker would be held for the whole connection.
+    Browsers authenticate with ?token= from POST /api/events/token/ (EventStreamTokenView).
+    Follows and unfollows take effect on open streams.
+    """
+    authentication = EventStreamAuthentication()
+
+    async def get(self, request):
+        try:
+            post_ids = {int(pk) for pk in request.GET.get('posts', '').split(',') if pk.strip()}
+        except ValueError:
+            return api_response({'posts': ['Expected comma-separated post ids.']}, status.HTTP_400_BAD_REQUEST)
+        if len(post_ids) > MAX_WATCHED_POSTS:
+            return api_response(
+                {'posts': [f'At most {MAX_WATCHED_POSTS} posts can be watched.']},
+                status.HTTP_400_BAD_REQUEST,
+            )
+
+        channels = [post_channel(pk) for pk in post_ids]
+        response = StreamingHttpResponse(
+            event_stream(channels, follower_id=request.user.pk), content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # nginx: do not buffer the stream
+        return response
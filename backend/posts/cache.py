@@ -0,0 +1,337 @@
+"""
+Read-through cache for serialized posts.
+
+A post payload is split into two cache entries so that each can be invalidated
+on its own event:
+  - post part   (`posts:post:<id>`):  everything PostSerializer emits about the post
+  - author part (`posts:author:<id>`): user_name, user_email, user_profile_picture
+Media URLs (including the image srcset) are cached relative and made absolute
+once per request; the per-viewer `user_reaction` is never cached and is merged
+in afterwards. A FieldSelection (posts.fields) limits which fields are built.
+
+With REACTION_WRITE_BEHIND, toggles not yet flushed to post_likes are kept here
+as well (`posts:reaction:<user>:<post>`, see posts.reaction_buffer) and take
+precedence over the stored reaction, so a viewer always sees their own toggles.
+
+Misses are filled from the primary database even when the request reads from a
+replica (backend_main.replicas). The entries are shared and live until the next
+invalidation, so a lagging replica must not be able to cache a pre-write copy.
+
+For the same reason an invalidation does not delete the entries. It replaces them
+with a short-lived tombstone, and fills only `add()` missing keys. A fill whose
+database read raced a write (read before the commit, stored after the writer's
+on_commit invalidation) then finds the tombstone and stores nothing.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+
+from backend_main.metrics import span
+from .fields import AUTHOR_FIELDS, full_selection
+from .models import Post, PostLike
+from .payloads import AUTHOR_COLUMNS, author_part, part_matches_version, post_part, post_rows
+
+User = get_user_model()
+
+POST_CACHE_ALIAS = getattr(settings, 'POST_CACHE_ALIAS', 'default')
+POST_CACHE_TIMEOUT = getattr(settings, 'POST_CACHE_TIMEOUT', 300)
+# Must outlast the gap between a fill's database read and its add()
+POST_CACHE_TOMBSTONE_TIMEOUT = getattr(settings, 'POST_CACHE_TOMBSTONE_TIMEOUT', 5)
+WRITE_BEHIND = getattr(settings, 'REACTION_WRITE_BEHIND', False)
+
+URL_FIELDS = ('image', 'image_url', 'user_profile_picture')
+
+# Cached in place of an invalidated part; parts are dicts, so it never matches one
+INVALIDATED = 'invalidated'
+
+
+def _cache():
+    return caches[POST_CACHE_ALIAS]
+
+
+def post_key(post_id):
+    return f'posts:post:{post_id}'
+
+
+def author_key(user_id):
+    return f'posts:author:{user_id}'
+
+
+def pending_reaction_key(user_id, post_id):
+    return f'posts:reaction:{user_id}:{post_id}'
+
+
+def invalidate_posts(post_ids):
+    _cache().set_many(dict.fromkeys([post_key(pid) for pid in post_ids], INVALIDATED), POST_CACHE_TOMBSTONE_TIMEOUT)
+
+
+def invalidate_author(user_id):
+    _cache().set(author_key(user_id), INVALIDATED, POST_CACHE_TOMBSTONE_TIMEOUT)
+
+
+def _live(found):
+    """`found` (a get_many result) without tombstones."""
+    return {key: value for key, value in found.items() if value != INVALIDATED}
+
+
+def _fill(cache, to_set):
+    # add(), not set_many(): never overwrite a tombstone written since the read
+    for key, value in to_set.items():
+        cache.add(key, value, POST_CACHE_TIMEOUT)
+
+
+async def _afill(cache, to_set):
+    for key, value in to_set.items():
+        await cache.aadd(key, value, POST_CACHE_TIMEOUT)
+
+
+def _primary(model):
+    # Fills are shared by every reader: never take them from a replica
+    return model.objects.db_manager(router.db_for_write(model))
+
+
+def _absolute(url, base_url):
+    return base_url + url if url.startswith('/') else url
+
+
+def _drop_stale(posts, versions):
+    """
+    Remove from `posts` the parts that disagree with their `post_version` row in
+    `versions` and return their cache keys. The caller deletes those before the
+    refill, so add() can store the fresh part while a later tombstone still wins.
+    """
+    stale = [pid for pid, part in posts.items() if pid in versions and not part_matches_version(part, versions[pid])]
+    for pid in stale:
+        del posts[pid]
+    return [post_key(pid) for pid in stale]
+
+
+def _load_parts(post_ids, with_authors=True, versions=None):
+    """
+    Return ({post_id: post_part}, {user_id: author_part}) for `post_ids`, filling misses.
+    Author parts are only guaranteed with `with_authors`. Cached parts that disagree
+    with their row in `versions` ({post_id: post_version row}) are refilled.
+    """
+    cache = _cache()
+    found = _live(cache.get_many([post_key(pid) for pid in post_ids]))
+    posts = {pid: found[post_key(pid)] for pid in post_ids if post_key(pid) in found}
+    authors = {}
+    stale = _drop_stale(posts, versions or {})
+    if stale:
+        cache.delete_many(stale)
+
+    missing = [pid for pid in post_ids if pid not in posts]
+    if missing:
+        to_set = {}
+        # Rows, not instances: payloads are built without DRF's field machinery (posts.payloads)
+        for row in post_rows(_primary(Post).filter(pk__in=missing)):
+            posts[row['id']] = to_set[post_key(row['id'])] = post_part(row)
+            authors[row['user_id']] = to_set[author_key(row['user_id'])] = author_part(row, 'user__')
+        _fill(cache, to_set)
+
+    author_ids = {part['user'] for part in posts.values()} - set(authors) if with_authors else ()
+    if author_ids:
+        found = _live(cache.get_many([author_key(uid) for uid in author_ids]))
+        authors.update({uid: found[author_key(uid)] for uid in author_ids if author_key(uid) in found})
+        missing_authors = author_ids - set(authors)
+        if missing_authors:
+            to_set = {}
+            for row in _primary(User).filter(pk__in=missing_authors).values('id', *AUTHOR_COLUMNS):
+                authors[row['id']] = to_set[author_key(row['id'])] = author_part(row)
+            _fill(cache, to_set)
+
+    return posts, authors
+
+
+async def _aload_parts(post_ids, with_authors=True, versions=None):
+    """Async twin of `_load_parts` (async cache API and async ORM iteration)."""
+    cache = _cache()
+    found = _live(await cache.aget_many([post_key(pid) for pid in post_ids]))
+    posts = {pid: found[post_key(pid)] for pid in post_ids if post_key(pid) in found}
+    authors = {}
+    stale = _drop_stale(posts, versions or {})
+    if stale:
+        await cache.adelete_many(stale)
+
+    missing = [pid for pid in post_ids if pid not in posts]
+    if missing:
+        to_set = {}
+        async for row in post_rows(_primary(Post).filter(pk__in=missing)):
+            posts[row['id']] = to_set[post_key(row['id'])] = post_part(row)
+            authors[row['user_id']] = to_set[author_key(row['user_id'])] = author_part(row, 'user__')
+        await _afill(cache, to_set)
+
+    author_ids = {part['user'] for part in posts.values()} - set(authors) if with_authors else ()
+    if author_ids:
+        found = _live(await cache.aget_many([author_key(uid) for uid in author_ids]))
+        authors.update({uid: found[author_key(uid)] for uid in author_ids if author_key(uid) in found})
+        missing_authors = author_ids - set(authors)
+        if missing_authors:
+            to_set = {}
+            async for row in _primary(User).filter(pk__in=missing_authors).values('id', *AUTHOR_COLUMNS):
+                authors[row['id']] = to_set[author_key(row['id'])] = author_part(row)
+            await _afill(cache, to_set)
+
+    return posts, authors
+
+
+def _reactions_queryset(request, post_ids):
+    user = getattr(request, 'user', None)
+    if not post_ids or not user or not user.is_authenticated:
+        return None
+    return (
+        PostLike.objects.filter(user_id=user.pk, post_id__in=post_ids)
+        .exclude(reaction=PostLike.REACTION_NONE)
+        .values_list('post_id', 'reaction')
+    )
+
+
+def _pending_keys(user, post_ids):
+    if not WRITE_BEHIND or not post_ids or not user or not user.is_authenticated:
+        return {}
+    return {pending_reaction_key(user.pk, pid): pid for pid in post_ids}
+
+
+def _with_pending(reactions, keys, found):
+    for key, reaction in found.items():
+        if reaction == PostLike.REACTION_NONE:
+            reactions.pop(keys[key], None)
+        else:
+            reactions[keys[key]] = reaction
+    return reactions
+
+
+def with_pending_reactions(user, reactions, post_ids):
+    """`reactions` ({post_id: reaction}) updated with `user`'s buffered toggles on `post_ids`."""
+    keys = _pending_keys(user, post_ids)
+    return _with_pending(reactions, keys, _cache().get_many(list(keys)) if keys else {})
+
+
+async def awith_pending_reactions(user, reactions, post_ids):
+    """Async twin of `with_pending_reactions`."""
+    keys = _pending_keys(user, post_ids)
+    return _with_pending(reactions, keys, await _cache().aget_many(list(keys)) if keys else {})
+
+
+def _absolutize(item, fields, base_url):
+    for field in URL_FIELDS:
+        if field not in fields:
+            continue
+        url = item.get(field)
+        if url and base_url:
+            item[field] = _absolute(url, base_url)
+        elif field != 'image' and not base_url:
+            # Same as PostSerializer: method URL fields need a request
+            item[field] = None
+    if base_url and 'image_srcset' in fields:
+        item['image_srcset'] = {
+            fmt: {width: _absolute(url, base_url) for width, url in urls.items()}
+            for fmt, urls in (item.get('image_srcset') or {}).items()
+        }
+    return item
+
+
+def _merge(post_ids, posts, authors, reactions, request, selection):
+    base_url = request.build_absolute_uri('/').rstrip('/') if request else ''
+    post_fields = selection.post_fields
+    author_fields = selection.author_fields
+    sideloaded = {} if selection.sideload_authors else None
+    payloads = []
+    for pid in post_ids:
+        if pid not in posts:
+            continue
+        merged = dict(posts[pid])
+        author = authors.get(merged['user'], dict.fromkeys(AUTHOR_FIELDS))
+        if sideloaded is None:
+            merged.update(author)
+        elif merged['user'] not in sideloaded:
+            sideloaded[merged['user']] = _absolutize(
+                {field: author.get(field) for field in author_fields}, author_fields, base_url,
+            )
+        if selection.needs_reactions:
+            merged['user_reaction'] = reactions.get(pid)
+        _absolutize(merged, post_fields, base_url)
+        payloads.append({field: merged.get(field) for field in post_fields})
+    return payloads, sideloaded
+
+
+def _full_selection():
+    from .serializers import PostSerializer
+
+    return full_selection(PostSerializer.Meta.fields)
+
+
+def get_post_payloads(post_ids, request, selection=None, reactions=None):
+    """
+    Return PostSerializer-shaped dicts for `post_ids` (in that order, skipping posts
+    that no longer exist). Cache hits cost no ORM work apart from one query for the
+    viewer's reactions, skipped when the caller already has them as `reactions`
+    ({post_id: reaction}).
+    """
+    return get_post_page(post_ids, request, selection, reactions)[0]
+
+
+def get_post_page(post_ids, request, selection=None, reactions=None):
+    """
+    `get_post_payloads` returning (payloads, authors): `authors` is the sideloaded
+    {user_id: author fields} map when `selection` asks for it, else None.
+    """
+    selection = selection or _full_selection()
+    post_ids = list(post_ids)
+    posts, authors = _load_parts(post_ids, with_authors=bool(selection.author_fields))
+    if reactions is None and selection.needs_reactions:
+        visible = [pid for pid in post_ids if pid in posts]
+        reactions_qs = _reactions_queryset(request, visible)
+        reactions = dict(reactions_qs) if reactions_qs is not None else {}
+        reactions = with_pending_reactions(getattr(request, 'user', None), reactions, visible)
+    with span('serialize'):
+        return _merge(post_ids, posts, authors, reactions, request, selection)
+
+
+def get_post_detail(version, request, selection, reactions):
+    """
+    (payload, current) for the post of `version`, a `post_version` row whose
+    validators the response carries. A cached part that disagrees with the row is
+    refilled from the primary, so the payload is never older than those validators.
+    `current` is False when it is newer (the row came from a lagging replica, or a
+    write landed in between): the validators then do not describe it. The payload is
+    None when the post is gone.
+    """
+    pid = version['id']
+    posts, authors = _load_parts([pid], bool(selection.author_fields), versions={pid: version})
+    if pid not in posts:
+        return None, False
+    with span('serialize'):
+        payloads, _ = _merge([pid], posts, authors, reactions, request, selection)
+    return payloads[0], part_matches_version(posts[pid], version)
+
+
+async def aget_post_detail(version, request, selection, reactions):
+    """Async twin of `get_post_detail`."""
+    pid = version['id']
+    posts, authors = await _aload_parts([pid], bool(selection.author_fields), versions={pid: version})
+    if pid not in posts:
+        return None, False
+    with span('serialize'):
+        payloads, _ = _merge([pid], posts, authors, reactions, request, selection)
+    return payloads[0], part_matches_version(posts[pid], version)
+
+
+async def aget_post_payloads(post_ids, request, selection=None, reactions=None):
+    """Async twin of `get_post_payloads` for the ASGI views."""
+    return (await aget_post_page(post_ids, request, selection, reactions))[0]
+
+
+async def aget_post_page(post_ids, request, selection=None, reactions=None):
+    """Async twin of `get_post_page`."""
+    selection = selection or _full_selection()
+    post_ids = list(post_ids)
+    posts, authors = await _aload_parts(post_ids, with_authors=bool(selection.author_fields))
+    if reactions is None and selection.needs_reactions:
+        visible = [pid for pid in post_ids if pid in posts]
+        reactions_qs = _reactions_queryset(request, visible)
+        reactions = {pid: r async for pid, r in reactions_qs} if reactions_qs is not None else {}
+        reactions = await awith_pending_reactions(getattr(request, 'user', None), reactions, visible)
+    with span('serialize'):
+        return _merge(post_ids, posts, authors, reactions, request, selection)
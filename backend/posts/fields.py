@@ -0,0 +1,69 @@
+"""
+Sparse fieldsets for post payloads (lists, feed, search and detail).
+
+    ?fields=id,description,likes_count   only these fields
+    ?include=authors                     author fields move to a top-level `authors`
+                                         map keyed by user id, once per author per page
+    ?compact=1                           COMPACT_FIELDS with authors sideloaded
+
+Unrequested fields are never computed. Without `user_reaction`, the viewer's
+reactions query is skipped. Without author fields, the author cache entries are
+not read. URLs are only made absolute for URL fields that are requested.
+"""
+from collections import namedtuple
+
+from rest_framework.exceptions import ValidationError
+
+AUTHOR_FIELDS = ('user_name', 'user_email', 'user_profile_picture')
+# One image URL, no e-mail, no updated_at; the author's name and picture are sideloaded
+COMPACT_FIELDS = (
+    'id', 'user', 'description', 'image_url', 'image_srcset',
+    'likes_count', 'dislikes_count', 'user_reaction', 'created_at',
+    'user_name', 'user_profile_picture',
+)
+
+
+class FieldSelection(namedtuple('FieldSelection', ['fields', 'sideload_authors'])):
+    """Post payload fields to emit (in serializer order), and whether authors are sideloaded."""
+
+    @property
+    def author_fields(self):
+        selected = tuple(f for f in self.fields if f in AUTHOR_FIELDS)
+        return selected or (AUTHOR_FIELDS if self.sideload_authors else ())
+
+    @property
+    def post_fields(self):
+        """Fields emitted on each post (author fields leave when they are sideloaded)."""
+        if not self.sideload_authors:
+            return self.fields
+        return tuple(f for f in self.fields if f not in AUTHOR_FIELDS)
+
+    @property
+    def needs_reactions(self):
+        return 'user_reaction' in self.fields
+
+
+def full_selection(all_fields):
+    return FieldSelection(tuple(all_fields), False)
+
+
+def parse_field_selection(request, all_fields):
+    """Build the FieldSelection for `request`'s query parameters; 400 on unknown fields."""
+    params = request.query_params if hasattr(request, 'query_params') else request.GET
+    compact = params.get('compact', '').lower() in ('1', 'true', 'yes')
+    sideload = compact or 'authors' in params.get('include', '').split(',')
+
+    raw = params.get('fields')
+    if raw:
+        requested = {name.strip() for name in raw.split(',') if name.strip()}
+        unknown = requested - set(all_fields)
+        if unknown:
+            raise ValidationError({'fields': [f'Unknown field(s): {", ".join(sorted(unknown))}.']})
+    elif compact:
+        requested = set(COMPACT_FIELDS)
+    else:
+        requested = set(all_fields)
+
+    if sideload:
+        requested.add('user')  # the key into the `authors` map
+    return FieldSelection(tuple(f for f in all_fields if f in requested), sideload)
@@ -0,0 +1,128 @@
+import random
+import string
+from datetime import date, timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.models import Post, PostLike
+
+User = get_user_model()
+
+WORDS = (
+    'morning coffee sunset weekend travel photo music concert friends family city beach '
+    'mountain hiking running workout recipe dinner pizza garden books reading movie series '
+    'project launch team office remote coding python django release update news happy '
+    'finally amazing today tomorrow yesterday great little first new best favourite'
+).split()
+
+
+def _word(rng, length):
+    return rng.choice(string.ascii_uppercase) + ''.join(rng.choices(string.ascii_lowercase, k=length - 1))
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic data set for benchmarks: users, posts and a skewed (Zipf-like) "
+        "reaction distribution, inserted with bulk_create in chunks. Denormalized counters "
+        "are recomputed at the end. All users share the --password."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Number of users (default: 1000).')
+        parser.add_argument('--posts-per-user', type=int, default=10, help='Posts per user (default: 10).')
+        parser.add_argument(
+            '--reactions-per-post', type=float, default=5.0,
+            help='Average reactions per post; popular posts get far more (default: 5).',
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Zipf exponent of post popularity; 0 means uniform (default: 1.1).',
+        )
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per bulk_create (default: 5000).')
+        parser.add_argument('--prefix', default='bench', help="Email prefix, e.g. bench-17@example.com (default: bench).")
+        parser.add_argument('--password', default='bench-password', help='Password of every generated user.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for repeatable data sets (default: 0).')
+
+    def handle(self, *args, **options):
+        if options['users'] <= 0:
+            raise CommandError('--users must be positive.')
+        rng = random.Random(options['seed'])
+        chunk = options['chunk_size']
+
+        user_ids = self.create_users(options, rng, chunk)
+        post_ids = self.create_posts(user_ids, options['posts_per_user'], rng, chunk)
+        reactions = self.create_reactions(user_ids, post_ids, options, rng, chunk)
+
+        # bulk_create bypasses the views that maintain the counters
+        call_command('recount_posts', stdout=self.stdout)
+        call_command('recount_reactions', stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {len(user_ids)} users, {len(post_ids)} posts, {reactions} reactions."
+        ))
+
+    def create_users(self, options, rng, chunk):
+        # One hash for everyone: hashing per user would dominate the run time
+        password = make_password(options['password'])
+        prefix = options['prefix']
+        today = date.today()
+
+        user_ids = []
+        for start in range(0, options['users'], chunk):
+            batch = [
+                User(
+                    email=f'{prefix}-{i}@example.com',
+                    full_name=f'{_word(rng, 5)} {_word(rng, 7)}',
+                    date_of_birth=today - timedelta(days=rng.randint(18 * 365, 70 * 365)),
+                    password=password,
+                )
+                for i in range(start, min(start + chunk, options['users']))
+            ]
+            with transaction.atomic():
+                user_ids.extend(user.pk for user in User.objects.bulk_create(batch))
+        return user_ids
+
+    def create_posts(self, user_ids, per_user, rng, chunk):
+        owners = [uid for uid in user_ids for _ in range(per_user)]
+        rng.shuffle(owners)  # interleave authors like a real timeline
+
+        post_ids = []
+        for start in range(0, len(owners), chunk):
+            batch = [
+                Post(user_id=uid, description=' '.join(rng.choices(WORDS, k=rng.randint(4, 40))))
+                for uid in owners[start:start + chunk]
+            ]
+            with transaction.atomic():
+                post_ids.extend(post.pk for post in Post.objects.bulk_create(batch))
+        return post_ids
+
+    def create_reactions(self, user_ids, post_ids, options, rng, chunk):
+        if not post_ids or options['reactions_per_post'] <= 0:
+            return 0
+        # Popularity rank r gets weight 1 / r**skew; ranks are assigned to posts at random
+        ranked = list(post_ids)
+        rng.shuffle(ranked)
+        cum_weights = list(accumulate(1 / (rank ** options['skew']) for rank in range(1, len(ranked) + 1)))
+
+        total = int(len(post_ids) * options['reactions_per_post'])
+        reactions = (PostLike.REACTION_LIKE, PostLike.REACTION_DISLIKE, PostLike.REACTION_NONE)
+        before = PostLike.objects.count()
+        for start in range(0, total, chunk):
+            size = min(chunk, total - start)
+            pairs = set(zip(
+                rng.choices(user_ids, k=size),
+                rng.choices(ranked, cum_weights=cum_weights, k=size),
+            ))
+            batch = [
+                PostLike(user_id=uid, post_id=pid, reaction=rng.choices(reactions, weights=(80, 15, 5))[0])
+                for uid, pid in pairs
+            ]
+            with transaction.atomic():
+                # A (user, post) pair drawn twice across chunks is simply skipped
+                PostLike.objects.bulk_create(batch, ignore_conflicts=True)
+        return PostLike.objects.count() - before
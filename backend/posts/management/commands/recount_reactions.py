@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.cache import invalidate_posts
+from posts.models import Post, PostLike
+
+
+def reaction_count(reaction):
+    """
+    Correlated subquery counting `reaction` rows in post_likes for the outer post.
+    COUNT(*) rather than COUNT(id): answered from post_likes_post_reaction_idx alone.
+    """
+    return Coalesce(
+        Subquery(
+            PostLike.objects.filter(post=OuterRef('pk'), reaction=reaction)
+            .order_by()
+            .values('post')
+            .annotate(c=Count('*'))
+            .values('c')
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = "Recompute Post.likes_count / Post.dislikes_count from post_likes to repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of posts updated per transaction (default: 5000).',
+        )
+        parser.add_argument(
+            '--post', type=int, action='append', dest='post_ids',
+            help='Only recount the given post id (may be repeated).',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        base_qs = Post.objects.order_by('pk')
+        if options['post_ids']:
+            base_qs = base_qs.filter(pk__in=options['post_ids'])
+
+        updated = 0
+        last_pk = 0
+        while True:
+            # Walk the table in pk ranges so each UPDATE holds locks briefly
+            pks = list(base_qs.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            with transaction.atomic():
+                updated += Post.objects.filter(pk__in=pks).update(
+                    likes_count=reaction_count(PostLike.REACTION_LIKE),
+                    dislikes_count=reaction_count(PostLike.REACTION_DISLIKE),
+                )
+            # QuerySet.update() sends no post_save, so the cached payloads are dropped here
+            invalidate_posts(pks)
+            last_pk = pks[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Recounted reactions for {updated} posts."))
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_remove_postlike_is_like_postlike_reaction'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='post',
+            options={'ordering': ['-created_at', '-id'], 'verbose_name': 'Post', 'verbose_name_plural': 'Posts'},
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_at', '-id'], name='posts_created_id_idx'),
+        ),
+    ]
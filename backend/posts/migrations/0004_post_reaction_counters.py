@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:30
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    PostLike = apps.get_model('posts', 'PostLike')
+
+    def reaction_count(reaction):
+        return Coalesce(
+            Subquery(
+                PostLike.objects.filter(post=OuterRef('pk'), reaction=reaction)
+                .order_by()
+                .values('post')
+                .annotate(c=Count('id'))
+                .values('c')
+            ),
+            0,
+        )
+
+    Post.objects.update(
+        likes_count=reaction_count('like'),
+        dislikes_count=reaction_count('dislike'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_post_created_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='dislikes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
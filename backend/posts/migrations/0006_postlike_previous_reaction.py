@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postlike',
+            name='previous_reaction',
+            field=models.CharField(choices=[('none', 'No Reaction'), ('like', 'Like'), ('dislike', 'Dislike')], default='none', max_length=10),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:00
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+from backend_main.operations import PostgreSQLOnly
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_post_image_variants'),
+    ]
+
+    # TrigramExtension skips other databases by itself; the trigger and the GIN
+    # indexes only exist on PostgreSQL (see backend_main.operations)
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        PostgreSQLOnly(migrations.RunSQL(
+            sql="""
+                CREATE FUNCTION posts_search_vector_update() RETURNS trigger AS $$
+                BEGIN
+                    NEW.search_vector := to_tsvector('english'::regconfig, COALESCE(NEW.description, ''));
+                    RETURN NEW;
+                END
+                $$ LANGUAGE plpgsql;
+
+                CREATE TRIGGER posts_search_vector_trigger
+                    BEFORE INSERT OR UPDATE OF description ON posts
+                    FOR EACH ROW EXECUTE FUNCTION posts_search_vector_update();
+
+                UPDATE posts
+                SET search_vector = to_tsvector('english'::regconfig, COALESCE(description, ''));
+            """,
+            reverse_sql="""
+                DROP TRIGGER IF EXISTS posts_search_vector_trigger ON posts;
+                DROP FUNCTION IF EXISTS posts_search_vector_update();
+            """,
+        )),
+        PostgreSQLOnly(migrations.AddIndex(
+            model_name='post',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='posts_search_vector_idx'),
+        )),
+        PostgreSQLOnly(migrations.AddIndex(
+            model_name='post',
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper('description'), name='gin_trgm_ops'
+                ),
+                name='posts_description_trgm_idx',
+            ),
+        )),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:25
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+from backend_main.operations import PostgreSQLOnly
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction; it builds the
+    # indexes without blocking writes to posts / post_likes
+    atomic = False
+
+    dependencies = [
+        ('posts', '0008_post_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        PostgreSQLOnly(AddIndexConcurrently(
+            model_name='post',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='posts_user_created_idx'),
+        )),
+        PostgreSQLOnly(AddIndexConcurrently(
+            model_name='postlike',
+            index=models.Index(fields=['post', 'reaction'], name='post_likes_post_reaction_idx'),
+        )),
+        PostgreSQLOnly(AddIndexConcurrently(
+            model_name='postlike',
+            index=models.Index(
+                condition=models.Q(('reaction', 'none'), _negated=True),
+                fields=['user', 'post'],
+                include=('reaction',),
+                name='likes_user_post_reacted_idx',
+            ),
+        )),
+    ]
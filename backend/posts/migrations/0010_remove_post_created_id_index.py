@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 21:40
+
+from django.contrib.postgres.operations import RemoveIndexConcurrently
+from django.db import migrations
+
+from backend_main.operations import PostgreSQLOnly
+
+
+class Migration(migrations.Migration):
+
+    # Every post list is filtered by user_id and served by posts_user_created_idx
+    # (0009); DROP INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('posts', '0009_access_path_indexes'),
+    ]
+
+    operations = [
+        PostgreSQLOnly(RemoveIndexConcurrently(
+            model_name='post',
+            name='posts_created_id_idx',
+        )),
+    ]
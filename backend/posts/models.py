@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models.functions import Upper
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import FileExtensionValidator
 
 
@@ -20,12 +23,32 @@ class Post(models.Model):
             FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png'])
         ]
     )
+    # {format: {width: storage name}} written by backend_main.imaging after upload
+    image_variants = models.JSONField(default=dict, blank=True)
+    # Denormalized reaction counters, maintained by PostLikeToggleSerializer.save
+    # in the same transaction as the PostLike change (see `recount_reactions`).
+    likes_count = models.PositiveIntegerField(default=0)
+    dislikes_count = models.PositiveIntegerField(default=0)
+    # to_tsvector('english', description), kept current by the posts_search_vector_update
+    # trigger (migration 0008) on INSERT and on UPDATE OF description
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'posts'
-        ordering = ['-created_at']
+        # `id` breaks ties between posts created in the same instant so keyset
+        # pagination over (created_at, id) is stable.
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # A user's posts page: WHERE user_id = ? ORDER BY created_at DESC, id DESC,
+            # reading only (created_at, id), so the keyset page is an index-only scan
+            models.Index(fields=['user', '-created_at', '-id'], name='posts_user_created_idx'),
+            GinIndex(fields=['search_vector'], name='posts_search_vector_idx'),
+            # Trigram index on UPPER(description): what `description__icontains` compiles to,
+            # used by the search fallback and the admin search
+            GinIndex(OpClass(Upper('description'), name='gin_trgm_ops'), name='posts_description_trgm_idx'),
+        ]
         verbose_name = 'Post'
         verbose_name_plural = 'Posts'
     
@@ -59,14 +82,73 @@ class PostLike(models.Model):
         choices=REACTION_CHOICES,
         default=REACTION_NONE,
     )
+    # Reaction before the last toggle. Written by the upsert in posts.reactions so the
+    # counter deltas come out of the same statement (RETURNING only sees new values).
+    previous_reaction = models.CharField(
+        max_length=10,
+        choices=REACTION_CHOICES,
+        default=REACTION_NONE,
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'post_likes'
         unique_together = ('user', 'post')  # one row per user+post
+        indexes = [
+            # Reaction counts per post (recount_reactions): index-only COUNT(*) per reaction
+            models.Index(fields=['post', 'reaction'], name='post_likes_post_reaction_idx'),
+            # The viewer's reactions on a page of posts. 'none' rows mean "no reaction"
+            # and are filtered out by every reader, so they are left out of the index
+            models.Index(
+                fields=['user', 'post'], include=['reaction'],
+                condition=~models.Q(reaction='none'), name='likes_user_post_reacted_idx',
+            ),
+        ]
         verbose_name = 'Post Like'
         verbose_name_plural = 'Post Likes'
 
     def __str__(self):
         return f"{self.user.email} {self.reaction} post {self.post.id}"
 
+    @classmethod
+    def counter_deltas(cls, old_reaction, new_reaction):
+        """Return the (likes, dislikes) counter change for a reaction going old -> new."""
+        likes = (new_reaction == cls.REACTION_LIKE) - (old_reaction == cls.REACTION_LIKE)
+        dislikes = (new_reaction == cls.REACTION_DISLIKE) - (old_reaction == cls.REACTION_DISLIKE)
+        return likes, dislikes
+
+
+
+class TimelineEntry(models.Model):
+    """
+    Materialized home-feed row: `post` appears in `owner`'s feed.
+    Written on post creation (fan-out-on-write) for authors below
+    FEED_FANOUT_MAX_FOLLOWERS; bigger accounts are merged in at read time.
+    """
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    # Copied from post.user so unfollow can drop entries without a JOIN
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+
+    class Meta:
+        db_table = 'timeline_entries'
+        # (owner, post) doubles as the feed index: WHERE owner_id = ? AND post_id < ? ORDER BY post_id DESC
+        unique_together = ('owner', 'post')
+        verbose_name = 'Timeline Entry'
+        verbose_name_plural = 'Timeline Entries'
+
+    def __str__(self):
+        return f"post {self.post_id} in feed of {self.owner_id}"
@@ -0,0 +1,187 @@
+import base64
+import json
+from collections import OrderedDict
+from datetime import date, datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Forward-only keyset (seek) pagination with an opaque cursor.
+
+    The cursor holds the ordering values of the last row on the page, so the next
+    page is fetched with `WHERE (created_at, id) < (:created_at, :id)` instead of an
+    OFFSET. Every page costs one index range scan, no matter how deep the client is.
+
+    `ordering` must end in a unique column (the pk) so the order is total.
+    """
+    page_size = api_settings.PAGE_SIZE or 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._prepare(queryset, request, view)
+        # Fetch one extra row to learn whether there is a next page without a COUNT(*)
+        return self._set_page(list(queryset[:self.page_size + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Async twin of `paginate_queryset` for the ASGI views."""
+        queryset = self._prepare(queryset, request, view)
+        return self._set_page([row async for row in queryset[:self.page_size + 1]])
+
+    def _prepare(self, queryset, request, view):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(view)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+        return queryset
+
+    def _set_page(self, rows):
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_paginated_data(self, data):
+        return OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ])
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, 'cursor_ordering', None) or self.ordering)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        last = self.page[-1]
+        position = [self._dump_value(self._get_value(last, field)) for field in self.ordering]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position))
+
+    # Cursor encoding
+
+    def encode_cursor(self, position):
+        raw = json.dumps(position, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            position = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError
+            return [
+                self._load_value(model, field, value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (TypeError, ValueError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_keyset_filter(self, position):
+        """
+        Build `(a, b, c) < (x, y, z)` as
+        `a <= x AND (a < x OR (a = x AND (b < y OR (b = y AND c < z))))`.
+        The leading `a <= x` gives the planner a plain range condition on the index.
+        """
+        fields = [(f.lstrip('-'), f.startswith('-')) for f in self.ordering]
+
+        condition = None
+        for (name, descending), value in reversed(list(zip(fields, position))):
+            strict = Q(**{f'{name}__{"lt" if descending else "gt"}': value})
+            if condition is None:
+                condition = strict
+            else:
+                condition = strict | (Q(**{name: value}) & condition)
+
+        first_name, first_desc = fields[0]
+        bound = Q(**{f'{first_name}__{"lte" if first_desc else "gte"}': position[0]})
+        return bound & condition
+
+    # Helpers
+
+    @staticmethod
+    def _get_value(obj, field):
+        name = field.lstrip('-')
+        if isinstance(obj, dict):
+            return obj[name]
+        return getattr(obj, name)
+
+    @staticmethod
+    def _dump_value(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        return value
+
+    @staticmethod
+    def _load_value(model, field, value):
+        name = field.lstrip('-')
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotation (e.g. a search rank) - keep the raw JSON value
+            return value
+        if model_field.get_internal_type() == 'DateTimeField':
+            parsed = parse_datetime(value) if isinstance(value, str) else None
+            if parsed is None:
+                raise ValueError
+            return parsed
+        return model_field.to_python(value)
+
+
+class PostIdCursorPagination(KeysetCursorPagination):
+    """Keyset pagination on the post id alone; used by the home feed."""
+    ordering = ('-id',)
+
+
+class SearchRankCursorPagination(KeysetCursorPagination):
+    """Keyset pagination over (search rank, id) for full-text search results."""
+    ordering = ('-rank', '-id')
+
+
+class TrigramSearchCursorPagination(PostIdCursorPagination):
+    """Pages of the trigram search fallback; the next link keeps `mode=trigram`."""
+    mode_query_param = 'mode'
+
+    def get_next_link(self):
+        link = super().get_next_link()
+        return link and replace_query_param(link, self.mode_query_param, 'trigram')
@@ -0,0 +1,89 @@
+"""
+Read-only post payloads built directly from `.values()` rows.
+
+Produces what PostSerializer (without a request) emits for the fields the post
+cache stores. It skips model instances and DRF's per-field get_attribute /
+to_representation calls. Datetimes are formatted by DRF's own
+DateTimeField.to_representation, so the values are identical.
+"""
+from django.core.files.storage import default_storage
+from django.db.models import CharField, OuterRef, Subquery, Value
+from rest_framework import serializers
+
+from backend_main.imaging import build_srcset
+from .models import PostLike
+
+POST_COLUMNS = (
+    'id', 'user_id', 'description', 'image', 'image_variants',
+    'likes_count', 'dislikes_count', 'created_at', 'updated_at',
+)
+AUTHOR_COLUMNS = ('full_name', 'email', 'profile_picture')
+
+_datetime = serializers.DateTimeField()
+
+
+def media_url(name):
+    """Relative URL of a stored file name, like FieldFile.url (None for no file)."""
+    return default_storage.url(name) if name else None
+
+
+def post_rows(queryset):
+    """`queryset.values()` with every column `post_part` and `author_part(row, 'user__')` read."""
+    return queryset.values(*POST_COLUMNS, *(f'user__{column}' for column in AUTHOR_COLUMNS))
+
+
+def post_version(queryset, user):
+    """
+    `queryset.values()` of what a post payload's version depends on: the post's
+    updated_at and counters, the author's updated_at, and the viewer's `reaction`
+    (None when anonymous or 'none'). One indexed lookup, for conditional GETs; the
+    reaction comes from the covering likes_user_post_reacted_idx.
+    """
+    if user is not None and user.is_authenticated:
+        reaction = Subquery(
+            PostLike.objects.filter(post_id=OuterRef('pk'), user_id=user.pk)
+            .exclude(reaction=PostLike.REACTION_NONE)
+            .values('reaction')[:1]
+        )
+    else:
+        reaction = Value(None, output_field=CharField())
+    return queryset.annotate(reaction=reaction).values(
+        'id', 'updated_at', 'likes_count', 'dislikes_count', 'user__updated_at', 'reaction',
+    )
+
+
+def version_reactions(row):
+    """The `reactions` map for get_post_payloads from a `post_version` row."""
+    reaction = row['reaction']
+    return {row['id']: reaction} if reaction and reaction != PostLike.REACTION_NONE else {}
+
+
+def part_matches_version(part, row):
+    """True when a post part (`post_part`) has the counters and updated_at of a `post_version` row."""
+    return (part['likes_count'], part['dislikes_count'], part['updated_at']) == (
+        row['likes_count'], row['dislikes_count'], _datetime.to_representation(row['updated_at']),
+    )
+
+
+def post_part(row):
+    image = media_url(row['image'])
+    return {
+        'id': row['id'],
+        'user': row['user_id'],
+        'description': row['description'],
+        'image': image,
+        'image_url': image,
+        'image_srcset': build_srcset(row['image_variants']),
+        'likes_count': row['likes_count'],
+        'dislikes_count': row['dislikes_count'],
+        'created_at': _datetime.to_representation(row['created_at']),
+        'updated_at': _datetime.to_representation(row['updated_at']),
+    }
+
+
+def author_part(row, prefix=''):
+    return {
+        'user_name': row[prefix + 'full_name'],
+        'user_email': row[prefix + 'email'],
+        'user_profile_picture': media_url(row[prefix + 'profile_picture']),
+    }
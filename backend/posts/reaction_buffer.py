@@ -0,0 +1,333 @@
+"""
+Write-behind buffer for reaction toggles (REACTION_WRITE_BEHIND).
+
+When one post goes viral, every direct toggle updates the same `posts` row, and
+the toggles queue on its row lock. In write-behind mode a toggle only
+  1. reads the post and the user's stored reaction (one indexed read, no lock),
+     unless the pair already has a pending reaction,
+  2. records the new reaction as pending in this process, and mirrors it into
+     the post cache (`posts:reaction:<user>:<post>`, see posts.cache),
+and is answered right away. A flusher thread writes all pending pairs every
+REACTION_BUFFER_FLUSH_INTERVAL seconds (or as soon as REACTION_BUFFER_MAX_PENDING
+pairs are waiting) in one set-based statement. The statement upserts the
+desired reactions into post_likes and applies the summed counter change once
+per post, so a hot post's row is written once per flush instead of once per click.
+
+Back-pressure: while REACTION_BUFFER_MAX_PENDING pairs are waiting (the database
+is slow or down and flushes keep failing), a toggle of a pair that is not
+already pending is written by the request itself, so the buffer stops growing
+and a failing database surfaces as failing requests.
+
+Because the flush writes the desired state, not a toggle, post_likes and the
+counters stay consistent whatever order flushes from different processes
+commit in. After each flush, a pair whose mirrored state was changed by another
+process meanwhile is queued again with that state. Mirrors are not deleted: the
+cache has no compare-and-delete, so a delete could drop a mirror that another
+worker has just rewritten. Once written, a mirror matches post_likes until it
+expires (REACTION_BUFFER_PENDING_TTL) or the next toggle replaces it.
+
+Read-your-writes: `user_reaction` in post payloads and the detail ETag
+overlay the pending state. This needs a cache shared by every worker, so
+`check_shared_cache` refuses to run write-behind on a per-process cache
+(PostsConfig.ready). The counters only include a toggle once it is flushed.
+
+Durability: pending reactions live in process memory, and the cache copy is only
+for reads. A crash loses at most the toggles of the last
+REACTION_BUFFER_FLUSH_INTERVAL seconds. The buffer is also flushed at
+interpreter exit.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, connections, router, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+
+from .cache import POST_CACHE_ALIAS, invalidate_posts, pending_reaction_key
+from .models import Post, PostLike
+from .reactions import POST_NOT_FOUND, ToggleResult
+from .realtime import publish_reactions
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = getattr(settings, 'REACTION_BUFFER_FLUSH_INTERVAL', 0.2)
+MAX_PENDING = getattr(settings, 'REACTION_BUFFER_MAX_PENDING', 10000)
+# Must comfortably exceed FLUSH_INTERVAL: an expired entry is read back from post_likes
+PENDING_TTL = getattr(settings, 'REACTION_BUFFER_PENDING_TTL', 60)
+LOCK_STRIPES = 64
+# Cache backends whose entries other worker processes cannot see
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def check_shared_cache():
+    """Raise ImproperlyConfigured unless POST_CACHE_ALIAS is a cache shared across processes."""
+    backend = settings.CACHES[POST_CACHE_ALIAS]['BACKEND']
+    if backend in PROCESS_LOCAL_CACHES:
+        raise ImproperlyConfigured(
+            f'REACTION_WRITE_BEHIND needs a shared cache: the {POST_CACHE_ALIAS!r} cache '
+            f'(POST_CACHE_ALIAS) uses {backend}, which other workers cannot read.'
+        )
+
+
+class ReactionBuffer:
+
+    def __init__(self, interval=FLUSH_INTERVAL, max_pending=MAX_PENDING):
+        self.interval = interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # Per-pair read-modify-write ordering without one process-wide lock
+        self._pair_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._pending = {}  # (user_id, post_id) -> reaction, not yet written
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def _pair_lock(self, pair):
+        return self._pair_locks[hash(pair) % LOCK_STRIPES]
+
+    def toggle(self, user_id, post_id, action):
+        """
+        Buffered toggle_reaction: same action -> none, otherwise -> action.
+        The returned ToggleResult has no counters (they change at flush time).
+        """
+        pair = (user_id, post_id)
+        cache = caches[POST_CACHE_ALIAS]
+        key = pending_reaction_key(user_id, post_id)
+        # Orders toggles of one pair made in this process; concurrent toggles of the
+        # same pair in two processes (a double click across workers) may collapse
+        with self._pair_lock(pair):
+            with self._lock:
+                previous = self._pending.get(pair)
+            if previous is None:
+                previous = cache.get(key) or self._stored_reaction(user_id, post_id)
+            reaction = PostLike.REACTION_NONE if previous == action else action
+            with self._lock:
+                full = pair not in self._pending and len(self._pending) >= self.max_pending
+                if not full:
+                    self._pending[pair] = reaction
+                pending = len(self._pending)
+            if full:
+                # Back-pressure: write this one now instead of growing the buffer. The
+                # mirror follows the write, so a failed write leaves it untouched.
+                apply_reactions([(user_id, post_id, reaction)])
+            cache.set(key, reaction, PENDING_TTL)
+
+        self._ensure_flusher()
+        if pending >= self.max_pending:
+            self._wakeup.set()
+        return ToggleResult(post_id, reaction, previous, None, None)
+
+    @staticmethod
+    def _stored_reaction(user_id, post_id):
+        row = (
+            Post.objects.filter(pk=post_id)
+            .annotate(reaction=Subquery(
+                PostLike.objects.filter(post_id=OuterRef('pk'), user_id=user_id)
+                .exclude(reaction=PostLike.REACTION_NONE)
+                .values('reaction')[:1]
+            ))
+            .values('reaction')
+            .first()
+        )
+        if row is None:
+            raise NotFound(POST_NOT_FOUND)
+        return row['reaction'] or PostLike.REACTION_NONE
+
+    def _ensure_flusher(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None and not self._stopping:
+                self._thread = threading.Thread(target=self._run, name='reaction-flusher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stopping:
+                self._wakeup.wait(self.interval)
+                self._wakeup.clear()
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception('Reaction buffer flush failed; retrying next round')
+                    connections.close_all()
+                else:
+                    close_old_connections()
+        finally:
+            connections.close_all()
+
+    def stop(self, timeout=10):
+        """Flush what is pending and stop the flusher thread (also run at interpreter exit)."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def flush(self):
+        """Write every pending (user, post) reaction; returns the number of rows changed."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            try:
+                applied = apply_reactions([(*pair, reaction) for pair, reaction in batch.items()])
+            except Exception:
+                with self._lock:
+                    # Toggles made during the failed write are newer; keep them
+                    self._pending = {**batch, **self._pending}
+                raise
+
+            self._settle_mirrors(batch)
+            return len(applied)
+
+    def _settle_mirrors(self, batch):
+        """
+        After `batch` is written: queue again the pairs that another process toggled
+        after us (mirrored in the shared cache with a different state), so their
+        state is the one that lands last. Mirrors that match are left to expire.
+        """
+        cache = caches[POST_CACHE_ALIAS]
+        keys = {pending_reaction_key(*pair): pair for pair in batch}
+        # Hold the pairs' stripes so a toggle here cannot interleave with the re-queue
+        stripes = sorted({hash(pair) % LOCK_STRIPES for pair in batch})
+        for stripe in stripes:
+            self._pair_locks[stripe].acquire()
+        try:
+            current = cache.get_many(list(keys))
+            with self._lock:
+                for key, reaction in current.items():
+                    pair = keys[key]
+                    if pair in self._pending:
+                        continue  # toggled again here; that flush settles it
+                    if reaction != batch[pair]:
+                        self._pending[pair] = reaction
+        finally:
+            for stripe in reversed(stripes):
+                self._pair_locks[stripe].release()
+
+
+def apply_reactions(states):
+    """
+    Set (user_id, post_id, reaction) states in one transaction and adjust the counters.
+    Pairs whose post no longer exists are skipped. Returns the ToggleResults of the
+    rows whose reaction changed.
+    """
+    if not states:
+        return []
+    alias = router.db_for_write(PostLike)
+    with transaction.atomic(using=alias):
+        if connections[alias].vendor == 'postgresql':
+            rows = _apply_postgresql(alias, states)
+        else:
+            rows = _apply_portable(alias, states)
+        changed = sorted({row.post_id for row in rows})
+        transaction.on_commit(lambda: invalidate_posts(changed), using=alias)
+        transaction.on_commit(lambda: publish_reactions(rows), using=alias)
+    return rows
+
+
+_APPLY_SQL = """
+WITH input (user_id, post_id, reaction) AS (
+    VALUES {values}
+), upserted AS (
+    INSERT INTO {post_likes} AS pl (user_id, post_id, reaction, previous_reaction, created_at)
+    SELECT i.user_id, i.post_id, i.reaction, %s, %s
+    FROM input AS i
+    JOIN {posts} AS p ON p.id = i.post_id
+    ORDER BY i.post_id, i.user_id
+    ON CONFLICT (user_id, post_id) DO UPDATE SET
+        previous_reaction = pl.reaction,
+        reaction = EXCLUDED.reaction
+    WHERE pl.reaction <> EXCLUDED.reaction
+    RETURNING post_id, reaction, previous_reaction
+), deltas AS (
+    SELECT post_id,
+           SUM((reaction = %s)::int - (previous_reaction = %s)::int) AS likes,
+           SUM((reaction = %s)::int - (previous_reaction = %s)::int) AS dislikes
+    FROM upserted
+    GROUP BY post_id
+), counted AS (
+    UPDATE {posts} AS p SET
+        likes_count = GREATEST(p.likes_count + d.likes, 0),
+        dislikes_count = GREATEST(p.dislikes_count + d.dislikes, 0)
+    FROM deltas AS d
+    WHERE p.id = d.post_id AND (d.likes <> 0 OR d.dislikes <> 0)
+    RETURNING p.id, p.likes_count, p.dislikes_count
+)
+SELECT u.post_id, u.reaction, u.previous_reaction, c.likes_count, c.dislikes_count
+FROM upserted AS u
+JOIN counted AS c ON c.id = u.post_id
+"""
+
+
+def _apply_postgresql(alias, states):
+    connection = connections[alias]
+    sql = _APPLY_SQL.format(
+        values=', '.join(['(%s::bigint, %s::bigint, %s::varchar)'] * len(states)),
+        post_likes=connection.ops.quote_name(PostLike._meta.db_table),
+        posts=connection.ops.quote_name(Post._meta.db_table),
+    )
+    params = [value for state in states for value in state]
+    params += [PostLike.REACTION_NONE, timezone.now()]
+    params += [PostLike.REACTION_LIKE] * 2 + [PostLike.REACTION_DISLIKE] * 2
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [ToggleResult(*row) for row in cursor.fetchall()]
+
+
+def _apply_portable(alias, states):
+    existing = set(
+        Post.objects.using(alias)
+        .filter(pk__in={post_id for _, post_id, _ in states})
+        .values_list('pk', flat=True)
+    )
+    changes = []
+    deltas = {}
+    for user_id, post_id, reaction in sorted(states, key=lambda state: (state[1], state[0])):
+        if post_id not in existing:
+            continue
+        post_like, _ = PostLike.objects.using(alias).select_for_update().get_or_create(
+            post_id=post_id, user_id=user_id, defaults={'reaction': PostLike.REACTION_NONE},
+        )
+        previous = post_like.reaction
+        if previous == reaction:
+            continue
+        post_like.previous_reaction = previous
+        post_like.reaction = reaction
+        post_like.save(using=alias, update_fields=['reaction', 'previous_reaction'])
+        likes, dislikes = PostLike.counter_deltas(previous, reaction)
+        total = deltas.setdefault(post_id, [0, 0])
+        total[0] += likes
+        total[1] += dislikes
+        changes.append((post_id, reaction, previous))
+
+    counts = {}
+    for post_id, (likes, dislikes) in deltas.items():
+        if likes or dislikes:
+            Post.objects.using(alias).filter(pk=post_id).update(
+                likes_count=Greatest(F('likes_count') + likes, 0),
+                dislikes_count=Greatest(F('dislikes_count') + dislikes, 0),
+            )
+            counts[post_id] = Post.objects.using(alias).filter(pk=post_id).values_list(
+                'likes_count', 'dislikes_count',
+            ).get()
+    return [
+        ToggleResult(post_id, reaction, previous, *counts[post_id])
+        for post_id, reaction, previous in changes if post_id in counts
+    ]
+
+
+reaction_buffer = ReactionBuffer()
+atexit.register(reaction_buffer.stop)
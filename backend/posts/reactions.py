@@ -0,0 +1,239 @@
+"""
+Reaction toggle write path.
+
+On PostgreSQL a toggle is a single statement: an `INSERT ... ON CONFLICT DO UPDATE`
+on post_likes that flips the reaction in SQL, chained through a CTE into the
+UPDATE of the Post counters. The conflicting row is locked by the upsert, so
+concurrent toggles from the same user serialize instead of losing updates.
+Other backends (SQLite in tests) use an equivalent row-locking ORM path.
+"""
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+
+from .cache import invalidate_posts
+from .models import Post, PostLike
+from .realtime import publish_reactions
+
+ToggleResult = namedtuple(
+    'ToggleResult', ['post_id', 'reaction', 'previous_reaction', 'likes_count', 'dislikes_count']
+)
+
+POST_NOT_FOUND = 'No Post matches the given query.'
+WRITE_BEHIND = getattr(settings, 'REACTION_WRITE_BEHIND', False)
+
+
+def toggle_reaction(user_id, post_id, action):
+    """
+    Apply one like/dislike toggle for `user_id` on `post_id`:
+     - same action -> none
+     - different action / none -> action
+    Raises NotFound if the post does not exist.
+    With REACTION_WRITE_BEHIND the toggle is buffered (posts.reaction_buffer) and the
+    result carries no counters.
+    """
+    if WRITE_BEHIND:
+        from .reaction_buffer import reaction_buffer
+
+        return reaction_buffer.toggle(user_id, post_id, action)
+    alias = router.db_for_write(PostLike)
+    try:
+        with transaction.atomic(using=alias):
+            if _uses_upsert(alias):
+                result = _toggle_postgresql(alias, user_id, post_id, action)
+            else:
+                result = _toggle_portable(alias, user_id, post_id, action)
+            if result is None:
+                raise NotFound(POST_NOT_FOUND)
+            transaction.on_commit(lambda: invalidate_posts([post_id]), using=alias)
+            transaction.on_commit(lambda: publish_reactions([result]), using=alias)
+    except IntegrityError:
+        # post_likes.post_id FK violation: the post does not exist (or was just deleted)
+        raise NotFound(POST_NOT_FOUND)
+    return result
+
+
+def _uses_upsert(alias):
+    """True where the single-statement upsert path applies; elsewhere the ORM path is used."""
+    return connections[alias].vendor == 'postgresql'
+
+
+_TOGGLE_SQL = """
+WITH toggled AS (
+    INSERT INTO {post_likes} AS pl (user_id, post_id, reaction, previous_reaction, created_at)
+    VALUES (%(user_id)s, %(post_id)s, %(action)s, %(none)s, %(now)s)
+    ON CONFLICT (user_id, post_id) DO UPDATE SET
+        previous_reaction = pl.reaction,
+        reaction = CASE WHEN pl.reaction = EXCLUDED.reaction THEN %(none)s ELSE EXCLUDED.reaction END
+    RETURNING post_id, reaction, previous_reaction
+)
+UPDATE {posts} AS p SET
+    likes_count = GREATEST(p.likes_count
+        + (t.reaction = %(like)s)::int - (t.previous_reaction = %(like)s)::int, 0),
+    dislikes_count = GREATEST(p.dislikes_count
+        + (t.reaction = %(dislike)s)::int - (t.previous_reaction = %(dislike)s)::int, 0)
+FROM toggled AS t
+WHERE p.id = t.post_id
+RETURNING t.post_id, t.reaction, t.previous_reaction, p.likes_count, p.dislikes_count
+"""
+
+
+def _toggle_postgresql(alias, user_id, post_id, action):
+    connection = connections[alias]
+    sql = _TOGGLE_SQL.format(
+        post_likes=connection.ops.quote_name(PostLike._meta.db_table),
+        posts=connection.ops.quote_name(Post._meta.db_table),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {
+            'user_id': user_id,
+            'post_id': post_id,
+            'action': action,
+            'now': timezone.now(),
+            'none': PostLike.REACTION_NONE,
+            'like': PostLike.REACTION_LIKE,
+            'dislike': PostLike.REACTION_DISLIKE,
+        })
+        row = cursor.fetchone()
+    # No row back means the UPDATE found no post; the atomic block rolls the insert back
+    return ToggleResult(*row) if row else None
+
+
+def _toggle_portable(alias, user_id, post_id, action):
+    post_like, created = PostLike.objects.using(alias).select_for_update().get_or_create(
+        post_id=post_id,
+        user_id=user_id,
+        defaults={"reaction": PostLike.REACTION_NONE}
+    )
+    previous = post_like.reaction
+    post_like.previous_reaction = previous
+    post_like.reaction = PostLike.REACTION_NONE if previous == action else action
+    post_like.save(using=alias, update_fields=["reaction", "previous_reaction"])
+
+    likes_delta, dislikes_delta = PostLike.counter_deltas(previous, post_like.reaction)
+    updated = Post.objects.using(alias).filter(pk=post_id).update(
+        likes_count=Greatest(F("likes_count") + likes_delta, 0),
+        dislikes_count=Greatest(F("dislikes_count") + dislikes_delta, 0),
+    )
+    if not updated:
+        return None
+    counts = Post.objects.using(alias).filter(pk=post_id).values_list('likes_count', 'dislikes_count').get()
+    return ToggleResult(post_id, post_like.reaction, previous, *counts)
+
+
+def toggle_reactions(user_id, items):
+    """
+    Apply a list of (post_id, action) toggles for `user_id` in one transaction, in order.
+
+    Toggles are split into rounds (the n-th toggle of every post goes into round n)
+    because one upsert cannot touch the same row twice; a replayed queue almost
+    always fits in a single round, i.e. a single statement.
+    Returns (results, missing): the final ToggleResult per post in first-seen order,
+    and the ids of posts that do not exist (skipped).
+    With REACTION_WRITE_BEHIND every toggle is buffered, like `toggle_reaction`.
+    """
+    if WRITE_BEHIND:
+        return _toggle_reactions_buffered(user_id, items)
+    rounds = []
+    seen = {}
+    for post_id, action in items:
+        n = seen.get(post_id, 0)
+        seen[post_id] = n + 1
+        if n == len(rounds):
+            rounds.append([])
+        rounds[n].append((post_id, action))
+
+    alias = router.db_for_write(PostLike)
+    results = OrderedDict((post_id, None) for post_id in seen)
+    applied = []
+    try:
+        with transaction.atomic(using=alias):
+            for batch in rounds:
+                if _uses_upsert(alias):
+                    rows = _toggle_batch_postgresql(alias, user_id, batch)
+                else:
+                    existing = set(
+                        Post.objects.using(alias)
+                        .filter(pk__in=[post_id for post_id, _ in batch])
+                        .values_list('pk', flat=True)
+                    )
+                    rows = [
+                        _toggle_portable(alias, user_id, post_id, action)
+                        for post_id, action in batch if post_id in existing
+                    ]
+                    # None: the post was deleted after the existence check
+                    rows = [row for row in rows if row is not None]
+                for row in rows:
+                    results[row.post_id] = row
+                applied.extend(rows)
+            changed = [post_id for post_id, row in results.items() if row is not None]
+            transaction.on_commit(lambda: invalidate_posts(changed), using=alias)
+            # Every round, not just the final state: the deltas must add up
+            transaction.on_commit(lambda: publish_reactions(applied), using=alias)
+    except IntegrityError:
+        # Deferred post_likes.post_id FK violation at commit: a post was deleted mid-batch
+        raise NotFound(POST_NOT_FOUND)
+
+    missing = [post_id for post_id, row in results.items() if row is None]
+    return [row for row in results.values() if row is not None], missing
+
+
+def _toggle_reactions_buffered(user_id, items):
+    from .reaction_buffer import reaction_buffer
+
+    results = OrderedDict()
+    for post_id, action in items:
+        if post_id in results and results[post_id] is None:
+            continue
+        try:
+            results[post_id] = reaction_buffer.toggle(user_id, post_id, action)
+        except NotFound:
+            results[post_id] = None
+    missing = [post_id for post_id, row in results.items() if row is None]
+    return [row for row in results.values() if row is not None], missing
+
+
+_TOGGLE_BATCH_SQL = """
+WITH input (post_id, action) AS (
+    VALUES {values}
+), toggled AS (
+    INSERT INTO {post_likes} AS pl (user_id, post_id, reaction, previous_reaction, created_at)
+    SELECT %s, i.post_id, i.action, %s, %s
+    FROM input AS i
+    JOIN {posts} AS p ON p.id = i.post_id
+    ORDER BY i.post_id
+    ON CONFLICT (user_id, post_id) DO UPDATE SET
+        previous_reaction = pl.reaction,
+        reaction = CASE WHEN pl.reaction = EXCLUDED.reaction THEN %s ELSE EXCLUDED.reaction END
+    RETURNING post_id, reaction, previous_reaction
+)
+UPDATE {posts} AS p SET
+    likes_count = GREATEST(p.likes_count
+        + (t.reaction = %s)::int - (t.previous_reaction = %s)::int, 0),
+    dislikes_count = GREATEST(p.dislikes_count
+        + (t.reaction = %s)::int - (t.previous_reaction = %s)::int, 0)
+FROM toggled AS t
+WHERE p.id = t.post_id
+RETURNING t.post_id, t.reaction, t.previous_reaction, p.likes_count, p.dislikes_count
+"""
+
+
+def _toggle_batch_postgresql(alias, user_id, batch):
+    """One set-based statement for a batch with at most one toggle per post."""
+    connection = connections[alias]
+    sql = _TOGGLE_BATCH_SQL.format(
+        values=', '.join(['(%s::bigint, %s::varchar)'] * len(batch)),
+        post_likes=connection.ops.quote_name(PostLike._meta.db_table),
+        posts=connection.ops.quote_name(Post._meta.db_table),
+    )
+    params = [value for item in batch for value in item]
+    params += [user_id, PostLike.REACTION_NONE, timezone.now(), PostLike.REACTION_NONE]
+    params += [PostLike.REACTION_LIKE] * 2 + [PostLike.REACTION_DISLIKE] * 2
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [ToggleResult(*row) for row in cursor.fetchall()]
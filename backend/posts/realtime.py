@@ -0,0 +1,155 @@
+"""
+Real-time post events, pushed to clients over server-sent events (GET /api/events/).
+
+  counts  on `post:<id>`:   reaction counter changes of one post. Toggles are
+                            coalesced per post for REALTIME_COALESCE_WINDOW seconds,
+                            so a viral post produces a few messages per second
+                            instead of one per click.
+  post    on `author:<id>`: a new post by that author.
+
+A stream also listens on `follows:<viewer id>`, where FollowView announces the
+viewer's follows and unfollows. Those messages are not sent to the client. They
+add or drop the author's channel, so the stream does not need a reconnect.
+
+All of these are published after the writing transaction commits, through
+backend_main.broker. `likes_delta` / `dislikes_delta` are the exact sums over
+the window. `likes_count` / `dislikes_count` are the values returned by the last
+toggle applied in the window. Under concurrent toggles they may lag by a few,
+which the next window corrects.
+"""
+import asyncio
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+from accounts.models import Follow
+from backend_main.broker import broker
+from backend_main.renderers import dumps
+from .models import PostLike
+
+COALESCE_WINDOW = getattr(settings, 'REALTIME_COALESCE_WINDOW', 0.25)
+HEARTBEAT = getattr(settings, 'REALTIME_HEARTBEAT', 15)
+
+
+def post_channel(post_id):
+    return f'post:{post_id}'
+
+
+def author_channel(user_id):
+    return f'author:{user_id}'
+
+
+def follows_channel(user_id):
+    return f'follows:{user_id}'
+
+
+class CounterCoalescer:
+    """
+    Sums counter deltas per post and publishes one `counts` message per post
+    per window. The first change after a quiet period arms a timer; the
+    timer's flush publishes everything collected so far.
+    """
+
+    def __init__(self, window=COALESCE_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._timer = None
+
+    def add(self, post_id, likes_delta, dislikes_delta, likes_count, dislikes_count):
+        with self._lock:
+            pending = self._pending.get(post_id)
+            if pending is None:
+                self._pending[post_id] = [likes_delta, dislikes_delta, likes_count, dislikes_count]
+            else:
+                pending[0] += likes_delta
+                pending[1] += dislikes_delta
+                pending[2:] = likes_count, dislikes_count
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._timer = None
+        for post_id, (likes_delta, dislikes_delta, likes_count, dislikes_count) in pending.items():
+            if not likes_delta and not dislikes_delta:
+                continue  # toggled back and forth within the window
+            broker.publish(post_channel(post_id), {
+                'type': 'counts',
+                'post_id': post_id,
+                'likes_delta': likes_delta,
+                'dislikes_delta': dislikes_delta,
+                'likes_count': likes_count,
+                'dislikes_count': dislikes_count,
+            })
+
+
+coalescer = CounterCoalescer()
+
+
+def publish_reactions(results):
+    """Queue the counter changes of committed toggles (ToggleResults) for the next window."""
+    for result in results:
+        likes_delta, dislikes_delta = PostLike.counter_deltas(result.previous_reaction, result.reaction)
+        coalescer.add(result.post_id, likes_delta, dislikes_delta, result.likes_count, result.dislikes_count)
+
+
+def announce_post(post):
+    """Publish `post` to its author's subscribers once the current transaction commits."""
+    message = {
+        'type': 'post',
+        'post_id': post.pk,
+        'user_id': post.user_id,
+        'created_at': post.created_at.isoformat(),
+    }
+    transaction.on_commit(lambda: broker.publish(author_channel(post.user_id), message))
+
+
+def announce_follow(follower_id, user_id, following):
+    """Tell `follower_id`'s open streams, once the current transaction commits, to (un)follow `user_id`."""
+    message = {'type': 'follow', 'user_id': user_id, 'following': following}
+    transaction.on_commit(lambda: broker.publish(follows_channel(follower_id), message))
+
+
+def sse_frame(message):
+    return b'event: ' + message['type'].encode() + b'\ndata: ' + dumps(message) + b'\n\n'
+
+
+async def event_stream(channels, follower_id=None):
+    """
+    Server-sent events for `channels` until the client disconnects. Under ASGI,
+    Django cancels this generator on disconnect, and `finally` unsubscribes.
+
+    With `follower_id`, the stream also carries that user's own posts and the posts
+    of the accounts they follow, kept current through `follows:<follower_id>`.
+    """
+    control = follows_channel(follower_id) if follower_id is not None else None
+    subscription = broker.subscribe(
+        [*channels, control, author_channel(follower_id)] if control else channels
+    )
+    try:
+        if control:
+            # Read after subscribing, so a follow committed meanwhile is not missed
+            following = Follow.objects.filter(follower_id=follower_id).values_list('following_id', flat=True)
+            subscription.set_channels(subscription.channels | {author_channel(pk) async for pk in following})
+        yield b'retry: 3000\n\n'
+        while True:
+            try:
+                channel, message = await asyncio.wait_for(subscription.get(), HEARTBEAT)
+            except asyncio.TimeoutError:
+                # Comment line: keeps proxies from closing an idle connection
+                yield b': keepalive\n\n'
+                continue
+            if channel == control:
+                author = author_channel(message['user_id'])
+                subscription.set_channels(
+                    subscription.channels | {author} if message['following'] else subscription.channels - {author}
+                )
+                continue
+            yield sse_frame(message)
+    finally:
+        subscription.close()
@@ -0,0 +1,51 @@
+"""
+Post search.
+
+Full text first: `search_vector @@ websearch_to_tsquery(q)` on the GIN index,
+ranked by ts_rank. If that finds nothing (a partial word like "instag" or a
+stop-word-only query), the fallback is a substring match on the trigram index
+over UPPER(description). A trigram index cannot narrow down terms shorter than
+TRIGRAM_MIN_LENGTH. Those fall back to a word-prefix match instead (`ab` finds
+"abroad"). That match is a `ab:*` tsquery on the same GIN index as full-text
+search.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+
+from .models import Post
+
+# Must match the regconfig used by the posts_search_vector_update trigger
+SEARCH_CONFIG = 'english'
+TRIGRAM_MIN_LENGTH = 3
+
+
+def fulltext_queryset(terms):
+    """Posts matching `terms`, annotated with `rank`; callers order by (-rank, -id)."""
+    query = SearchQuery(terms, search_type='websearch', config=SEARCH_CONFIG)
+    return (
+        Post.objects.filter(search_vector=query)
+        # ts_rank returns a float4. As a double it survives the JSON cursor exactly,
+        # so the keyset comparison on the next page matches the row it stopped at.
+        .annotate(rank=Cast(SearchRank(F('search_vector'), query), FloatField()))
+        .only('id')
+    )
+
+
+def trigram_queryset(terms):
+    """Posts whose description contains `terms`, or has words starting with them when they are short."""
+    if len(terms) < TRIGRAM_MIN_LENGTH:
+        return prefix_queryset(terms)
+    return Post.objects.filter(description__icontains=terms).only('id')
+
+
+def prefix_queryset(terms):
+    """Posts with a word starting with each word of `terms` (none if `terms` has no words)."""
+    words = re.findall(r'\w+', terms)
+    if not words:
+        return Post.objects.none()
+    # Only \w characters reach the raw tsquery, so user input cannot break its syntax
+    query = SearchQuery(' & '.join(f'{word}:*' for word in words), search_type='raw', config=SEARCH_CONFIG)
+    return Post.objects.filter(search_vector=query).only('id')
@@ -1,18 +1,21 @@
-from django.shortcuts import get_object_or_404
 from rest_framework import serializers
-from django.db.models import Count, Q, Prefetch
 
+from backend_main.imaging import build_srcset
+from backend_main.metrics import TimedSerializerMixin
 from .models import Post, PostLike
+from .reactions import toggle_reaction, toggle_reactions
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for Post model"""
     user_name = serializers.CharField(source='user.full_name', read_only=True)
     user_email = serializers.EmailField(source='user.email', read_only=True)
     image_url = serializers.SerializerMethodField()
+    # {format: {width: url}} of the resized variants; empty until the image pipeline is done
+    image_srcset = serializers.SerializerMethodField()
     user_profile_picture = serializers.SerializerMethodField()
 
-    # Annotated in the view (recommended). Keep read_only so serializer won't try to write.
+    # Denormalized counter columns on Post. Keep read_only so serializer won't try to write.
     likes_count = serializers.IntegerField(read_only=True)
     dislikes_count = serializers.IntegerField(read_only=True)
 
@@ -23,18 +26,29 @@ class PostSerializer(serializers.ModelSerializer):
         model = Post
         fields = [
             'id', 'user', 'user_name', 'user_email',
-            'description', 'image', 'image_url', 'user_profile_picture',
+            'description', 'image', 'image_url', 'image_srcset', 'user_profile_picture',
             'likes_count', 'dislikes_count', 'user_reaction',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'user', 'likes_count', 'dislikes_count', 'created_at', 'updated_at']
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sparse fieldset (posts.fields): unrequested method fields are never called
+        selected = self.context.get('fields')
+        if selected is not None:
+            for name in set(self.fields) - set(selected):
+                self.fields.pop(name)
+
     def get_image_url(self, obj):
         request = self.context.get('request')
         if getattr(obj, 'image', None) and request:
             return request.build_absolute_uri(obj.image.url)
         return None
 
+    def get_image_srcset(self, obj):
+        return build_srcset(getattr(obj, 'image_variants', None), self.context.get('request'))
+
     def get_user_profile_picture(self, obj):
         request = self.context.get('request')
         user = getattr(obj, 'user', None)
@@ -60,11 +74,13 @@ class PostSerializer(serializers.ModelSerializer):
                 return None
             return pl.reaction if pl.reaction != PostLike.REACTION_NONE else None
 
-        # Fallback: single lightweight DB lookup
-        reaction = PostLike.objects.filter(user=request.user, post=obj).values_list('reaction', flat=True).first()
-        if reaction == PostLike.REACTION_NONE:
-            return None
-        return reaction
+        # Fallback: single lightweight DB lookup (index-only on likes_user_post_reacted_idx)
+        return (
+            PostLike.objects.filter(user_id=request.user.pk, post=obj)
+            .exclude(reaction=PostLike.REACTION_NONE)
+            .values_list('reaction', flat=True)
+            .first()
+        )
 
 
 class PostLikeSerializer(serializers.ModelSerializer):
@@ -95,10 +111,8 @@ class PostLikeToggleSerializer(serializers.Serializer):
         if not request or not getattr(request, 'user', None) or not request.user.is_authenticated:
             raise serializers.ValidationError("Authentication required.")
 
-        # Fetch post or 404
-        post = get_object_or_404(Post, id=post_id)
-
-        attrs["post"] = post
+        # No pre-check for the post: a missing post surfaces from the write itself (404)
+        attrs["post_id"] = post_id
         attrs["user"] = request.user
         return attrs
 
@@ -108,25 +122,49 @@ class PostLikeToggleSerializer(serializers.Serializer):
          - same action -> set to NONE
          - different action -> set to action
          - none -> set to action
-        Returns the PostLike instance (saved).
+        Runs as one upsert that also adjusts the Post counters (see posts.reactions).
+        Returns a ToggleResult with the resulting `reaction` and counters.
         """
-        action = self.validated_data["action"]  # incoming: 'like' or 'dislike'
-        post = self.validated_data["post"]
-        user = self.validated_data["user"]
-
-        post_like, created = PostLike.objects.get_or_create(
-            post=post,
-            user=user,
-            defaults={"reaction": PostLike.REACTION_NONE}
+        return toggle_reaction(
+            user_id=self.validated_data["user"].pk,
+            post_id=self.validated_data["post_id"],
+            action=self.validated_data["action"],  # incoming: 'like' or 'dislike'
         )
 
-        # Toggle logic
-        if post_like.reaction == action:
-            # same action -> turn into none
-            post_like.reaction = PostLike.REACTION_NONE
-        else:
-            # switch to the requested action
-            post_like.reaction = action
 
-        post_like.save()
-        return post_like
+class ReactionItemSerializer(serializers.Serializer):
+    """A single queued toggle inside a batch"""
+    post_id = serializers.IntegerField(min_value=1)
+    action = serializers.ChoiceField(
+        choices=[PostLike.REACTION_LIKE, PostLike.REACTION_DISLIKE],
+        required=True
+    )
+
+
+class PostLikeBatchToggleSerializer(serializers.Serializer):
+    """
+    Serializer to apply many like/dislike toggles in one request, in order.
+
+    Expects context to include:
+      - request
+    """
+    MAX_ITEMS = 500
+
+    reactions = ReactionItemSerializer(many=True, allow_empty=False, max_length=MAX_ITEMS)
+
+    def validate(self, attrs):
+        request = self.context.get("request")
+        if not request or not getattr(request, 'user', None) or not request.user.is_authenticated:
+            raise serializers.ValidationError("Authentication required.")
+        attrs["user"] = request.user
+        return attrs
+
+    def save(self):
+        """
+        Returns (results, missing): the final ToggleResult per post and the ids of
+        posts that no longer exist (their toggles are skipped).
+        """
+        return toggle_reactions(
+            user_id=self.validated_data["user"].pk,
+            items=[(item["post_id"], item["action"]) for item in self.validated_data["reactions"]],
+        )
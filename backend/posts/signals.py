@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_author, invalidate_posts
+from .models import Post
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_cached_post(sender, instance, **kwargs):
+    """Drop the cached payload once a post edit or delete commits."""
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate_posts([pk]), using=kwargs['using'])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_author(sender, instance, update_fields=None, **kwargs):
+    """Drop the cached author part once a profile change (name, email, picture) commits."""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(lambda: invalidate_author(instance.pk), using=kwargs['using'])
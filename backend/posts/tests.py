@@ -1,3 +1,708 @@
-from django.test import TestCase
+import asyncio
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models import Count, Q
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import generics
+from rest_framework.exceptions import NotFound
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from accounts.authentication import EventStreamAuthentication
+from accounts.models import Follow
+from accounts.tokens import ClaimsRefreshToken
+from backend_main.broker import LocalBroker
+from backend_main.testing import QueryBudgetMixin
+from . import reactions
+from .cache import get_post_payloads, pending_reaction_key
+from .models import Post, PostLike, TimelineEntry
+from .payloads import post_rows, post_version
+from .reaction_buffer import ReactionBuffer, check_shared_cache
+from .reactions import toggle_reaction, toggle_reactions
+from .realtime import CounterCoalescer, author_channel, event_stream, follows_channel, post_channel
+from .views import PostListCreateView
+
+User = get_user_model()
+
+
+def make_user(email, **fields):
+    fields.setdefault('full_name', email.split('@')[0].title())
+    fields.setdefault('date_of_birth', '1990-01-01')
+    return User.objects.create_user(email=email, password=None, **fields)
+
+
+class APIUserMixin:
+    """Starts every test with an empty post cache and `self.user` authenticated by a real JWT."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('viewer@example.com')
+        self.authenticate(self.user)
+
+    def authenticate(self, user):
+        token = ClaimsRefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+
+class APIUserTestCase(APIUserMixin, APITestCase):
+    pass
+
+
+@skipUnless(connection.vendor == 'postgresql', 'post search needs PostgreSQL')
+class PostSearchTests(APIUserTestCase):
+
+    def search(self, terms):
+        response = self.client.get('/api/posts/search/', {'q': terms})
+        self.assertEqual(response.status_code, 200)
+        return [post['description'] for post in response.json()['results']]
+
+    def test_full_text_match(self):
+        Post.objects.create(user=self.user, description='Travelling abroad again')
+        Post.objects.create(user=self.user, description='Staying home')
+        self.assertEqual(self.search('travel'), ['Travelling abroad again'])
+
+    def test_partial_term_falls_back_to_substring(self):
+        Post.objects.create(user=self.user, description='New instagram filter')
+        self.assertEqual(self.search('nstagr'), ['New instagram filter'])
+
+    def test_short_term_matches_word_prefixes(self):
+        Post.objects.create(user=self.user, description='Abroad again')
+        Post.objects.create(user=self.user, description='A cab ride')
+        self.assertEqual(self.search('ab'), ['Abroad again'])
+
+    def test_short_term_without_words_matches_nothing(self):
+        Post.objects.create(user=self.user, description='?!')
+        self.assertEqual(self.search('?!'), [])
+
+
+class QueryBudgetTests(QueryBudgetMixin, APIUserTestCase):
+    """Cold-cache reads stay within the views' declared query_budget, however many posts a page has."""
+
+    def setUp(self):
+        super().setUp()
+        authors = [make_user(f'author{i}@example.com') for i in range(3)]
+        for author in authors:
+            Follow.objects.create(follower=self.user, following=author)
+        User.objects.filter(pk__in=[author.pk for author in authors]).update(followers_count=1)
+        posts = [
+            Post.objects.create(user=user, description=f'travel note {n}')
+            for user in (self.user, *authors) for n in range(5)
+        ]
+        for post in posts[::2]:
+            toggle_reaction(self.user.pk, post.pk, PostLike.REACTION_LIKE)
+        self.post = posts[0]
+        cache.clear()
+
+    def test_post_list(self):
+        response = self.assertWithinQueryBudget(self.client.get, '/api/posts/')
+        self.assertEqual(len(response.json()['results']), 5)
+
+    def test_post_detail(self):
+        response = self.assertWithinQueryBudget(self.client.get, f'/api/posts/{self.post.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    @mock.patch('posts.timeline.FANOUT_MAX_FOLLOWERS', 0)
+    def test_feed(self):
+        # Every author is "big" here, so the read-time merge is included in the count.
+        # The viewer's own posts were created without fan-out, so only the authors' show.
+        response = self.assertWithinQueryBudget(self.client.get, '/api/feed/')
+        self.assertEqual(len(response.json()['results']), 15)
+
+    @skipUnless(connection.vendor == 'postgresql', 'post search needs PostgreSQL')
+    def test_search_falling_back_to_trigrams(self):
+        response = self.assertWithinQueryBudget(self.client.get, '/api/posts/search/', {'q': 'ravel not'})
+        self.assertEqual(response.status_code, 200)
+
+    def serializer_list(self, prefetch):
+        """Patch the post list back to a plain serializer-based list, with or without the reaction prefetch."""
+        get_queryset = PostListCreateView.get_queryset
+
+        def without_prefetch(view):
+            return get_queryset(view).prefetch_related(None)
+
+        patches = [mock.patch.object(PostListCreateView, 'list', generics.ListAPIView.list)]
+        if not prefetch:
+            patches.append(mock.patch.object(PostListCreateView, 'get_queryset', without_prefetch))
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_serializer_list_with_prefetch_is_within_budget(self):
+        self.serializer_list(prefetch=True)
+        self.assertWithinQueryBudget(self.client.get, '/api/posts/')
+
+    def test_missing_reaction_prefetch_is_caught(self):
+        self.serializer_list(prefetch=False)
+        # One PostLike query per post: the N+1 the budget is there to catch
+        with self.assertRaisesRegex(AssertionError, r'ran \d+ queries, budget is 4'), \
+                self.assertLogs('backend_main.metrics', 'WARNING'):
+            self.assertWithinQueryBudget(self.client.get, '/api/posts/')
+
+
+class PostListPaginationTests(APIUserTestCase):
+    """The post list's keyset cursor walks every post exactly once, in (created_at, id) order."""
+
+    def setUp(self):
+        super().setUp()
+        self.posts = [Post.objects.create(user=self.user, description=f'note {n}') for n in range(7)]
+        # Five posts share one created_at, so only `id` orders them across page boundaries
+        Post.objects.filter(pk__in=[post.pk for post in self.posts[1:6]]).update(created_at=self.posts[0].created_at)
+        Post.objects.create(user=make_user('other@example.com'), description='not mine')
+
+    def walk(self, page_size):
+        ids, url, params = [], '/api/posts/', {'page_size': page_size}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            self.assertLessEqual(len(page['results']), page_size)
+            ids.extend(post['id'] for post in page['results'])
+            url, params = page['next'], None
+        return ids
+
+    def test_cursor_round_trips_through_ties(self):
+        expected = list(
+            Post.objects.filter(user=self.user).order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        for page_size in (1, 2, 3, 7):
+            self.assertEqual(self.walk(page_size), expected)
+
+    def test_last_page_has_no_next_link(self):
+        response = self.client.get('/api/posts/', {'page_size': 7})
+        self.assertEqual((len(response.json()['results']), response.json()['next']), (7, None))
+
+    def test_invalid_cursor_is_not_found(self):
+        self.assertEqual(self.client.get('/api/posts/', {'cursor': 'garbage'}).status_code, 404)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN plans are PostgreSQL-specific')
+class IndexOnlyScanTests(APIUserMixin, APITransactionTestCase):
+    """
+    The post list and the viewer's reaction lookups are answered from the
+    access-path indexes (posts migration 0009) without touching the heap, once
+    the tables are vacuumed. VACUUM cannot run in a transaction, hence
+    TransactionTestCase. benchmarks/explain_indexes.py runs the same checks at
+    a larger scale.
+    """
+
+    def setUp(self):
+        super().setUp()
+        authors = User.objects.bulk_create(
+            User(email=f'idx-{i}@example.com', full_name=f'Index {i}', date_of_birth='1990-01-01')
+            for i in range(40)
+        )
+        Post.objects.bulk_create(
+            Post(user=user, description=f'post {n}') for user in (self.user, *authors) for n in range(30)
+        )
+        post_ids = list(Post.objects.order_by('pk').values_list('pk', flat=True))
+        reactions = (PostLike.REACTION_LIKE, PostLike.REACTION_DISLIKE, PostLike.REACTION_NONE)
+        PostLike.objects.bulk_create(
+            PostLike(user=user, post_id=post_id, reaction=reactions[(i + j) % 3])
+            for i, user in enumerate((self.user, *authors))
+            for j, post_id in enumerate(post_ids[i::7])
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM ANALYZE posts')
+            cursor.execute('VACUUM ANALYZE post_likes')
+        cache.clear()
+
+    def captured_sql(self, path, marker):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(path).status_code, 200)
+        return [query['sql'] for query in queries.captured_queries if marker in query['sql']]
+
+    def assertIndexOnlyScan(self, sql, index):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN ' + sql)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertIn(f'Index Only Scan using {index}', plan, f'{sql}\n{plan}')
+
+    def test_post_list_page(self):
+        statements = self.captured_sql('/api/posts/?page_size=20', 'FROM "posts" WHERE "posts"."user_id"')
+        self.assertTrue(statements)
+        self.assertIndexOnlyScan(statements[0], 'posts_user_created_idx')
+
+    def test_viewer_reactions_on_a_page(self):
+        statements = self.captured_sql('/api/posts/?page_size=20', 'FROM "post_likes"')
+        self.assertTrue(statements)
+        self.assertIndexOnlyScan(statements[0], 'likes_user_post_reacted_idx')
+
+    def test_post_detail_version(self):
+        liked = PostLike.objects.filter(user=self.user).exclude(reaction=PostLike.REACTION_NONE).values_list(
+            'post_id', flat=True,
+        )[0]
+        statements = self.captured_sql(f'/api/posts/{liked}/', 'FROM "post_likes"')
+        self.assertTrue(statements)
+        self.assertIndexOnlyScan(statements[0], 'likes_user_post_reacted_idx')
+
+
+class PostCacheInvalidationTests(TestCase):
+    """posts.cache entries never outlive the write that invalidated them."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('reader@example.com')
+        self.post = Post.objects.create(user=make_user('author@example.com'), description='first')
+
+    def payload(self):
+        return get_post_payloads([self.post.pk], None)[0]
+
+    def test_fill_racing_a_write_does_not_restore_old_counters(self):
+        def read_then_write(queryset):
+            rows = list(post_rows(queryset))
+            # Another request's toggle commits between this fill's read and its store
+            with self.captureOnCommitCallbacks(execute=True):
+                toggle_reaction(self.user.pk, self.post.pk, PostLike.REACTION_LIKE)
+            return rows
+
+        with mock.patch('posts.cache.post_rows', read_then_write):
+            self.assertEqual(self.payload()['likes_count'], 0)
+        self.assertEqual(self.payload()['likes_count'], 1)
+
+    def test_edit_invalidates_on_commit(self):
+        self.payload()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.description = 'edited'
+            self.post.save()
+        self.assertEqual(self.payload()['description'], 'edited')
+
+    def test_recount_reactions_invalidates(self):
+        PostLike.objects.create(user=self.user, post=self.post, reaction=PostLike.REACTION_LIKE)
+        self.assertEqual(self.payload()['likes_count'], 0)
+        call_command('recount_reactions', stdout=StringIO())
+        self.assertEqual(self.payload()['likes_count'], 1)
+
+
+class PostDetailValidatorTests(APIUserTestCase):
+    """Conditional GETs on the post detail views: an ETag always describes the body it came with."""
+
+    paths = ('/api/posts/{}/', '/api/async/posts/{}/')
+
+    def setUp(self):
+        super().setUp()
+        self.post = Post.objects.create(user=make_user('author@example.com'), description='first')
+
+    def get(self, path, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(path.format(self.post.pk), **headers)
+
+    def test_unchanged_post_is_not_modified(self):
+        for path in self.paths:
+            with self.subTest(path=path):
+                etag = self.get(path)['ETag']
+                response = self.get(path, etag)
+                self.assertEqual((response.status_code, response['ETag']), (304, etag))
+
+    def test_reaction_changes_the_etag(self):
+        for path in self.paths:
+            with self.subTest(path=path):
+                etag = self.get(path)['ETag']
+                with self.captureOnCommitCallbacks(execute=True):
+                    toggle_reaction(self.user.pk, self.post.pk, PostLike.REACTION_LIKE)
+                response = self.get(path, etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_stale_cached_part_is_refilled(self):
+        for likes, path in enumerate(self.paths, start=1):
+            with self.subTest(path=path):
+                etag = self.get(path)['ETag']
+                # Counters changed without invalidating the cached part
+                Post.objects.filter(pk=self.post.pk).update(likes_count=likes)
+                response = self.get(path, etag)
+                self.assertEqual((response.status_code, response.json()['likes_count']), (200, likes))
+                self.assertEqual(self.get(path, response['ETag']).status_code, 304)
+
+    def test_body_newer_than_version_gets_no_validators(self):
+        # The version row comes from a replica that has not seen the like yet
+        lagging = dict(post_version(Post.objects.filter(pk=self.post.pk), None).get())
+        toggle_reaction(self.user.pk, self.post.pk, PostLike.REACTION_LIKE)
+        lagging['reaction'] = None
+        with mock.patch('posts.views.post_version') as post_version_mock:
+            post_version_mock.return_value.first.return_value = lagging
+            response = self.get(self.paths[0])
+        self.assertEqual((response.status_code, response.json()['likes_count']), (200, 1))
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+
+class ReactionToggleTests(TestCase):
+    """posts.reactions on this database's write path: the single upsert statement on PostgreSQL."""
+
+    def setUp(self):
+        author = make_user('author@example.com')
+        self.user = make_user('reader@example.com')
+        self.post = Post.objects.create(user=author, description='first')
+        self.other = Post.objects.create(user=author, description='second')
+
+    def assertReaction(self, post, reaction, likes, dislikes):
+        post.refresh_from_db()
+        stored = PostLike.objects.filter(user=self.user, post=post).values_list('reaction', flat=True).first()
+        self.assertEqual(stored or PostLike.REACTION_NONE, reaction)
+        self.assertEqual((post.likes_count, post.dislikes_count), (likes, dislikes))
+
+    def test_toggle_sets_reaction(self):
+        result = toggle_reaction(self.user.pk, self.post.pk, PostLike.REACTION_LIKE)
+        self.assertEqual((result.reaction, result.previous_reaction), ('like', 'none'))
+        self.assertEqual((result.likes_count, result.dislikes_count), (1, 0))
+        self.assertReaction(self.post, 'like', 1, 0)
+
+    def test_same_action_clears_reaction(self):
+        toggle_reaction(self.user.pk, self.post.pk, PostLike.REACTION_LIKE)
+        result = toggle_reaction(self.user.pk, self.post.pk, PostLike.REACTION_LIKE)
+        self.assertEqual((result.reaction, result.previous_reaction), ('none', 'like'))
+        self.assertReaction(self.post, 'none', 0, 0)
+
+    def test_other_action_switches_reaction(self):
+        toggle_reaction(self.user.pk, self.post.pk, PostLike.REACTION_LIKE)
+        result = toggle_reaction(self.user.pk, self.post.pk, PostLike.REACTION_DISLIKE)
+        self.assertEqual((result.reaction, result.previous_reaction), ('dislike', 'like'))
+        self.assertReaction(self.post, 'dislike', 0, 1)
+
+    def test_missing_post_raises_not_found(self):
+        missing = self.other.pk + 1000
+        with self.assertRaises(NotFound):
+            toggle_reaction(self.user.pk, missing, PostLike.REACTION_LIKE)
+        self.assertFalse(PostLike.objects.filter(post_id=missing).exists())
+
+    def test_counters_are_clamped_at_zero(self):
+        # A drifted counter: the like row exists but was never counted
+        PostLike.objects.create(user=self.user, post=self.post, reaction=PostLike.REACTION_LIKE)
+        toggle_reaction(self.user.pk, self.post.pk, PostLike.REACTION_DISLIKE)
+        self.assertReaction(self.post, 'dislike', 0, 1)
+
+    def test_batch_applies_toggles_in_order(self):
+        # Three toggles of self.post, so three rounds
+        results, missing = toggle_reactions(self.user.pk, [
+            (self.post.pk, 'like'), (self.other.pk, 'dislike'), (self.post.pk, 'like'), (self.post.pk, 'dislike'),
+        ])
+        self.assertEqual(missing, [])
+        self.assertEqual(
+            [(r.post_id, r.reaction, r.previous_reaction, r.likes_count, r.dislikes_count) for r in results],
+            [(self.post.pk, 'dislike', 'none', 0, 1), (self.other.pk, 'dislike', 'none', 0, 1)],
+        )
+        self.assertReaction(self.post, 'dislike', 0, 1)
+        self.assertReaction(self.other, 'dislike', 0, 1)
+
+    def test_batch_skips_missing_posts(self):
+        missing = self.other.pk + 1000
+        results, skipped = toggle_reactions(self.user.pk, [(missing, 'like'), (self.post.pk, 'like'), (missing, 'like')])
+        self.assertEqual(skipped, [missing])
+        self.assertEqual([r.post_id for r in results], [self.post.pk])
+        self.assertReaction(self.post, 'like', 1, 0)
+
+    def test_batch_fk_violation_is_not_found(self):
+        # What a post deleted by another transaction mid-batch surfaces as at commit
+        with mock.patch('posts.reactions._toggle_batch_postgresql', side_effect=IntegrityError), \
+                mock.patch('posts.reactions._toggle_portable', side_effect=IntegrityError), \
+                self.assertRaises(NotFound):
+            toggle_reactions(self.user.pk, [(self.post.pk, 'like')])
+
+
+class PortableReactionToggleTests(ReactionToggleTests):
+    """The same cases on the row-locking ORM path used by databases other than PostgreSQL."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('posts.reactions._uses_upsert', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_batch_skips_post_deleted_after_the_check(self):
+        toggle_portable = reactions._toggle_portable
+
+        def vanishing(alias, user_id, post_id, action):
+            if post_id == self.other.pk:
+                return None
+            return toggle_portable(alias, user_id, post_id, action)
+
+        with mock.patch('posts.reactions._toggle_portable', vanishing):
+            results, missing = toggle_reactions(self.user.pk, [(self.other.pk, 'like'), (self.post.pk, 'like')])
+        self.assertEqual(([r.post_id for r in results], missing), ([self.post.pk], [self.other.pk]))
+
+
+class ReactionBufferTests(TransactionTestCase):
+    """posts.reaction_buffer: flushes commit, so this runs outside a test transaction."""
+
+    def setUp(self):
+        cache.clear()
+        self.buffer = ReactionBuffer(interval=3600)
+        # Flushed by hand, no background thread
+        patcher = mock.patch.object(self.buffer, '_ensure_flusher')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.users = [make_user(f'reader{i}@example.com') for i in range(3)]
+        author = make_user('author@example.com')
+        self.posts = [Post.objects.create(user=author, description=f'post {n}') for n in range(2)]
+
+    def assertCountersMatchRows(self):
+        rows = Post.objects.annotate(
+            liked=Count('likes', filter=Q(likes__reaction=PostLike.REACTION_LIKE)),
+            disliked=Count('likes', filter=Q(likes__reaction=PostLike.REACTION_DISLIKE)),
+        )
+        for post in rows:
+            self.assertEqual((post.likes_count, post.dislikes_count), (post.liked, post.disliked), post.description)
+
+    def test_toggle_twice_in_one_window_is_no_change(self):
+        user, post = self.users[0], self.posts[0]
+        self.assertEqual(self.buffer.toggle(user.pk, post.pk, 'like').reaction, 'like')
+        self.assertEqual(self.buffer.toggle(user.pk, post.pk, 'like').reaction, 'none')
+        self.buffer.flush()
+        post.refresh_from_db()
+        self.assertEqual((post.likes_count, post.dislikes_count), (0, 0))
+        self.assertFalse(PostLike.objects.exclude(reaction=PostLike.REACTION_NONE).exists())
+
+    def test_counters_match_post_likes_after_stop(self):
+        toggles = [
+            (0, 0, 'like'), (1, 0, 'like'), (2, 0, 'dislike'), (0, 1, 'dislike'),
+            (1, 0, 'dislike'), (2, 1, 'like'), (0, 0, 'like'),
+        ]
+        for i, (user, post, action) in enumerate(toggles):
+            self.buffer.toggle(self.users[user].pk, self.posts[post].pk, action)
+            if i == 3:
+                self.buffer.flush()  # two windows
+        self.buffer.stop()
+        self.assertCountersMatchRows()
+        for post in self.posts:
+            post.refresh_from_db()
+        self.assertEqual([(p.likes_count, p.dislikes_count) for p in self.posts], [(0, 2), (1, 1)])
+
+    def test_mirror_outlives_the_flush(self):
+        user, post = self.users[0], self.posts[0]
+        self.buffer.toggle(user.pk, post.pk, 'like')
+        key = pending_reaction_key(user.pk, post.pk)
+        self.buffer.flush()
+        # Left to expire; it now matches post_likes
+        self.assertEqual(cache.get(key), 'like')
+        self.assertEqual(PostLike.objects.get(user=user, post=post).reaction, 'like')
+        self.assertEqual(self.buffer.toggle(user.pk, post.pk, 'like').reaction, 'none')
+
+    def test_settling_keeps_a_mirror_rewritten_by_another_process(self):
+        user, post = self.users[0], self.posts[0]
+        self.buffer.toggle(user.pk, post.pk, 'like')
+        key = pending_reaction_key(user.pk, post.pk)
+        shared = caches['default']
+        get_many = shared.get_many
+
+        def read_then_rewrite(keys):
+            found = get_many(keys)
+            shared.set(key, 'dislike')  # another worker's toggle lands right after the read
+            return found
+
+        with mock.patch.object(shared, 'get_many', read_then_rewrite):
+            self.buffer.flush()
+        self.assertEqual(cache.get(key), 'dislike')
+
+    def test_full_buffer_writes_new_pairs_directly(self):
+        self.buffer.max_pending = 1
+        first, second = self.users[:2]
+        post = self.posts[0]
+        self.buffer.toggle(first.pk, post.pk, 'like')
+        self.assertEqual(self.buffer.toggle(second.pk, post.pk, 'dislike').reaction, 'dislike')
+        # Written by the toggle itself; the first pair is still only pending
+        self.assertEqual(list(PostLike.objects.values_list('user_id', 'reaction')), [(second.pk, 'dislike')])
+        self.assertEqual(cache.get(pending_reaction_key(second.pk, post.pk)), 'dislike')
+        # A pair that is already pending keeps buffering
+        self.buffer.toggle(first.pk, post.pk, 'dislike')
+        self.assertEqual(PostLike.objects.count(), 1)
+        self.buffer.flush()
+        post.refresh_from_db()
+        self.assertEqual((post.likes_count, post.dislikes_count), (0, 2))
+        self.assertCountersMatchRows()
+
+    def test_newer_state_from_another_process_is_flushed_last(self):
+        user, post = self.users[0], self.posts[0]
+        self.buffer.toggle(user.pk, post.pk, 'like')
+        key = pending_reaction_key(user.pk, post.pk)
+        cache.set(key, 'dislike')  # another worker toggled after us
+        self.buffer.flush()
+        self.assertEqual(cache.get(key), 'dislike')
+        self.buffer.flush()
+        self.assertEqual(PostLike.objects.get(user=user, post=post).reaction, 'dislike')
+        self.assertEqual(cache.get(key), 'dislike')
+        self.assertCountersMatchRows()
+
+    def test_missing_post_raises_not_found(self):
+        missing = self.posts[-1].pk + 1000
+        with self.assertRaises(NotFound):
+            self.buffer.toggle(self.users[0].pk, missing, 'like')
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertIsNone(cache.get(pending_reaction_key(self.users[0].pk, missing)))
+
+    def test_write_behind_needs_a_shared_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            check_shared_cache()
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}}
+        with override_settings(CACHES=shared):
+            check_shared_cache()
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+@mock.patch('posts.timeline.FANOUT_MAX_FOLLOWERS', 2)
+class FeedFanOutTests(APIUserTestCase):
+    """Home feed coverage around the fan-out threshold (2 followers here)."""
+
+    def setUp(self):
+        super().setUp()
+        self.author = make_user('author@example.com')
+        self.followers = [make_user(f'follower{i}@example.com') for i in range(3)]
+
+    def as_user(self, user, method, path, data=None):
+        self.authenticate(user)
+        # Run the on-commit work (fan-out, backfills) like a committed request would
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(path, data)
+
+    def follow(self, follower):
+        self.assertIn(self.as_user(follower, 'post', f'/api/users/{self.author.pk}/follow/').status_code, (200, 201))
+
+    def unfollow(self, follower):
+        self.assertEqual(self.as_user(follower, 'delete', f'/api/users/{self.author.pk}/follow/').status_code, 200)
+
+    def publish(self, description):
+        response = self.as_user(self.author, 'post', '/api/posts/', {'description': description})
+        self.assertEqual(response.status_code, 201)
+        return response.json()['post']['id']
+
+    def feed(self, user):
+        response = self.as_user(user, 'get', '/api/feed/')
+        self.assertEqual(response.status_code, 200)
+        return [post['description'] for post in response.json()['results']]
+
+    def test_followers_fan_out_after_commit(self):
+        follower = self.followers[0]
+        self.follow(follower)
+        self.authenticate(self.author)
+        with self.captureOnCommitCallbacks() as callbacks:
+            post_id = self.client.post('/api/posts/', {'description': 'hello'}).json()['post']['id']
+        # The request only wrote the author's own row
+        self.assertEqual(list(TimelineEntry.objects.filter(post_id=post_id).values_list('owner_id', flat=True)), [self.author.pk])
+        for callback in callbacks:
+            callback()
+        self.assertTrue(TimelineEntry.objects.filter(owner=follower, post_id=post_id).exists())
+
+    def test_feed_coverage_across_the_threshold(self):
+        first, second, third = self.followers
+        self.follow(first)
+        self.follow(second)
+        self.publish('before')  # 2 followers: fanned out on write
+
+        self.follow(third)      # 3 followers: pulled at read time from now on
+        during = self.publish('during')
+        self.assertFalse(TimelineEntry.objects.filter(post_id=during, owner=first).exists())
+        for follower in self.followers:
+            self.assertEqual(self.feed(follower), ['during', 'before'])
+
+        self.unfollow(third)    # back to 2: fanned out on write again
+        self.publish('after')
+        for follower in (first, second):
+            self.assertEqual(self.feed(follower), ['after', 'during', 'before'])
+        self.assertEqual(self.feed(third), [])
+        self.assertEqual(self.feed(self.author), ['after', 'during', 'before'])
+
+
+class RealtimeTests(APIUserTestCase):
+    """posts.realtime on a private LocalBroker: coalescing, stream subscriptions, stream tokens."""
+
+    def setUp(self):
+        super().setUp()
+        self.broker = LocalBroker()
+        patcher = mock.patch('posts.realtime.broker', self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.author = make_user('author@example.com')
+        self.followed = make_user('followed@example.com')
+        Follow.objects.create(follower=self.user, following=self.followed)
+
+    def flush(self, coalescer):
+        coalescer._timer.cancel()
+        with mock.patch.object(self.broker, 'publish') as publish:
+            coalescer.flush()
+        return [(channel, (message['likes_delta'], message['dislikes_delta'], message['likes_count']))
+                for (channel, message), _ in publish.call_args_list]
+
+    def test_coalescer_sums_deltas_per_post(self):
+        coalescer = CounterCoalescer(window=60)
+        coalescer.add(1, 1, 0, 1, 0)
+        coalescer.add(2, 0, 1, 0, 1)
+        coalescer.add(1, 1, 0, 2, 0)
+        coalescer.add(1, -1, 1, 1, 1)
+        self.assertEqual(self.flush(coalescer), [(post_channel(1), (1, 1, 1)), (post_channel(2), (0, 1, 0))])
+
+    def test_coalescer_skips_zero_net_changes(self):
+        coalescer = CounterCoalescer(window=60)
+        coalescer.add(1, 1, 0, 1, 0)
+        coalescer.add(1, -1, 0, 0, 0)
+        self.assertEqual(self.flush(coalescer), [])
+
+    async def wait_for_channel(self, channel, subscribed=True):
+        for _ in range(100):
+            if (channel in self.broker._channels) == subscribed:
+                return
+            await asyncio.sleep(0.01)
+        self.fail(f'{channel} subscribed={not subscribed}')
+
+    async def test_event_stream_unsubscribes_on_close(self):
+        stream = event_stream([post_channel(1)])
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+        self.assertEqual(set(self.broker._channels), {post_channel(1)})
+        self.broker.publish(post_channel(1), {'type': 'counts', 'post_id': 1})
+        self.assertTrue((await asyncio.wait_for(anext(stream), 1)).startswith(b'event: counts\n'))
+        await stream.aclose()
+        self.assertEqual(self.broker._channels, {})
+
+    async def test_follows_take_effect_on_an_open_stream(self):
+        stream = event_stream([], follower_id=self.user.pk)
+        await anext(stream)
+        self.assertEqual(set(self.broker._channels), {
+            follows_channel(self.user.pk), author_channel(self.user.pk), author_channel(self.followed.pk),
+        })
+
+        frame = asyncio.ensure_future(anext(stream))
+        self.broker.publish(follows_channel(self.user.pk), {'type': 'follow', 'user_id': self.author.pk, 'following': True})
+        await self.wait_for_channel(author_channel(self.author.pk))
+        self.broker.publish(author_channel(self.author.pk), {'type': 'post', 'post_id': 1})
+        self.assertIn(b'"post_id":1', await asyncio.wait_for(frame, 1))
+
+        frame = asyncio.ensure_future(anext(stream))
+        self.broker.publish(follows_channel(self.user.pk), {'type': 'follow', 'user_id': self.author.pk, 'following': False})
+        await self.wait_for_channel(author_channel(self.author.pk), subscribed=False)
+        self.broker.publish(author_channel(self.author.pk), {'type': 'post', 'post_id': 2})
+        self.broker.publish(author_channel(self.user.pk), {'type': 'post', 'post_id': 3})
+        self.assertIn(b'"post_id":3', await asyncio.wait_for(frame, 1))
+        await stream.aclose()
+        self.assertEqual(self.broker._channels, {})
+
+    def test_follow_view_announces_after_commit(self):
+        with mock.patch.object(self.broker, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(f'/api/users/{self.author.pk}/follow/')
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(f'/api/users/{self.author.pk}/follow/')
+        self.assertEqual([call.args for call in publish.call_args_list], [
+            (follows_channel(self.user.pk), {'type': 'follow', 'user_id': self.author.pk, 'following': following})
+            for following in (True, False)
+        ])
+
+    def stream_user(self, token):
+        request = RequestFactory().get('/api/events/', {'token': token})
+        return async_to_sync(EventStreamAuthentication().aauthenticate)(request)[0]
+
+    def test_event_stream_token(self):
+        token = self.client.post('/api/events/token/').json()['token']
+        self.assertEqual(self.stream_user(token).pk, self.user.pk)
+        # Only the event stream accepts it
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(self.client.get('/api/posts/').status_code, 401)
+
+    def test_access_token_is_not_a_stream_token(self):
+        with self.assertRaises(InvalidToken):
+            self.stream_user(str(ClaimsRefreshToken.for_user(self.user).access_token))
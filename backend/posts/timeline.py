@@ -0,0 +1,138 @@
+"""
+Home-feed timelines.
+
+Posts by ordinary accounts are pushed into a materialized per-follower table
+(`TimelineEntry`) when they are created. The author's own row is written by
+the request. The followers' rows are written by the background pool
+(backend_main.background) after commit, so posting does not get slower as an
+account gains followers. Posts by accounts with more than
+FEED_FANOUT_MAX_FOLLOWERS followers are not pushed. Readers pull them at read
+time instead, so one post never writes millions of rows.
+
+An author who drops back to FEED_FANOUT_MAX_FOLLOWERS is no longer pulled. Their
+recent posts are then copied to every follower once
+(`fan_out_recent_posts`), so the posts made while they were above the threshold
+stay in their followers' feeds.
+
+Feed order is post id descending (ids are monotonic with creation time), which
+lets both sources be read with the same `post_id < cursor` range scan.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from accounts.models import Follow
+from backend_main.background import run_after_commit
+from .models import Post, TimelineEntry
+
+User = get_user_model()
+
+FANOUT_MAX_FOLLOWERS = getattr(settings, 'FEED_FANOUT_MAX_FOLLOWERS', 10000)
+FANOUT_BATCH_SIZE = getattr(settings, 'FEED_FANOUT_BATCH_SIZE', 1000)
+FOLLOW_BACKFILL = getattr(settings, 'FEED_FOLLOW_BACKFILL', 100)
+
+
+def uses_fanout_on_read(author):
+    return author.followers_count > FANOUT_MAX_FOLLOWERS
+
+
+def fan_out_post(post):
+    """
+    Write `post` into its author's own timeline, and queue the copies for the
+    author's followers to be written after commit.
+    """
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(owner_id=post.user_id, post_id=post.pk, author_id=post.user_id)],
+        ignore_conflicts=True,
+    )
+    run_after_commit(fan_out_to_followers, post.pk, post.user_id)
+
+
+def fan_out_to_followers(post_id, author_id):
+    """Write a post into every follower's timeline, unless its author is pulled at read time by now."""
+    _fan_out(author_id, [post_id])
+
+
+def fan_out_recent_posts(author_id):
+    """Copy an author's FOLLOW_BACKFILL most recent posts into every follower's timeline."""
+    post_ids = list(
+        Post.objects.filter(user_id=author_id)
+        .order_by('-id')
+        .values_list('id', flat=True)[:FOLLOW_BACKFILL]
+    )
+    _fan_out(author_id, post_ids)
+
+
+def follower_removed(author):
+    """
+    Call after an unfollow, with `author.followers_count` read in the same transaction.
+    The author whose count has just dropped to the threshold gets their recent
+    posts fanned out (after commit).
+    """
+    if author.followers_count == FANOUT_MAX_FOLLOWERS:
+        run_after_commit(fan_out_recent_posts, author.pk)
+
+
+def _fan_out(author_id, post_ids):
+    author = User.objects.filter(pk=author_id).only('followers_count').first()
+    if not post_ids or author is None or uses_fanout_on_read(author):
+        return
+    follower_ids = (
+        Follow.objects.filter(following_id=author_id)
+        .values_list('follower_id', flat=True)
+        .iterator(chunk_size=FANOUT_BATCH_SIZE)
+    )
+    batch = []
+    for follower_id in follower_ids:
+        batch.extend(
+            TimelineEntry(owner_id=follower_id, post_id=post_id, author_id=author_id) for post_id in post_ids
+        )
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def backfill_timeline(follower, author):
+    """Copy `author`'s most recent posts into `follower`'s timeline after a follow."""
+    if uses_fanout_on_read(author):
+        return
+    post_ids = (
+        Post.objects.filter(user_id=author.pk)
+        .order_by('-id')
+        .values_list('id', flat=True)[:FOLLOW_BACKFILL]
+    )
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(owner_id=follower.pk, post_id=pid, author_id=author.pk) for pid in post_ids],
+        ignore_conflicts=True,
+    )
+
+
+def remove_from_timeline(follower, author):
+    """Drop `author`'s posts from `follower`'s timeline after an unfollow."""
+    TimelineEntry.objects.filter(owner_id=follower.pk, author_id=author.pk).delete()
+
+
+def read_timeline(user, before_id=None, limit=20):
+    """
+    Return up to `limit` post ids for `user`'s feed, newest first, older than `before_id`.
+    Merges the materialized timeline with posts pulled from followed large accounts.
+    """
+    entries = TimelineEntry.objects.filter(owner_id=user.pk)
+    if before_id is not None:
+        entries = entries.filter(post_id__lt=before_id)
+    post_ids = set(entries.order_by('-post_id').values_list('post_id', flat=True)[:limit])
+
+    big_author_ids = list(
+        User.objects.filter(
+            follower_links__follower_id=user.pk,
+            followers_count__gt=FANOUT_MAX_FOLLOWERS,
+        ).values_list('id', flat=True)
+    )
+    if big_author_ids:
+        pulled = Post.objects.filter(user_id__in=big_author_ids)
+        if before_id is not None:
+            pulled = pulled.filter(id__lt=before_id)
+        post_ids.update(pulled.order_by('-id').values_list('id', flat=True)[:limit])
+
+    return sorted(post_ids, reverse=True)[:limit]
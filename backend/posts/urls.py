@@ -1,8 +1,26 @@
 from django.urls import path
-from .views import PostListCreateView, PostDetailView, PostReactToggleAPIView
+from django.views.decorators.csrf import csrf_exempt
+from .async_views import (
+    AsyncPostListCreateView, AsyncPostDetailView, AsyncPostReactToggleAPIView, PostEventStreamView,
+)
+from .views import (
+    PostListCreateView, PostDetailView, PostReactToggleAPIView, PostReactBatchToggleAPIView, FeedView,
+    PostSearchView, EventStreamTokenView,
+)
 
 urlpatterns = [
     path('posts/', PostListCreateView.as_view(), name='post-list-create'),
+    path('posts/search/', PostSearchView.as_view(), name='post-search'),
     path('posts/<int:pk>/', PostDetailView.as_view(), name='post-detail'),
     path('posts/<int:post_id>/toggle-like/', PostReactToggleAPIView.as_view(), name='post-like-toggle'),
+    path('posts/toggle-like/batch/', PostReactBatchToggleAPIView.as_view(), name='post-like-toggle-batch'),
+    path('feed/', FeedView.as_view(), name='feed'),
+
+    # ASGI-native variants (JWT-authenticated API, hence no CSRF)
+    path('async/posts/', csrf_exempt(AsyncPostListCreateView.as_view()), name='async-post-list-create'),
+    path('async/posts/<int:pk>/', csrf_exempt(AsyncPostDetailView.as_view()), name='async-post-detail'),
+    path('async/posts/<int:post_id>/toggle-like/', csrf_exempt(AsyncPostReactToggleAPIView.as_view()), name='async-post-like-toggle'),
+    # Server-sent events (posts.realtime); ASGI only
+    path('events/', PostEventStreamView.as_view(), name='post-events'),
+    path('events/token/', EventStreamTokenView.as_view(), name='post-events-token'),
 ]
\ No newline at end of file
@@ -1,40 +1,91 @@
-from django.db.models import Count, Q, Prefetch
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Prefetch
+from django.db.models.functions import Greatest
 from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from django.http import Http404
 
+from accounts.tokens import EventStreamToken
+from backend_main.conditional import make_etag, not_modified, set_validators
+from backend_main.imaging import schedule_variants
+from backend_main.replicas import ReplicaRoutingMixin
+from .cache import get_post_detail, get_post_page, with_pending_reactions
+from .fields import parse_field_selection
 from .models import Post, PostLike
-from .serializers import PostSerializer, PostLikeToggleSerializer
+from .pagination import PostIdCursorPagination, SearchRankCursorPagination, TrigramSearchCursorPagination
+from .payloads import post_version, version_reactions
+from .realtime import announce_post
+from .search import fulltext_queryset, trigram_queryset
+from .serializers import PostSerializer, PostLikeToggleSerializer, PostLikeBatchToggleSerializer
+from .timeline import fan_out_post, read_timeline
 
+User = get_user_model()
 
-class PostListCreateView(generics.ListCreateAPIView):
+
+def post_page_response(paginator, page, request):
+    """Paginated response of cached post payloads, honouring ?fields= / ?compact= / ?include=authors."""
+    selection = parse_field_selection(request, PostSerializer.Meta.fields)
+    payloads, authors = get_post_page([post.pk for post in page], request, selection)
+    data = paginator.get_paginated_data(payloads)
+    if authors is not None:
+        data['authors'] = authors
+    return Response(data)
+
+
+def post_validators(request, version, reactions):
     """
-    List posts (annotated with like/dislike counts and optionally prefetched user's reaction)
+    (ETag, Last-Modified) of a post payload for the viewer, from a `post_version` row
+    and the viewer's reaction map (`version_reactions`, plus any buffered toggle).
+    """
+    etag = make_etag(
+        request, version['updated_at'], version['likes_count'], version['dislikes_count'],
+        version['user__updated_at'], reactions.get(version['id']),
+    )
+    return etag, max(version['updated_at'], version['user__updated_at'])
+
+
+class PostListCreateView(ReplicaRoutingMixin, generics.ListCreateAPIView):
+    """
+    List posts (with denormalized like/dislike counts and optionally prefetched user's reaction)
     and create post.
+    The list is keyset-paginated: GET /api/posts/?cursor=<opaque>&page_size=<n>
     """
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # token state, page, posts (cache miss), viewer's reactions
+    query_budget = 4
 
     def get_queryset(self):
         user = self.request.user
-        # annotate counts using reaction values (not is_like)
-        base_qs = Post.objects.filter(user=user).annotate(
-            likes_count=Count('likes', filter=Q(likes__reaction=PostLike.REACTION_LIKE)),
-            dislikes_count=Count('likes', filter=Q(likes__reaction=PostLike.REACTION_DISLIKE)),
-        ).select_related('user')
+        # likes_count / dislikes_count are columns on Post: no JOIN or GROUP BY needed
+        base_qs = Post.objects.filter(user_id=user.pk).select_related('user')
 
         if user.is_authenticated:
-            # Prefetch only this user's PostLike rows and stash to_attr='user_like_rows'
-            user_like_qs = PostLike.objects.filter(user=user)
+            # Prefetch only this user's actual reactions and stash to_attr='user_like_rows'
+            user_like_qs = PostLike.objects.filter(user_id=user.pk).exclude(reaction=PostLike.REACTION_NONE)
             return base_qs.prefetch_related(Prefetch('likes', queryset=user_like_qs, to_attr='user_like_rows'))
         return base_qs
 
-
+    def list(self, request, *args, **kwargs):
+        # Page over (created_at, id) only; the payloads come from the post cache
+        queryset = Post.objects.filter(user_id=request.user.pk).only('id', 'created_at')
+        page = self.paginate_queryset(queryset)
+        return post_page_response(self.paginator, page, request)
     
     def perform_create(self, serializer):
-        """Attach the current user when creating a post."""
-        serializer.save(user=self.request.user)
+        """
+        Attach the current user when creating a post, push it into followers' timelines
+        and announce it to their event streams.
+        """
+        with transaction.atomic():
+            post = serializer.save(user_id=self.request.user.pk)
+            User.objects.filter(pk=self.request.user.pk).update(posts_count=F('posts_count') + 1)
+        fan_out_post(post)
+        announce_post(post)
+        schedule_variants(post, 'image')
 
     def create(self, request, *args, **kwargs):
         # Validate & save (perform_create will set user)
@@ -42,50 +93,74 @@ class PostListCreateView(generics.ListCreateAPIView):
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
 
-        # Re-fetch the created post with the same annotations/prefetch used in get_queryset.
-        # This ensures the response includes likes_count/dislikes_count and user_like_rows.
+        # Re-fetch the created post with the same prefetch used in get_queryset.
+        # This ensures the response includes user_like_rows.
+        user_like_qs = PostLike.objects.filter(user_id=request.user.pk).exclude(reaction=PostLike.REACTION_NONE)
         post = (
-            Post.objects.filter(user=request.user)
-            .annotate(
-                likes_count=Count('likes', filter=Q(likes__reaction=PostLike.REACTION_LIKE)),
-                dislikes_count=Count('likes', filter=Q(likes__reaction=PostLike.REACTION_DISLIKE)),
-            )
-            .prefetch_related(Prefetch('likes', queryset=PostLike.objects.filter(user=request.user), to_attr='user_like_rows'))
+            Post.objects.filter(user_id=request.user.pk)
+            .prefetch_related(Prefetch('likes', queryset=user_like_qs, to_attr='user_like_rows'))
             .select_related('user')
             .get(id=serializer.instance.id)
         )
 
+        selection = parse_field_selection(request, PostSerializer.Meta.fields)
         return Response(
             {
                 'message': 'Post created successfully',
-                'post': PostSerializer(post, context={'request': request}).data,
+                'post': PostSerializer(post, context={'request': request, 'fields': selection.post_fields}).data,
             },
             status=status.HTTP_201_CREATED,
         )
 
 
-class PostDetailView(generics.RetrieveDestroyAPIView):
+class PostDetailView(ReplicaRoutingMixin, generics.RetrieveDestroyAPIView):
     """
-    Retrieve or delete a single post. Uses same annotation/prefetch as list.
+    Retrieve or delete a single post. Retrieval is served from the post cache.
+    GET supports If-None-Match: a client with the current version gets a 304.
     """
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     lookup_field = 'pk'
+    # token state, version with the viewer's reaction, post (cache miss)
+    query_budget = 3
 
     def get_queryset(self):
         user = self.request.user
-        base_qs = Post.objects.annotate(
-            likes_count=Count('likes', filter=Q(likes__reaction=PostLike.REACTION_LIKE)),
-            dislikes_count=Count('likes', filter=Q(likes__reaction=PostLike.REACTION_DISLIKE)),
-        ).select_related('user')
+        base_qs = Post.objects.select_related('user')
 
         if user.is_authenticated:
-            user_like_qs = PostLike.objects.filter(user=user)
+            user_like_qs = PostLike.objects.filter(user_id=user.pk).exclude(reaction=PostLike.REACTION_NONE)
             return base_qs.prefetch_related(Prefetch('likes', queryset=user_like_qs, to_attr='user_like_rows'))
         return base_qs
 
+    def retrieve(self, request, *args, **kwargs):
+        # ?fields= applies; authors are not sideloaded for a single post
+        selection = parse_field_selection(request, PostSerializer.Meta.fields)._replace(sideload_authors=False)
+        # Validators (and the viewer's reaction) come from one indexed lookup; the
+        # payload is only assembled, from the post cache, when the client's copy is stale
+        version = post_version(Post.objects.filter(pk=kwargs[self.lookup_field]), request.user).first()
+        if version is None:
+            raise Http404
+        reactions = with_pending_reactions(request.user, version_reactions(version), [version['id']])
+        etag, last_modified = post_validators(request, version, reactions)
+        response = not_modified(request, etag)
+        if response is None:
+            payload, current = get_post_detail(version, request, selection, reactions)
+            if payload is None:
+                raise Http404
+            response = Response(payload)
+            if not current:
+                # A newer body than `version`: its validators would let the client keep it too long
+                etag = last_modified = None
+        return set_validators(response, etag, last_modified)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            User.objects.filter(pk=instance.user_id).update(posts_count=Greatest(F('posts_count') - 1, 0))
 
-class PostReactToggleAPIView(APIView):
+
+class PostReactToggleAPIView(ReplicaRoutingMixin, APIView):
     """
     Toggle like/dislike for the authenticated user on a post.
     Expects POST with {"action": "like"} or {"action": "dislike"}.
@@ -97,7 +172,106 @@ class PostReactToggleAPIView(APIView):
         # validate input with your serializer
         serializer = PostLikeToggleSerializer(data=request.data, context={"request": request, "post_id": post_id})
         serializer.is_valid(raise_exception=True)
-        post_like = serializer.save()
+        result = serializer.save()
 
         # Return the resulting reaction explicitly for frontend
-        return Response({"reaction": post_like.reaction}, status=status.HTTP_200_OK)
+        return Response({"reaction": result.reaction}, status=status.HTTP_200_OK)
+
+
+class PostReactBatchToggleAPIView(ReplicaRoutingMixin, APIView):
+    """
+    Apply many like/dislike toggles for the authenticated user in one transaction,
+    e.g. a queue replayed by a client coming back online.
+    Expects POST with {"reactions": [{"post_id": 1, "action": "like"}, ...]}.
+    Returns the final reaction per post and the ids of posts that no longer exist.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = PostLikeBatchToggleSerializer(data=request.data, context={"request": request})
+        serializer.is_valid(raise_exception=True)
+        results, missing = serializer.save()
+
+        return Response({
+            "results": [
+                {
+                    "post_id": r.post_id,
+                    "reaction": r.reaction,
+                    "likes_count": r.likes_count,
+                    "dislikes_count": r.dislikes_count,
+                }
+                for r in results
+            ],
+            "missing": missing,
+        }, status=status.HTTP_200_OK)
+
+
+class FeedView(generics.ListAPIView):
+    """
+    Home feed: posts by the user and the accounts they follow, newest first.
+    GET /api/feed/?cursor=<opaque>&page_size=<n>
+    """
+    serializer_class = PostSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = PostIdCursorPagination
+    # token state, timeline, big authors, their posts, page, posts (cache miss), reactions
+    query_budget = 7
+
+    def get_queryset(self):
+        user = self.request.user
+        position = self.paginator.decode_cursor(self.request, Post)
+        before_id = position[0] if position else None
+        # One extra id so the paginator can tell whether another page exists
+        limit = self.paginator.get_page_size(self.request) + 1
+        post_ids = read_timeline(user, before_id=before_id, limit=limit)
+        return Post.objects.filter(pk__in=post_ids).only('id')
+
+    def list(self, request, *args, **kwargs):
+        # Payloads come from the post cache (posts.cache)
+        page = self.paginate_queryset(self.get_queryset())
+        return post_page_response(self.paginator, page, request)
+
+
+class EventStreamTokenView(APIView):
+    """
+    POST /api/events/token/ -> {"token": ...}: a short-lived token for
+    GET /api/events/?token=..., for an EventSource, which cannot send the
+    Authorization header. When the stream fails for good (readyState CLOSED), get a
+    new token and reopen it.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        return Response({'token': str(EventStreamToken.for_access_token(request.auth))})
+
+
+
+class PostSearchView(generics.ListAPIView):
+    """
+    Search post descriptions, best match first.
+    GET /api/posts/search/?q=<terms>&cursor=<opaque>&page_size=<n>
+    If full-text search finds nothing, substring matches are returned newest first
+    and the `next` link carries mode=trigram (see posts.search).
+    """
+    serializer_class = PostSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SearchRankCursorPagination
+    max_query_length = 200
+    # token state, full-text page, trigram page, posts (cache miss), reactions
+    query_budget = 5
+
+    def list(self, request, *args, **kwargs):
+        terms = request.query_params.get('q', '').strip()[:self.max_query_length]
+        if not terms:
+            return Response({
+                'error': 'Query parameter "q" is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = TrigramSearchCursorPagination()
+        if request.query_params.get(paginator.mode_query_param) != 'trigram':
+            page = self.paginate_queryset(fulltext_queryset(terms))
+            if page or request.query_params.get(self.paginator.cursor_query_param):
+                return post_page_response(self.paginator, page, request)
+
+        page = paginator.paginate_queryset(trigram_queryset(terms), request, view=self)
+        return post_page_response(paginator, page, request)
@@ -8,13 +8,29 @@ import axiosInstance from "../utils/axiosInstance";
 
 const DashBoard = () => {
   const [posts,setPosts] = useState([])
+  // absolute URL of the next keyset page, null on the last page
+  const [nextPage,setNextPage] = useState(null)
   const getPosts = async()=>{
     try{
       const response = await axiosInstance.get("/posts")
 
       if(response.status===200){
         console.log("dash",response.data)
-        setPosts(response.data)
+        setPosts(response.data.results)
+        setNextPage(response.data.next)
+      }
+    }catch(error){
+      console.log(error)
+    }
+  }
+  const getMorePosts = async()=>{
+    if(!nextPage) return
+    try{
+      const response = await axiosInstance.get(nextPage)
+
+      if(response.status===200){
+        setPosts((loaded)=>[...loaded, ...response.data.results])
+        setNextPage(response.data.next)
       }
     }catch(error){
       console.log(error)
@@ -80,6 +96,9 @@ const DashBoard = () => {
                 <Posts key={post.id} postId={post.id} getPosts={getPosts} post = {post}/>
               ))
             }
+            {nextPage && (
+              <button onClick={getMorePosts} className="w-full rounded p-2 bg-gray-500 active:bg-gray-300 cursor-pointer">Load more</button>
+            )}
           </div>  
         </div>
       </section>